@@ -1,16 +1,83 @@
-from flask import Flask, request, jsonify
-from src.content_based_filtering import recommend_for_new_customer  # Import the function for new customer recommendations
-from src.hybrid_recommendation import hybrid_recommendations  # Import the function for existing customer recommendations
-import pandas as pd
+import hashlib
+import hmac
+import json
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from src.content_based_filtering import recommend_for_new_customer, recommend_batch  # Import the functions for new customer recommendations
+from src.hybrid_recommendation import hybrid_recommendations, apply_entitlement_updates  # Import the functions for existing customer recommendations
+from src.entitlements import normalize_delta
+from src.companies import company_directory
 from flask_cors import CORS
-from src.services.llm_query_processor import process_query
-from src.services.llm_query_processor_new import process_query_new
-from src.services.llm_query_processor_existing import process_query_existing
+from src.services.llm_query_processor import process_query, stream_query
+from src.services.llm_query_processor_new import process_query_new, stream_query_new
+from src.services.llm_query_processor_existing import process_query_existing, stream_query_existing
+from src import config, model_bundle
+from src.metrics import CONTENT_TYPE, REQUEST_SECONDS, registry
+
+# Build the catalog and models at import, so preloaded gunicorn workers fork with them
+model_bundle.current()
 
 # Initialize the Flask app
 app = Flask(__name__)
 CORS(app)
 
+# Time every request for the /metrics latency histogram
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, endpoint=endpoint,
+                                status=response.status_code)
+    return response
+
+# Check whether the client asked for a streamed response
+def wants_stream(data):
+    return bool(data.get('stream')) or request.args.get('stream') == '1' or request.accept_mimetypes.best == 'text/event-stream'
+
+# Check a requested number of recommendations (JSON true/false are not numbers, although bool is an int)
+TOP_N_ERROR = 'top_n must be a positive integer'
+
+def valid_top_n(top_n):
+    return isinstance(top_n, int) and not isinstance(top_n, bool) and top_n >= 1
+
+# Read the options of a recommendation response: number of recommendations and format
+# ('html' for the sentence output, 'json' for the destination with structured results)
+def response_options(data):
+    top_n = data.get('top_n', 5)
+    response_format = data.get('format') or request.args.get('format', 'html')
+    if not valid_top_n(top_n):
+        return None, None, TOP_N_ERROR
+    if response_format not in ('html', 'json'):
+        return None, None, "format must be 'html' or 'json'"
+    return top_n, response_format == 'json', None
+
+# Check the admin token of a request (admin routes are disabled while ARE_ADMIN_TOKEN is unset)
+def is_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode())
+
+# Streamed responses are text chunks: the JSON format is only available without streaming
+STREAM_FORMAT_ERROR = "format 'json' cannot be streamed"
+
+# Send text chunks as server-sent events: {"delta": ...} per chunk, then a "done" (or "error") event
+def sse_response(chunks):
+    def events():
+        try:
+            for chunk in chunks:
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    # Disable proxy buffering (nginx) so chunks reach the client as they are produced
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Base URL route ("/")
 @app.route('/')
 def home():
@@ -31,11 +98,19 @@ def recommend_newuser():
     # Validate the user query input
     if not user_query:
         return jsonify({'error': 'Missing user query'}), 400
+    top_n, structured, error = response_options(data)
+    if error:
+        return jsonify({'error': error}), 400
     
+    if wants_stream(data):
+        if structured:
+            return jsonify({'error': STREAM_FORMAT_ERROR}), 400
+        return sse_response(stream_query_new(user_query, top_n))
+
     # Get recommendations using the content-based filtering algorithm
     try:
-        recommendations = process_query_new(user_query)
-        return jsonify({'recommendations': recommendations})
+        recommendations = process_query_new(user_query, top_n, structured)
+        return jsonify(recommendations if structured else {'recommendations': recommendations})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -47,33 +122,123 @@ def recommend_existinguser():
 
     if not user_query or not company:
         return jsonify({'error': 'Missing user query or company name'}), 400
+    top_n, structured, error = response_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    if wants_stream(data):
+        if structured:
+            return jsonify({'error': STREAM_FORMAT_ERROR}), 400
+        return sse_response(stream_query_existing(company, user_query, top_n))
     
     try:
-        # Get recommendations in sentence format
-        recommendations_sentence = process_query_existing(company, user_query)
-        return jsonify({'recommendations': recommendations_sentence})
+        # Get recommendations in sentence format (or structured in JSON mode)
+        recommendations = process_query_existing(company, user_query, top_n, structured)
+        return jsonify(recommendations if structured else {'recommendations': recommendations})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
-# Load the companies from the Excel file
+# API route to score many new user queries in one request
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch_queries():
+    data = request.get_json()
+    queries = data.get('queries')
+    top_n = data.get('top_n', 5)
+
+    # Validate the batch input
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) for q in queries):
+        return jsonify({'error': 'queries must be a non-empty list of strings'}), 400
+    if len(queries) > config.BATCH_MAX_QUERIES:
+        return jsonify({'error': f'At most {config.BATCH_MAX_QUERIES} queries per request'}), 400
+    if not valid_top_n(top_n):
+        return jsonify({'error': TOP_N_ERROR}), 400
+
+    try:
+        results = recommend_batch(queries, top_n)
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# API route to ingest entitlement changes (new purchases, implementation status) without a restart
+# (an admin route: requires the ARE_ADMIN_TOKEN value in the X-Admin-Token header)
+@app.route('/api/entitlements', methods=['POST'])
+def ingest_entitlements():
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json()
+    deltas = data.get('deltas')
+
+    if not isinstance(deltas, list) or not deltas:
+        return jsonify({'error': 'deltas must be a non-empty list'}), 400
+    try:
+        deltas = [normalize_delta(delta) for delta in deltas]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        state = apply_entitlement_updates(deltas)
+        return jsonify({'applied': len(deltas), 'companies': len(state.company_index), 'products': len(state.product_ids)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Load the companies from the Excel file (cached in memory, re-read only when the file changes)
 def load_companies():
-    companies_file_path = 'data/companies.xlsx'  # Replace with the actual path to your Excel file
-    companies_df = pd.read_excel(companies_file_path)
-    
-    # Assuming the Excel file has a column named "Company" with company names
-    company_names = companies_df['Name'].tolist()
-    return company_names
+    return company_directory.get().names
 
 # Create a GET endpoint to return all the companies
+# Optional query parameters: prefix (case-insensitive name prefix), offset and limit (pagination)
 @app.route('/company', methods=['GET'])
 def get_companies():
+    prefix = request.args.get('prefix', '')
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if offset < 0 or (limit is not None and limit < 0):
+        return jsonify({'error': 'offset and limit must be non-negative integers'}), 400
+
     try:
-        companies = load_companies()
-        return jsonify({'companies': companies})
+        companies, total, directory = company_directory.search(prefix, offset, limit)
+        body = {'companies': companies}
+        if prefix or offset or limit is not None:
+            body.update({'total': total, 'offset': offset})
+        response = jsonify(body)
+
+        # Validators let the frontend revalidate with If-None-Match / If-Modified-Since and get a 304
+        # (the query is hashed: a raw prefix may hold quotes or characters a header cannot carry)
+        query = hashlib.sha1(f"{prefix.casefold()}|{offset}|{limit}".encode('utf-8')).hexdigest()[:16]
+        response.set_etag(f"{directory.etag}-{query}")
+        response.last_modified = directory.last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
 
+# Admin route to rebuild the catalog and models from the workbooks and swap them in without a restart
+# (requires the ARE_ADMIN_TOKEN value in the X-Admin-Token header; reloads the worker that serves the request,
+# the other workers pick up a new snapshot with their watcher)
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    force = bool(data.get('force'))
+
+    if not data.get('wait'):
+        # Build in the background; requests keep being served by the current models meanwhile
+        started = model_bundle.reload_in_background(force)
+        return jsonify({'started': started, 'version': model_bundle.current().version}), 202
+    try:
+        reloaded = model_bundle.reload(force)
+        return jsonify({'reloaded': reloaded, 'version': model_bundle.current().version})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Prometheus scrape endpoint: stage latencies, request latencies, LLM calls/tokens/errors, cache statistics
+# (under gunicorn the workers share their metrics through ARE_METRICS_DIR, so a scrape covers all of them)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
 @app.route('/query', methods=['POST'])
 def handle_user_query():
     try:
@@ -81,6 +246,9 @@ def handle_user_query():
         query = data.get("query", "")
         if not query:
             return jsonify({"error": "Query is required"}), 400
+
+        if wants_stream(data):
+            return sse_response(stream_query(query))
         
         # Process the query using the logic from the service
         response = process_query(query)
@@ -90,5 +258,6 @@ def handle_user_query():
 
 # Run the Flask app
 if __name__ == '__main__':
+    model_bundle.start_watcher()
     # app.run(debug=True)
     app.run(host='0.0.0.0', port= 5000)
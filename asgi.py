@@ -0,0 +1,190 @@
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import TOP_N_ERROR, valid_top_n
+from app import app as flask_app  # The synchronous app serves every other route
+from src import model_bundle
+from src.metrics import REJECTED_REQUESTS, REQUEST_SECONDS
+from src.services.async_limits import LLM_TIMEOUT_ERRORS, Overloaded, request_limiter
+from src.services.llm_query_processor import aprocess_query, astream_query
+from src.services.llm_query_processor_new import aprocess_query_new, astream_query_new
+from src.services.llm_query_processor_existing import aprocess_query_existing, astream_query_existing
+
+# Async serving mode: `gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app`
+# The LLM-bound routes are handled here with awaited LLM calls, so one worker serves many chats at once;
+# the other routes (fast, local) run in the Flask app through a WSGI adapter.
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+# Headers of every response of the async routes (the Flask app adds the same CORS header)
+COMMON_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+
+# Function to read the whole request body
+async def read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+# Function to send a JSON response
+async def send_json(send, status, body, headers=()):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': COMMON_HEADERS + [(b'content-type', b'application/json'),
+                                     (b'content-length', str(len(payload)).encode())] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+# Function to send text chunks as server-sent events, like sse_response in app.py
+async def send_sse(send, chunks):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': COMMON_HEADERS + [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                     (b'x-accel-buffering', b'no')],
+    })
+    try:
+        async for chunk in chunks:
+            event = f"data: {json.dumps({'delta': chunk})}\n\n"
+            await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        event = "event: done\ndata: {}\n\n"
+    except Exception as e:
+        event = f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    await send({'type': 'http.response.body', 'body': event.encode('utf-8')})
+
+
+# Check whether the client asked for a streamed response
+def wants_stream(scope, data):
+    headers = dict(scope['headers'])
+    accept = parse_accept_header(headers.get(b'accept', b'').decode('latin-1'), MIMEAccept)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return bool(data.get('stream')) or query.get('stream') == ['1'] or accept.best == 'text/event-stream'
+
+
+# Read the options of a recommendation response, like response_options in app.py
+def response_options(scope, data):
+    top_n = data.get('top_n', 5)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    response_format = data.get('format') or query.get('format', ['html'])[0]
+    if not valid_top_n(top_n):
+        return None, None, TOP_N_ERROR
+    if response_format not in ('html', 'json'):
+        return None, None, "format must be 'html' or 'json'"
+    return top_n, response_format == 'json', None
+
+
+# Handlers of the LLM-bound routes: (error message or None, process factory, stream factory, response key);
+# a None response key sends the processing result itself as the JSON body, and a None stream factory
+# means the response cannot be streamed (JSON format)
+def new_user(scope, data):
+    user_query = data.get('user_query')
+    if not user_query:
+        return 'Missing user query', None, None, None
+    top_n, structured, error = response_options(scope, data)
+    if error:
+        return error, None, None, None
+    return (None, lambda: aprocess_query_new(user_query, top_n, structured),
+            None if structured else lambda: astream_query_new(user_query, top_n),
+            None if structured else 'recommendations')
+
+
+def existing_user(scope, data):
+    user_query = data.get('user_query')
+    company = data.get('company_name')
+    if not user_query or not company:
+        return 'Missing user query or company name', None, None, None
+    top_n, structured, error = response_options(scope, data)
+    if error:
+        return error, None, None, None
+    return (None, lambda: aprocess_query_existing(company, user_query, top_n, structured),
+            None if structured else lambda: astream_query_existing(company, user_query, top_n),
+            None if structured else 'recommendations')
+
+
+def user_query(scope, data):
+    query = data.get('query', '')
+    if not query:
+        return 'Query is required', None, None, None
+    return None, lambda: aprocess_query(query), lambda: astream_query(query), 'response'
+
+
+ROUTES = {
+    '/api/recommend/new-user': new_user,
+    '/api/recommend/existing-user': existing_user,
+    '/query': user_query,
+}
+
+
+# Function to serve one request of an LLM-bound route; returns the response status
+async def handle_llm_route(scope, receive, send, handler) -> int:
+    try:
+        data = json.loads(await read_body(receive) or b'null')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await send_json(send, 400, {'error': 'Request body must be a JSON object'})
+        return 400
+
+    error, process, stream, key = handler(scope, data)
+    streaming = wants_stream(scope, data)
+    if error is None and streaming and stream is None:
+        error = "format 'json' cannot be streamed"
+    if error is not None:
+        await send_json(send, 400, {'error': error})
+        return 400
+
+    try:
+        # Wait for a processing slot, or refuse at once when too many requests are already waiting
+        async with request_limiter.slot():
+            if streaming:
+                await send_sse(send, stream())
+                return 200
+            try:
+                result = await process()
+            except LLM_TIMEOUT_ERRORS:
+                await send_json(send, 504, {'error': 'The language model did not answer in time'})
+                return 504
+            except Exception as e:
+                await send_json(send, 500, {'error': str(e)})
+                return 500
+            await send_json(send, 200, result if key is None else {key: result})
+            return 200
+    except Overloaded:
+        REJECTED_REQUESTS.inc(endpoint=scope['path'])
+        await send_json(send, 503, {'error': 'Server is busy, retry later'}, [(b'retry-after', b'1')])
+        return 503
+
+
+# ASGI entry point
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Watch the workbooks in this process (no-op if gunicorn's post_fork already started it)
+                model_bundle.start_watcher()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'POST' else None
+    if handler is None:
+        # CORS preflights and every other route are answered by the Flask app
+        return await wsgi_app(scope, receive, send)
+
+    started = time.perf_counter()
+    status = await handle_llm_route(scope, receive, send, handler)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, method='POST', endpoint=scope['path'], status=status)
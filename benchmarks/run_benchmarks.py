@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.synthetic_data import phrase, write_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+# Calls made to each function before timing starts
+WARMUP_CALLS = 5
+
+# Relative slowdown (or growth) that counts as a regression when comparing runs
+REGRESSION_THRESHOLD = 1.25
+
+
+# Function to read the resident memory of this process
+def current_rss_mb() -> float | None:
+    """Returns the current resident set size in MiB (Linux only)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Function to read the peak resident memory of this process
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Function to time repeated calls of a function
+def measure_latency(call, count) -> dict:
+    """Calls ``call(i)`` for i in range(count) after a warmup and returns latency statistics in ms."""
+    for i in range(min(WARMUP_CALLS, count)):
+        call(i)
+    timings = np.empty(count)
+    for i in range(count):
+        start = time.perf_counter()
+        call(i)
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'calls': count,
+        'mean_ms': round(float(timings.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(timings.max()), 4),
+    }
+
+
+# Function run in a fresh interpreter pointed at one synthetic dataset
+def run_worker(queries, seed) -> dict:
+    """Loads the recommenders from ARE_DATA_DIR, then times each recommendation function.
+
+    Build time and memory cover loading the model bundle (catalog snapshot and CF model,
+    built from the workbooks if no snapshot exists yet), with the libraries already loaded.
+    """
+    import pandas, sklearn, surprise  # noqa: F401  (loaded first so they are not counted as model cost)
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    from src import content_based_filtering, hybrid_recommendation, model_bundle
+    bundle = model_bundle.current()
+    result = {
+        'build_s': round(time.perf_counter() - start, 4),
+        'rss_before_mb': rss_before,
+        'rss_after_mb': current_rss_mb(),
+        'snapshot_version': bundle.version,
+        'retrieval_engine': (
+            'semantic' if bundle.content.semantic_index is not None
+            else 'inverted' if bundle.content.use_inverted_index else 'brute'
+        ),
+    }
+
+    if queries:
+        rng = np.random.default_rng(seed)
+        texts = [phrase(rng, 2, 8) for _ in range(queries)]
+        known = bundle.catalog.entitlements_df['Company'].unique()
+        # Mostly existing companies, with some unknown ones (cold-start path)
+        companies = [
+            str(rng.choice(known)) if rng.random() < 0.9 else f'Unknown Company {i}' for i in range(queries)
+        ]
+        calls = {
+            'recommend_for_new_customer': lambda i: content_based_filtering.recommend_for_new_customer(texts[i]),
+            'content_based_recommendations': lambda i: hybrid_recommendation.content_based_recommendations(texts[i]),
+            'collaborative_filtering_recommendations':
+                lambda i: hybrid_recommendation.collaborative_filtering_recommendations(companies[i]),
+            'hybrid_recommendations': lambda i: hybrid_recommendation.hybrid_recommendations(companies[i], texts[i]),
+        }
+        result['latency'] = {name: measure_latency(call, queries) for name, call in calls.items()}
+
+    result['peak_rss_mb'] = round(peak_rss_mb(), 2)
+    return result
+
+
+# Function to run a worker in a subprocess
+def run_isolated(data_dir, queries, seed, timeout) -> dict:
+    """Runs ``run_worker`` against ``data_dir`` in a new interpreter and returns its result or the error."""
+    env = dict(os.environ, ARE_DATA_DIR=data_dir, PYTHONPATH=REPO_ROOT)
+    env.pop('ARE_SNAPSHOT_DIR', None)
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        output = f.name
+    try:
+        command = [
+            sys.executable, '-m', 'benchmarks.run_benchmarks', '--worker', output,
+            '--queries', str(queries), '--seed', str(seed),
+        ]
+        process = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+        if process.returncode != 0:
+            return {'error': process.stderr.strip().splitlines()[-1:] or [f'exit code {process.returncode}']}
+        with open(output) as f:
+            return json.load(f)
+    except subprocess.TimeoutExpired:
+        return {'error': [f'timed out after {timeout}s']}
+    finally:
+        os.remove(output)
+
+
+# Function to benchmark one dataset scale
+def benchmark_scale(scale, queries, seed, work_dir, timeout, keep=False) -> dict:
+    """Generates the dataset for ``scale`` and measures a cold build, a warm load and query latencies."""
+    data_dir = os.path.join(work_dir, f'scale-{scale:g}')
+    start = time.perf_counter()
+    rows = write_dataset(data_dir, scale, seed)
+    generate_s = round(time.perf_counter() - start, 4)
+    try:
+        # Cold: no snapshot yet, so the catalog and CF model are built from the workbooks
+        cold = run_isolated(data_dir, 0, seed, timeout)
+        # Warm: the snapshot exists, as for every worker after the first deploy
+        warm = run_isolated(data_dir, queries, seed, timeout) if 'error' not in cold else {}
+    finally:
+        if not keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return {'scale': scale, 'rows': rows, 'generate_s': generate_s, 'cold': cold, 'warm': warm}
+
+
+# Function to describe where a benchmark ran
+def environment() -> dict:
+    """Returns the commit, interpreter and library versions of this run."""
+    import pandas, sklearn, surprise
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'scikit-learn': sklearn.__version__,
+        'surprise': surprise.__version__,
+        'retrieval_engine': os.environ.get('ARE_RETRIEVAL_ENGINE', 'auto'),
+        'cf_engine': os.environ.get('ARE_CF_ENGINE', 'knn'),
+    }
+
+
+# Function to compare two benchmark runs
+def compare_runs(baseline, current, threshold=REGRESSION_THRESHOLD) -> list:
+    """Prints metric ratios (current / baseline) per scale and returns the regressions above ``threshold``."""
+    regressions = []
+    baseline_scales = {entry['scale']: entry for entry in baseline['scales']}
+    for entry in current['scales']:
+        before = baseline_scales.get(entry['scale'])
+        if before is None:
+            continue
+        metrics = [
+            ('cold build_s', before['cold'].get('build_s'), entry['cold'].get('build_s')),
+            ('warm build_s', before['warm'].get('build_s'), entry['warm'].get('build_s')),
+            ('warm peak_rss_mb', before['warm'].get('peak_rss_mb'), entry['warm'].get('peak_rss_mb')),
+        ]
+        for name, stats in entry['warm'].get('latency', {}).items():
+            old = before['warm'].get('latency', {}).get(name, {})
+            metrics.append((f'{name} p50_ms', old.get('p50_ms'), stats['p50_ms']))
+            metrics.append((f'{name} p95_ms', old.get('p95_ms'), stats['p95_ms']))
+
+        print(f"scale {entry['scale']:g}")
+        for metric, old, new in metrics:
+            if not old or new is None:
+                continue
+            ratio = new / old
+            flag = '  REGRESSION' if ratio > threshold else ''
+            print(f'  {metric:<50} {old:>12.3f} -> {new:>12.3f}  x{ratio:.2f}{flag}')
+            if flag:
+                regressions.append((entry['scale'], metric, ratio))
+    return regressions
+
+
+# Function to print the results of a run as a table
+def print_summary(run) -> None:
+    """Prints build time, memory and latency percentiles per scale."""
+    for entry in run['scales']:
+        rows = ', '.join(f'{name}: {count}' for name, count in entry['rows'].items())
+        print(f"scale {entry['scale']:g} ({rows})")
+        for phase in ('cold', 'warm'):
+            result = entry[phase]
+            if 'error' in result:
+                print(f"  {phase}: ERROR {' '.join(result['error'])}")
+            elif result:
+                print(f"  {phase}: build {result['build_s']:.3f}s, peak RSS {result['peak_rss_mb']:.1f} MiB")
+        for name, stats in entry['warm'].get('latency', {}).items():
+            print(f"  {name:<42} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms"
+                  f"  p99 {stats['p99_ms']:>9.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the recommenders on synthetic data at several scales.')
+    parser.add_argument('--scales', default='1,10,100', help='comma-separated dataset multipliers')
+    parser.add_argument('--queries', type=int, default=200, help='timed calls per function and scale')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds allowed per build or latency run')
+    parser.add_argument('--work-dir', help='where to generate datasets (default: a temporary directory)')
+    parser.add_argument('--keep-data', action='store_true', help='keep the generated datasets and snapshots')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<UTC timestamp>.json)')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--worker', metavar='RESULT_FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.queries, args.seed)
+        with open(args.worker, 'w') as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='are-bench-')
+    run = {
+        'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'queries': args.queries,
+        'seed': args.seed,
+        'scales': [],
+    }
+    try:
+        for scale in (float(value) for value in args.scales.split(',')):
+            print(f'Benchmarking scale {scale:g}...', file=sys.stderr)
+            run['scales'].append(benchmark_scale(scale, args.queries, args.seed, work_dir, args.timeout, args.keep_data))
+    finally:
+        if not args.work_dir and not args.keep_data:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print_summary(run)
+    print(f'Results saved to {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_runs(baseline, run, args.threshold)
+        sys.exit(1 if regressions else 0)
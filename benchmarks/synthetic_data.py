@@ -0,0 +1,106 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Table sizes at scale 1 (roughly the size of the real workbooks)
+BASE_PRODUCTS = 20
+BASE_ACCELERATORS = 80
+BASE_COMPANIES = 50
+ENTITLEMENTS_PER_COMPANY = 5
+IMPLEMENTED_RATE = 0.7
+
+CATEGORIES = [
+    'ITSM', 'ITOM', 'CSM', 'HRSD', 'SecOps', 'GRC', 'ITAM', 'SPM', 'FSM', 'App Engine',
+    'Integration Hub', 'Platform Analytics', 'Workplace Service Delivery', 'Legal Service Delivery',
+]
+
+ACCELERATOR_TYPES = ['Playbook', 'Template', 'Workshop', 'Assessment', 'Integration', 'Dashboard', 'Training']
+
+VOCABULARY = [
+    'incident', 'problem', 'change', 'request', 'catalog', 'knowledge', 'workflow', 'automation', 'approval',
+    'service', 'portal', 'agent', 'workspace', 'virtual', 'chatbot', 'employee', 'customer', 'onboarding',
+    'offboarding', 'case', 'task', 'sla', 'escalation', 'routing', 'assignment', 'discovery', 'cmdb',
+    'configuration', 'asset', 'software', 'hardware', 'license', 'compliance', 'audit', 'risk', 'policy',
+    'vulnerability', 'security', 'threat', 'response', 'monitoring', 'event', 'alert', 'health', 'cloud',
+    'migration', 'integration', 'api', 'data', 'import', 'reporting', 'dashboard', 'analytics', 'metrics',
+    'performance', 'survey', 'feedback', 'field', 'dispatch', 'scheduling', 'mobile', 'notification',
+    'vendor', 'contract', 'procurement', 'budget', 'project', 'portfolio', 'demand', 'release', 'agile',
+    'testing', 'deployment', 'upgrade', 'governance', 'operations', 'productivity', 'experience', 'journey',
+]
+
+
+# Function to draw a random phrase from the vocabulary
+def phrase(rng, min_words, max_words) -> str:
+    """Returns between ``min_words`` and ``max_words`` vocabulary words joined by spaces."""
+    size = int(rng.integers(min_words, max_words + 1))
+    return ' '.join(rng.choice(VOCABULARY, size=size))
+
+
+# Function to build the four synthetic workbooks as DataFrames
+def generate_tables(scale=1.0, seed=0) -> dict:
+    """Returns products, accelerators, companies and entitlements tables sized ``scale`` times the base sizes.
+
+    Products are chosen by entitlements and accelerators with a Zipf-like skew, so a few
+    products are popular as in the real data.
+    """
+    rng = np.random.default_rng(seed)
+    n_products = max(1, round(BASE_PRODUCTS * scale))
+    n_accelerators = max(1, round(BASE_ACCELERATORS * scale))
+    n_companies = max(1, round(BASE_COMPANIES * scale))
+
+    product_names = [f'Product {i}' for i in range(n_products)]
+    popularity = 1.0 / np.arange(1, n_products + 1)
+    popularity /= popularity.sum()
+
+    products_df = pd.DataFrame({
+        'Name': product_names,
+        'Category': rng.choice(CATEGORIES, size=n_products),
+        'Description': [phrase(rng, 6, 20) for _ in range(n_products)],
+    })
+
+    accelerators_df = pd.DataFrame({
+        'Name': [f'Accelerator {i}' for i in range(n_accelerators)],
+        'Product': [product_names[i] for i in rng.choice(n_products, size=n_accelerators, p=popularity)],
+        'Short description': [phrase(rng, 3, 10) for _ in range(n_accelerators)],
+        'Type': rng.choice(ACCELERATOR_TYPES, size=n_accelerators),
+    })
+
+    company_names = [f'Company {i}' for i in range(n_companies)]
+    companies_df = pd.DataFrame({'Name': company_names})
+
+    entitlements = []
+    for company in company_names:
+        size = min(n_products, max(1, int(rng.poisson(ENTITLEMENTS_PER_COMPANY))))
+        for product in rng.choice(n_products, size=size, replace=False, p=popularity):
+            entitlements.append((company, product_names[product], bool(rng.random() < IMPLEMENTED_RATE)))
+    entitlements_df = pd.DataFrame(entitlements, columns=['Company', 'Product', 'Implemented'])
+
+    return {
+        'products': products_df,
+        'accelerators': accelerators_df,
+        'companies': companies_df,
+        'entitlements': entitlements_df,
+    }
+
+
+# Function to write the synthetic workbooks into a data directory
+def write_dataset(out_dir, scale=1.0, seed=0) -> dict:
+    """Writes products/accelerators/companies/entitlements.xlsx into ``out_dir`` and returns the row counts."""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = generate_tables(scale, seed)
+    for name, df in tables.items():
+        df.to_excel(os.path.join(out_dir, f'{name}.xlsx'), index=False)
+    return {name: len(df) for name, df in tables.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic recommendation engine workbooks.')
+    parser.add_argument('out_dir', help='directory to write the workbooks into (use it as ARE_DATA_DIR)')
+    parser.add_argument('--scale', type=float, default=1.0, help='size multiplier over the base dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = write_dataset(args.out_dir, args.scale, args.seed)
+    print(', '.join(f'{name}: {count}' for name, count in counts.items()))
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+# Gunicorn settings: `gunicorn -c gunicorn.conf.py app:app`
+bind = os.environ.get('ARE_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('ARE_WORKERS', '5'))
+
+# Threads per worker (more than 1 uses the gthread worker); concurrent requests of a worker
+# can then share one scoring call when ARE_COALESCE_WINDOW_MS is set
+threads = int(os.environ.get('ARE_THREADS', '1'))
+
+# Load the app (catalog snapshot, TF-IDF matrix, KNN similarity matrix) once in the master
+# so all workers fork with the same read-only, memory-mapped model pages
+preload_app = os.environ.get('ARE_PRELOAD', '1') != '0'
+
+# Every worker writes its metrics to this directory, so a /metrics scrape answered by any worker covers
+# the whole server (set here, before the app is loaded, for the master and the workers it forks)
+if not os.environ.get('ARE_METRICS_DIR'):
+    os.environ['ARE_METRICS_DIR'] = tempfile.mkdtemp(prefix='are-metrics-')
+
+
+def on_starting(server):
+    # Counters of a previous run in the same metrics directory would be added to this one's
+    from src.metrics import registry
+    registry.clear_directory()
+
+    # Without preloading, still compile the snapshot and model artifacts once in the master:
+    # workers then only memory-map the files instead of each parsing and fitting
+    if not preload_app:
+        from src.catalog import build_snapshot
+        build_snapshot()
+        from src import model_bundle
+        model_bundle.current()
+
+
+def post_fork(server, worker):
+    # Each worker watches the workbooks and swaps in rebuilt models (ARE_RELOAD_INTERVAL)
+    from src import model_bundle
+    model_bundle.start_watcher()
+    # ... and writes its metrics for the scrapes answered by the other workers
+    from src.metrics import registry
+    registry.start_flusher()
+
+
+def child_exit(server, worker):
+    # Keep the counters of an exited worker in the server totals (its gauges are dropped)
+    from src.metrics import registry
+    registry.archive_process(worker.pid)
@@ -0,0 +1,193 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+from src import config
+
+# Columns of the output file (one row per company, source and rank)
+OUTPUT_COLUMNS = ['company', 'source', 'rank', 'product', 'score', 'collaborative', 'content']
+
+# Companies scored per pool task
+DEFAULT_SHARD_SIZE = 256
+
+# Options of the current job, set before the pool starts (inherited by forked workers)
+_options = {}
+
+
+# Function to build the content input used for a company's hybrid recommendations
+def company_profiles(products_df, entitlements_df) -> dict:
+    """Returns company -> the category and description text of the products it holds."""
+    texts = (products_df['Category'].fillna('').astype(str) + ' ' + products_df['Description'].fillna('').astype(str))
+    product_text = dict(zip(products_df['Name'], texts))
+    profiles = {}
+    for company, product in entitlements_df[['Company', 'Product']].itertuples(index=False):
+        profiles.setdefault(company, []).append(product_text.get(product, ''))
+    return {company: ' '.join(parts).strip() for company, parts in profiles.items()}
+
+
+# Function to set up a pool worker
+def init_worker(options):
+    """Stores the job options and loads the models (already loaded when the worker was forked)."""
+    _options.update(options)
+    from src import model_bundle
+    model_bundle.current()
+
+
+# Function to score one shard of companies
+def score_shard(shard) -> list:
+    """Returns the output rows of the top-k collaborative and hybrid recommendations of each (company, input)."""
+    from src import model_bundle
+
+    # One model for the whole shard, even if the catalog is reloaded meanwhile
+    model = model_bundle.current().hybrid
+    state = model.sync_entitlement_updates()
+    top_n = _options['top_n']
+    rows = []
+    for company, customer_input in shard:
+        for rank, (product, score) in enumerate(model.cf_engine.rank_products(state, company, top_n), 1):
+            rows.append((company, 'collaborative', rank, product, score, score, None))
+        recs = model.hybrid_ranker.rank(
+            state, company, customer_input, _options['collaborative_weight'], _options['content_weight'], top_n,
+        )
+        for rank, rec in enumerate(recs, 1):
+            rows.append((company, 'hybrid', rank, rec['product'], rec['score'], rec['collaborative'], rec['content']))
+    return rows
+
+
+class OutputWriter:
+    """Writes output rows as CSV or JSON lines while they arrive, or as Parquet at the end.
+
+    The file is written under a temporary name and moved into place when complete, so a
+    reader never sees a partial refresh.
+    """
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.format = output_format
+        self.tmp_path = f'{path}.{os.getpid()}.tmp'
+        self.count = 0
+        self._rows = []
+        self._file = None
+        if output_format == 'csv':
+            self._file = open(self.tmp_path, 'w', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(OUTPUT_COLUMNS)
+        elif output_format == 'jsonl':
+            self._file = open(self.tmp_path, 'w')
+        else:
+            # Fail before scoring if no Parquet engine (pyarrow or fastparquet) is installed
+            pd.io.parquet.get_engine('auto')
+
+    def write(self, rows) -> None:
+        """Adds output rows (tuples in OUTPUT_COLUMNS order)."""
+        self.count += len(rows)
+        if self.format == 'csv':
+            self._csv.writerows(rows)
+        elif self.format == 'jsonl':
+            self._file.writelines(json.dumps(dict(zip(OUTPUT_COLUMNS, row))) + '\n' for row in rows)
+        else:
+            self._rows.extend(rows)
+
+    def close(self) -> None:
+        """Finishes the file and moves it into place."""
+        if self._file is not None:
+            self._file.close()
+        else:
+            pd.DataFrame(self._rows, columns=OUTPUT_COLUMNS).to_parquet(self.tmp_path, index=False)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        """Discards the partial file."""
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+# Function to report progress on stderr
+def report_progress(done, total, started) -> None:
+    """Rewrites the progress line with the scoring rate and estimated time left."""
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    # Redraw one line on a terminal, one line per update in logs
+    end = '' if sys.stderr.isatty() else '\n'
+    print(f'\rScored {done}/{total} companies ({rate:.0f}/s, ETA {eta:.0f}s)', end=end, file=sys.stderr, flush=True)
+
+
+# Function to score every company into an output file
+def run(output, output_format, top_n, workers, shard_size, collaborative_weight, content_weight, query=None) -> int:
+    """Scores all companies of companies.xlsx and writes the recommendations to ``output``; returns the row count."""
+    # Load the models once in this process: forked workers share them
+    from src import model_bundle
+    from src.companies import company_directory
+
+    catalog = model_bundle.current().catalog
+    companies = company_directory.get().names
+    if query is None:
+        profiles = company_profiles(catalog.products_df, catalog.entitlements_df)
+        inputs = [(company, profiles.get(company, '')) for company in companies]
+    else:
+        inputs = [(company, query) for company in companies]
+    shards = [inputs[start:start + shard_size] for start in range(0, len(inputs), shard_size)]
+
+    options = {
+        'top_n': top_n,
+        'collaborative_weight': collaborative_weight,
+        'content_weight': content_weight,
+    }
+    writer = OutputWriter(output, output_format)
+    started, done = time.perf_counter(), 0
+    try:
+        if workers <= 1:
+            init_worker(options)
+            for shard in shards:
+                writer.write(score_shard(shard))
+                done += len(shard)
+                report_progress(done, len(inputs), started)
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with context.Pool(workers, initializer=init_worker, initargs=(options,)) as pool:
+                # imap keeps the companies in workbook order while shards are scored in parallel
+                for shard, rows in zip(shards, pool.imap(score_shard, shards)):
+                    writer.write(rows)
+                    done += len(shard)
+                    report_progress(done, len(inputs), started)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    return writer.count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score collaborative and hybrid recommendations for every company.')
+    parser.add_argument('output', help='output file')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], help='output format (default: from the extension)')
+    parser.add_argument('--top-n', type=int, default=10, help='recommendations per company and source')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='scoring processes (1 scores inline)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='companies per pool task')
+    parser.add_argument('--query', help='content input used for every company (default: the company\'s product profile)')
+    parser.add_argument('--collaborative-weight', type=float, default=config.HYBRID_COLLABORATIVE_WEIGHT)
+    parser.add_argument('--content-weight', type=float, default=config.HYBRID_CONTENT_WEIGHT)
+    args = parser.parse_args()
+
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if output_format not in ('csv', 'jsonl', 'parquet'):
+        parser.error('cannot infer the output format from the file name; pass --format')
+    if args.top_n < 1 or args.shard_size < 1:
+        parser.error('--top-n and --shard-size must be positive')
+
+    started = time.perf_counter()
+    count = run(args.output, output_format, args.top_n, args.workers, args.shard_size,
+                args.collaborative_weight, args.content_weight, args.query)
+    print(f'Wrote {count} recommendations to {args.output} in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,492 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src import config
+from src.matcher import NameMatcher
+from src.metrics import registry
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout or the feature recipe changes
+SNAPSHOT_FORMAT = 1
+
+# Tables of the catalog, in memory report order
+TABLE_NAMES = ('products_df', 'accelerators_df', 'merged_df', 'info_df', 'entitlements_df')
+
+# Workbooks compiled into the snapshot
+SOURCE_FILES = {
+    'products': 'products.xlsx',
+    'accelerators': 'accelerators.xlsx',
+    'entitlements': 'entitlements.xlsx',
+}
+
+# Entitlement change journals (src/entitlements.py), one per entitlements workbook content, kept next
+# to the snapshot versions and pruned with the versions that read them
+JOURNAL_PREFIX = 'entitlement_deltas'
+
+
+class AcceleratorRecord(NamedTuple):
+    """Display fields of one recommender row (merged_df), precomputed so requests only index a list."""
+    accelerator: str
+    product: str
+    category: str
+    short_description: str
+    html_item: str  # list item of the HTML recommendation output
+
+    def to_dict(self, score) -> dict:
+        """Returns the JSON form of the record with its similarity score."""
+        return {
+            'accelerator': self.accelerator,
+            'product': self.product,
+            'category': self.category,
+            'short_description': self.short_description,
+            'score': float(score),
+        }
+
+
+# Function to precompute the display records of the recommender rows
+def accelerator_records(merged_df: pd.DataFrame) -> list:
+    """Returns one AcceleratorRecord per merged_df row, in row order (aligned with the TF-IDF matrix)."""
+    columns = merged_df[['Name_y', 'Name_x', 'Category', 'Short description']]
+    return [
+        AcceleratorRecord(accelerator, product, category, short, f"<li>{accelerator}, Short description: {short}</li>")
+        for accelerator, product, category, short in columns.itertuples(index=False)
+    ]
+
+
+@dataclass
+class Catalog:
+    """Loaded catalog tables and the fitted TF-IDF model."""
+    version: str
+    products_df: pd.DataFrame
+    accelerators_df: pd.DataFrame
+    merged_df: pd.DataFrame  # products inner-join accelerators, used by the recommenders
+    info_df: pd.DataFrame  # accelerators left-join products, used by the LLM processors
+    entitlements_df: pd.DataFrame
+    tfidf: TfidfVectorizer
+    tfidf_matrix: sparse.csr_matrix
+    # Content hash of the entitlements workbook: entitlement changes are journaled per workbook content
+    entitlements_version: str = ''
+    # Name matchers built at load; payloads are row positions in info_df / products_df
+    accelerator_matcher: NameMatcher = field(default=None, repr=False)
+    product_matcher: NameMatcher = field(default=None, repr=False)
+    # Display records of the merged_df rows
+    records: list = field(default=None, repr=False)
+
+    @cached_property
+    def memory(self) -> dict:
+        """Bytes held per component, measured on first use (see memory_report)."""
+        return memory_report(self)
+
+    def __post_init__(self):
+        if self.records is None:
+            self.records = accelerator_records(self.merged_df)
+        if self.accelerator_matcher is None:
+            self.accelerator_matcher = NameMatcher(
+                (name, row) for row, name in enumerate(self.info_df['Name_x']) if pd.notna(name)
+            )
+        if self.product_matcher is None:
+            self.product_matcher = NameMatcher(
+                (name, row) for row, name in enumerate(self.products_df['Name']) if pd.notna(name)
+            )
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+# Function to share one string object per distinct value across the catalog tables
+def intern_strings(tables: dict) -> None:
+    """Replaces, in place, the string cells of every table by one shared object per distinct value.
+
+    Names repeated across rows and tables (companies and products in the entitlements, product and
+    category columns of both merged views) then cost one pointer per cell instead of one string each.
+    """
+    pool = {}
+    for df in tables.values():
+        for column in df.columns[df.dtypes == object]:
+            df[column] = np.array([pool.setdefault(v, v) if isinstance(v, str) else v for v in df[column]], dtype=object)
+
+
+# Function to measure the memory held by a catalog
+def memory_report(catalog: Catalog) -> dict:
+    """Returns the bytes held per catalog component.
+
+    A string shared between components is counted once, in the first component holding it.
+    The TF-IDF matrix is memory-mapped from the snapshot, so its pages are shared by all workers.
+    """
+    seen = set()
+
+    def string_bytes(values) -> int:
+        total = 0
+        for value in values:
+            if isinstance(value, str) and id(value) not in seen:
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+        return total
+
+    report = {}
+    for name in TABLE_NAMES:
+        df = getattr(catalog, name)
+        report[name] = int(df.memory_usage(deep=False).sum()) + sum(
+            string_bytes(df[column]) for column in df.columns[df.dtypes == object]
+        )
+    report['records'] = sys.getsizeof(catalog.records) + sum(
+        sys.getsizeof(record) + string_bytes(record) for record in catalog.records
+    )
+    matrix = catalog.tfidf_matrix
+    report['tfidf_matrix'] = int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+    report['tfidf_vocabulary'] = (
+        sys.getsizeof(catalog.tfidf.vocabulary_) + string_bytes(catalog.tfidf.vocabulary_) + catalog.tfidf.idf_.nbytes
+    )
+    return report
+
+
+# Function to build the path of a file inside a snapshot version
+def snapshot_path(version: str, file_name: str) -> str:
+    """Returns the path of ``file_name`` inside the snapshot directory of ``version``."""
+    return os.path.join(config.SNAPSHOT_DIR, version, file_name)
+
+
+# Function to serialize snapshot writes across processes
+@contextmanager
+def snapshot_lock():
+    """Holds an exclusive lock on the snapshot directory while writing to it."""
+    os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(config.SNAPSHOT_DIR, '.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# Function to load a NumPy array stored in a snapshot
+def load_array(version: str, file_name: str) -> np.ndarray:
+    """Loads an array from the snapshot, memory-mapped read-only when MMAP_MODELS is enabled."""
+    return np.load(snapshot_path(version, file_name), mmap_mode='r' if config.MMAP_MODELS else None)
+
+
+# Function to hash a file's contents
+def _file_sha256(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to fingerprint the source workbooks
+def source_fingerprint(previous: dict | None = None) -> dict:
+    """Returns size, mtime and hash of every source workbook.
+
+    Hashes from ``previous`` are reused for files whose size and mtime are unchanged,
+    so checking an up-to-date snapshot never reads the workbooks.
+    """
+    previous = previous or {}
+    fingerprint = {}
+    for name, file_name in SOURCE_FILES.items():
+        stat = os.stat(config.data_path(file_name))
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        old = previous.get(name)
+        if old and old['size'] == entry['size'] and old['mtime_ns'] == entry['mtime_ns']:
+            entry['sha256'] = old['sha256']
+        else:
+            entry['sha256'] = _file_sha256(config.data_path(file_name))
+        fingerprint[name] = entry
+    return fingerprint
+
+
+# Function to identify the entitlements workbook a snapshot was built from
+def entitlements_version(manifest: dict) -> str:
+    """Returns a short id of the entitlements workbook contents compiled into a snapshot."""
+    return manifest['sources']['entitlements']['sha256'][:16]
+
+
+# Function to derive the snapshot version from the source hashes
+def _snapshot_version(fingerprint: dict) -> str:
+    """Returns a short version id identifying the source contents and build recipe."""
+    digest = hashlib.sha256(f'{SNAPSHOT_FORMAT}:{sklearn.__version__}'.encode())
+    for name in sorted(fingerprint):
+        digest.update(f'{name}:{fingerprint[name]["sha256"]}'.encode())
+    return digest.hexdigest()[:16]
+
+
+# Function to read and prepare the catalog tables from the Excel workbooks
+def _read_sources() -> dict:
+    """Parses the workbooks and returns the prepared catalog tables."""
+    products_df = pd.read_excel(config.data_path(SOURCE_FILES['products']))
+    accelerators_df = pd.read_excel(config.data_path(SOURCE_FILES['accelerators']))
+    entitlements_df = pd.read_excel(config.data_path(SOURCE_FILES['entitlements']))
+
+    # Strip leading and trailing spaces from column names
+    products_df.columns = products_df.columns.str.strip()
+    accelerators_df.columns = accelerators_df.columns.str.strip()
+
+    # Merge the products and accelerators DataFrames based on 'Name' and 'Product'
+    merged_df = pd.merge(products_df, accelerators_df, left_on='Name', right_on='Product', how='inner')
+
+    # Handle missing values
+    merged_df['Category'] = merged_df['Category'].fillna('')
+    merged_df['Description'] = merged_df['Description'].fillna('')
+    merged_df['Short description'] = merged_df['Short description'].fillna('')
+    merged_df['Type'] = merged_df['Type'].fillna('')
+
+    # Combine relevant fields to create a comprehensive feature (Category + Description + Short description + Type)
+    merged_df['features'] = (
+        merged_df['Category'] + ' ' +
+        merged_df['Description'] + ' ' +
+        merged_df['Short description'] + ' ' +
+        merged_df['Type']
+    )
+
+    # Accelerator-centric view used to answer product-info questions
+    info_df = pd.merge(accelerators_df, products_df, how='left', left_on='Product', right_on='Name')
+
+    return {
+        'products_df': products_df,
+        'accelerators_df': accelerators_df,
+        'merged_df': merged_df,
+        'info_df': info_df,
+        'entitlements_df': entitlements_df,
+    }
+
+
+# Function to write the snapshot files for one version
+def _write_snapshot(version_dir: str, tables: dict, tfidf: TfidfVectorizer,
+                    tfidf_matrix: sparse.csr_matrix, manifest: dict) -> None:
+    """Writes tables, vectorizer and matrix arrays, then the manifest marking the snapshot complete."""
+    os.makedirs(version_dir, exist_ok=True)
+    with open(os.path.join(version_dir, 'tables.pkl'), 'wb') as f:
+        pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(os.path.join(version_dir, 'tfidf.pkl'), 'wb') as f:
+        pickle.dump(tfidf, f, protocol=pickle.HIGHEST_PROTOCOL)
+    np.save(os.path.join(version_dir, 'tfidf_data.npy'), tfidf_matrix.data)
+    np.save(os.path.join(version_dir, 'tfidf_indices.npy'), tfidf_matrix.indices)
+    np.save(os.path.join(version_dir, 'tfidf_indptr.npy'), tfidf_matrix.indptr)
+    _write_manifest(version_dir, manifest)
+
+
+# Function to write a snapshot manifest atomically
+def _write_manifest(version_dir: str, manifest: dict) -> None:
+    """Writes manifest.json through a temporary file so readers never see a partial manifest."""
+    manifest_path = os.path.join(version_dir, 'manifest.json')
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# Function to point the snapshot directory at a version
+def _set_current(version: str) -> None:
+    """Atomically records ``version`` as the current snapshot and prunes older ones.
+
+    The previously current version is kept so processes still loading it are not disturbed, and
+    so are the entitlement journals of the kept versions' entitlements workbooks.
+    """
+    current_path = os.path.join(config.SNAPSHOT_DIR, 'CURRENT')
+    previous = _read_current_manifest()
+    keep = {version, previous['version'] if previous else None}
+    with open(os.path.join(config.SNAPSHOT_DIR, version, 'manifest.json')) as f:
+        manifests = [json.load(f)] + ([previous] if previous else [])
+    keep.update(f'{JOURNAL_PREFIX}-{entitlements_version(manifest)}.jsonl' for manifest in manifests)
+    tmp_path = f'{current_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, current_path)
+
+    for entry in os.listdir(config.SNAPSHOT_DIR):
+        entry_path = os.path.join(config.SNAPSHOT_DIR, entry)
+        if entry not in keep and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        elif entry not in keep and entry.startswith(JOURNAL_PREFIX) and entry.endswith('.jsonl'):
+            # Changes on top of a workbook no kept version was built from: the workbook replaced them
+            os.remove(entry_path)
+
+
+# Function to read the manifest of the current snapshot
+def _read_current_manifest() -> dict | None:
+    """Returns the manifest of the current snapshot, or None if there is no complete snapshot."""
+    try:
+        with open(os.path.join(config.SNAPSHOT_DIR, 'CURRENT')) as f:
+            version = f.read().strip()
+        with open(os.path.join(config.SNAPSHOT_DIR, version, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('version') != version:
+        return None
+    return manifest
+
+
+# Function to check whether the current snapshot matches the workbooks
+def _fresh_manifest() -> tuple[dict | None, dict]:
+    """Returns the current manifest if it is up to date (else None) together with the source fingerprint."""
+    manifest = _read_current_manifest()
+    fingerprint = source_fingerprint(manifest['sources'] if manifest else None)
+    if manifest is None or manifest['version'] != _snapshot_version(fingerprint):
+        return None, fingerprint
+    return manifest, fingerprint
+
+
+# Function to compile the workbooks into a snapshot
+def build_snapshot(force: bool = False) -> str:
+    """Compiles the workbooks into a snapshot unless an up-to-date one exists; returns its version."""
+    # Serialize builds so concurrently starting workers compile the workbooks only once
+    with snapshot_lock():
+        manifest, fingerprint = _fresh_manifest()
+        if manifest is not None and not force:
+            if manifest['sources'] != fingerprint:
+                # Same contents under new mtimes (e.g. a fresh checkout): record them to skip rehashing
+                manifest['sources'] = fingerprint
+                _write_manifest(os.path.join(config.SNAPSHOT_DIR, manifest['version']), manifest)
+            return manifest['version']
+
+        version = _snapshot_version(fingerprint)
+        logger.info('Building catalog snapshot %s', version)
+        tables = _read_sources()
+
+        # Initialize TF-IDF vectorizer
+        tfidf = TfidfVectorizer(stop_words='english')
+        tfidf_matrix = tfidf.fit_transform(tables['merged_df']['features']).tocsr()
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'version': version,
+            'sklearn': sklearn.__version__,
+            'sources': fingerprint,
+            'shape': list(tfidf_matrix.shape),
+        }
+        version_dir = os.path.join(config.SNAPSHOT_DIR, version)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        _write_snapshot(version_dir, tables, tfidf, tfidf_matrix, manifest)
+        _set_current(version)
+        return version
+
+
+# Function to load a snapshot version from disk
+def _load_snapshot(version: str) -> Catalog:
+    """Loads the snapshot files of ``version`` into a Catalog."""
+    with open(snapshot_path(version, 'tables.pkl'), 'rb') as f:
+        tables = pickle.load(f)
+    with open(snapshot_path(version, 'tfidf.pkl'), 'rb') as f:
+        tfidf = pickle.load(f)
+    # The feature text was only needed to fit the TF-IDF model
+    del tables['merged_df']['features']
+    intern_strings(tables)
+    with open(snapshot_path(version, 'manifest.json')) as f:
+        manifest = json.load(f)
+    # The CSR arrays stay backed by the snapshot files so every worker shares the same pages
+    tfidf_matrix = sparse.csr_matrix(
+        (
+            load_array(version, 'tfidf_data.npy'),
+            load_array(version, 'tfidf_indices.npy'),
+            load_array(version, 'tfidf_indptr.npy'),
+        ),
+        shape=tuple(manifest['shape']),
+        copy=False,
+    )
+    return Catalog(version=version, tfidf=tfidf, tfidf_matrix=tfidf_matrix,
+                   entitlements_version=entitlements_version(manifest), **tables)
+
+
+# Function to warn when a catalog exceeds the memory budget
+def _check_memory(catalog: Catalog) -> None:
+    if config.CATALOG_MEMORY_WARN_MB:
+        total_mb = sum(catalog.memory.values()) / 2 ** 20
+        if total_mb > config.CATALOG_MEMORY_WARN_MB:
+            logger.warning('Catalog %s holds %.0f MB, above the %.0f MB budget: %s',
+                           catalog.version, total_mb, config.CATALOG_MEMORY_WARN_MB, catalog.memory)
+
+
+# Function to get the shared catalog, building the snapshot when the workbooks changed
+def get_catalog(rebuild: bool = True) -> Catalog:
+    """Returns the process-wide catalog, loading it from the snapshot on first use.
+
+    With ``rebuild=False`` an existing snapshot is loaded even if the workbooks changed since,
+    which lets tools attach to the version the running workers serve.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                manifest = None if rebuild else _read_current_manifest()
+                _catalog = _load_snapshot(manifest['version'] if manifest else build_snapshot())
+                _check_memory(_catalog)
+    return _catalog
+
+
+# Function to load the latest snapshot when it differs from the served version
+def latest_catalog(served_version: str) -> Catalog | None:
+    """Builds the snapshot if the workbooks changed; returns its catalog, or None if ``served_version`` is current.
+
+    The returned catalog is not shared until ``set_catalog`` is called, so it can be prepared aside.
+    """
+    version = build_snapshot()
+    if version == served_version:
+        return None
+    catalog = _load_snapshot(version)
+    _check_memory(catalog)
+    return catalog
+
+
+# Function to replace the shared catalog
+def set_catalog(catalog: Catalog) -> None:
+    """Makes ``catalog`` the one returned by ``get_catalog`` from now on."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+# Function to expose the catalog memory as metrics
+def catalog_metrics():
+    """Returns the bytes held per component of the loaded catalog as metric samples (measured once)."""
+    if _catalog is None:
+        return []
+    return [
+        ('are_catalog_bytes', 'gauge', 'Memory held by the loaded catalog, per component.', {'component': name}, size)
+        for name, size in _catalog.memory.items()
+    ]
+
+
+registry.add_collector(catalog_metrics)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile the catalog workbooks into a binary snapshot.')
+    parser.add_argument('command', choices=['build', 'status', 'memory'])
+    parser.add_argument('--force', action='store_true', help='rebuild even if the snapshot is up to date')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'build':
+        print(f'Catalog snapshot {build_snapshot(force=args.force)} is ready in {config.SNAPSHOT_DIR}')
+    elif args.command == 'memory':
+        catalog = get_catalog(rebuild=False)
+        for name, size in catalog.memory.items():
+            print(f'{name:<18} {size / 2 ** 20:10.2f} MB')
+        print(f'{"total":<18} {sum(catalog.memory.values()) / 2 ** 20:10.2f} MB')
+    else:
+        manifest, _ = _fresh_manifest()
+        print(f'Catalog snapshot {manifest["version"]} is up to date' if manifest else 'Catalog snapshot is stale or missing')
@@ -0,0 +1,319 @@
+import logging
+from dataclasses import dataclass, replace
+
+import numpy as np
+from scipy import sparse
+from surprise.prediction_algorithms.knns import SymmetricAlgo
+
+from src.ranking import top_n_indices
+
+logger = logging.getLogger(__name__)
+
+# Companies per block when computing the similarity matrix (bounds the temporary arrays)
+SIM_BLOCK_ROWS = 1024
+
+
+@dataclass(frozen=True)
+class CFState:
+    """Array form of a fitted user-based KNNBasic model (rows = companies, columns = products)."""
+    company_index: dict  # raw company name -> row
+    product_ids: np.ndarray  # column -> raw product name
+    ratings: sparse.csc_matrix  # entitlement ratings
+    rated: sparse.csc_matrix  # 1.0 where the company holds the product
+    entitled: sparse.csr_matrix  # same indicator, row-sliceable for exclusion
+    crowded: np.ndarray  # products rated by more than k companies
+    sim: 'PatchedSimilarity'  # company x company similarity matrix
+    k: int
+    min_k: int
+    min_support: int
+    global_mean: float
+    rating_scale: tuple
+
+
+class PatchedSimilarity:
+    """Company similarity matrix: the fitted (shared, possibly memory-mapped) matrix plus patched rows.
+
+    Entitlement changes only alter the similarities of the companies they touch, so instead of
+    copying the whole n x n matrix, ``with_rows`` returns a new matrix holding the recomputed rows
+    of those companies on top of the same base. The matrix is symmetric: the column of a patched
+    company in an unpatched row is read from its patch. Patches take (patched companies x n)
+    floats and accumulate until the next reload builds a new base; the instances never change.
+    """
+
+    def __init__(self, base, rows=None, patches=None):
+        self.base = base
+        self.rows = np.zeros(0, dtype=np.intp) if rows is None else rows
+        self.patches = np.zeros((0, base.shape[0])) if patches is None else patches
+        self.position = {row: pos for pos, row in enumerate(self.rows.tolist())}
+
+    @property
+    def shape(self) -> tuple:
+        return (self.patches.shape[1], self.patches.shape[1])
+
+    def __getitem__(self, row) -> np.ndarray:
+        """Returns the similarities of company ``row`` with every company."""
+        pos = self.position.get(row)
+        if pos is not None:
+            return self.patches[pos]
+        sim_row = np.zeros(self.shape[0])
+        n_base = self.base.shape[0]
+        if row < n_base:
+            sim_row[:n_base] = self.base[row]
+        sim_row[self.rows] = self.patches[:, row]
+        return sim_row
+
+    def with_rows(self, rows, block) -> 'PatchedSimilarity':
+        """Returns the matrix with the rows (and columns) of companies ``rows`` replaced by ``block``.
+
+        ``block`` may cover companies appended since this matrix was built; existing patches are
+        copied, padded to the new size and given the new similarities of ``rows``.
+        """
+        size = block.shape[1]
+        kept = np.isin(self.rows, rows, invert=True)
+        kept_rows = self.rows[kept]
+        patches = np.zeros((kept_rows.size + len(rows), size))
+        patches[:kept_rows.size, :self.shape[0]] = self.patches[kept]
+        patches[:kept_rows.size, rows] = block[:, kept_rows].T
+        patches[kept_rows.size:] = block
+        return PatchedSimilarity(self.base, np.concatenate([kept_rows, rows]), patches)
+
+    def toarray(self) -> np.ndarray:
+        """Returns the whole matrix as a dense array (n x n floats: for tests and small models)."""
+        return np.array([self[row] for row in range(self.shape[0])])
+
+
+# Function to build the rating matrices from (company, product, rating) triples
+def rating_matrices(triples, shape):
+    """Returns (ratings, rated) CSC matrices; a repeated (company, product) pair keeps its last rating."""
+    latest = {(u, i): r for u, i, r in triples}
+    rows = np.fromiter((u for u, _ in latest), dtype=np.int64, count=len(latest))
+    cols = np.fromiter((i for _, i in latest), dtype=np.int64, count=len(latest))
+    values = np.fromiter(latest.values(), dtype=float, count=len(latest))
+    ratings = sparse.csc_matrix((values, (rows, cols)), shape=shape)
+    rated = sparse.csc_matrix((np.ones(len(latest)), (rows, cols)), shape=shape)
+    return ratings, rated
+
+
+# Function to convert a fitted KNNBasic model into its array form
+def build_cf_state(algo) -> CFState:
+    """Builds the CFState of a user-based KNNBasic model fitted on a Surprise trainset."""
+    trainset = algo.trainset
+    shape = (trainset.n_users, trainset.n_items)
+    ratings, rated = rating_matrices(trainset.all_ratings(), shape)
+    return CFState(
+        company_index={trainset.to_raw_uid(u): u for u in range(trainset.n_users)},
+        product_ids=np.array([trainset.to_raw_iid(i) for i in range(trainset.n_items)], dtype=object),
+        ratings=ratings,
+        rated=rated,
+        entitled=rated.tocsr(),
+        crowded=np.flatnonzero(np.diff(rated.indptr) > algo.k),
+        sim=PatchedSimilarity(algo.sim),
+        k=algo.k,
+        min_k=algo.min_k,
+        min_support=algo.sim_options.get('min_support', 1),
+        global_mean=trainset.global_mean,
+        rating_scale=trainset.rating_scale,
+    )
+
+
+# Function to compute cosine similarities of some companies against all companies
+def cosine_rows(ratings, rated, rows, min_support=1) -> tuple:
+    """Returns the (len(rows) x companies) block of Surprise's cosine similarity matrix and its undefined pairs.
+
+    As in surprise.similarities.cosine, the norms only cover products both companies rated.
+    Surprise raises ZeroDivisionError for pairs whose common products are all rated 0 (one norm
+    is 0); they get a similarity of 0 here and are counted as undefined.
+    """
+    ratings = ratings.tocsr()
+    rated = rated.tocsr()
+    row_ratings = ratings[rows]
+    row_rated = rated[rows]
+    prods = (row_ratings @ ratings.T).toarray()
+    sq_row = (row_ratings.multiply(row_ratings) @ rated.T).toarray()
+    sq_other = (row_rated @ ratings.multiply(ratings).T).toarray()
+    freq = (row_rated @ rated.T).toarray()
+    denom = np.sqrt(sq_row * sq_other)
+
+    sim = np.zeros(prods.shape)
+    supported = freq >= min_support
+    defined = supported & (denom > 0)
+    sim[defined] = prods[defined] / denom[defined]
+    sim[np.arange(len(rows)), rows] = 1.0
+    return sim, int(np.count_nonzero(supported & ~defined))
+
+
+# Function to compute the similarity rows of some companies
+def similarity_rows(ratings, rated, rows, min_support=1) -> np.ndarray:
+    """Returns the (len(rows) x companies) block of Surprise's cosine similarity matrix (see cosine_rows)."""
+    return cosine_rows(ratings, rated, rows, min_support)[0]
+
+
+# Function to compute the company similarity matrix of a trainset
+def compute_similarity(trainset, min_support=1) -> np.ndarray:
+    """Returns Surprise's user-based cosine similarity matrix, computed block-wise with sparse products.
+
+    The values are those KNNBasic.fit computes, except for the pairs Surprise cannot score
+    (their only common products are rated 0, which makes its cosine raise ZeroDivisionError):
+    they get a similarity of 0, and their number is logged.
+    """
+    shape = (trainset.n_users, trainset.n_items)
+    ratings, rated = rating_matrices(trainset.all_ratings(), shape)
+    ratings, rated = ratings.tocsr(), rated.tocsr()
+    sim = np.empty((shape[0], shape[0]))
+    undefined = 0
+    for start in range(0, shape[0], SIM_BLOCK_ROWS):
+        rows = np.arange(start, min(shape[0], start + SIM_BLOCK_ROWS))
+        sim[rows], block_undefined = cosine_rows(ratings, rated, rows, min_support)
+        undefined += block_undefined
+    if undefined:
+        # Each pair appears in both of its rows
+        logger.info('%d company pairs only share products rated 0: similarity set to 0', undefined // 2)
+    return sim
+
+
+# Function to fit a KNN model's similarity matrix
+def fit_similarity(algo, trainset):
+    """Fits ``algo`` on ``trainset`` like its own fit, with user-based cosine computed by compute_similarity.
+
+    The 0/1 entitlement ratings make Surprise's cosine raise for some pairs (see compute_similarity);
+    other similarity measures use Surprise's fit.
+    """
+    if algo.sim_options.get('name') == 'cosine' and algo.sim_options.get('user_based', True):
+        SymmetricAlgo.fit(algo, trainset)
+        algo.sim = compute_similarity(trainset, algo.sim_options.get('min_support', 1))
+    else:
+        algo.fit(trainset)
+    return algo
+
+
+# Function to merge entitlement changes into the rating matrices of a model state
+def merge_deltas(state, deltas) -> tuple:
+    """Returns (company_index, product_ids, ratings, rated, affected company rows) after ``deltas``.
+
+    Works on any state with company_index, product_ids, ratings and rated; new companies and
+    products are appended after the existing rows and columns. The changed cells are applied as
+    sparse matrix operations, so the cost is linear in the number of stored ratings.
+    """
+    company_index = dict(state.company_index)
+    product_ids = list(state.product_ids)
+    product_index = {product: col for col, product in enumerate(product_ids)}
+
+    # Last change of each (company, product) cell; None removes the rating
+    changes = {}
+    for delta in deltas:
+        row = company_index.setdefault(delta['company'], len(company_index))
+        col = product_index.get(delta['product'])
+        if col is None:
+            col = product_index[delta['product']] = len(product_ids)
+            product_ids.append(delta['product'])
+        changes[(row, col)] = None if delta.get('removed') else float(delta['rating'])
+
+    shape = (len(company_index), len(product_ids))
+    ratings = state.ratings.copy()
+    ratings.resize(shape)
+    rated = state.rated.copy()
+    rated.resize(shape)
+    if changes:
+        # Clear every changed cell, then add the new ratings
+        touched, _ = rating_matrices(((u, i, 1.0) for u, i in changes), shape)
+        kept = rated - rated.multiply(touched)
+        kept.eliminate_zeros()
+        new_ratings, new_rated = rating_matrices(((u, i, r) for (u, i), r in changes.items() if r is not None), shape)
+        ratings = sparse.csc_matrix(ratings.multiply(kept) + new_ratings)
+        rated = sparse.csc_matrix(kept + new_rated)
+        rated.eliminate_zeros()
+
+    affected = {row for row, _ in changes}
+    return company_index, np.array(product_ids, dtype=object), ratings, rated, affected
+
+
+# Function to apply entitlement changes to a model state
+def apply_entitlement_deltas(state: CFState, deltas) -> CFState:
+    """Returns a new CFState with ``deltas`` applied, leaving ``state`` untouched.
+
+    Each delta is a dict with 'company', 'product' and either 'rating' or 'removed'.
+    Only the similarity rows and columns of the companies in ``deltas`` are recomputed, and
+    stored as patches over the shared similarity matrix (see PatchedSimilarity).
+    """
+    company_index, product_ids, ratings, rated, affected = merge_deltas(state, deltas)
+
+    # Similarities between two unaffected companies cannot change: only the affected rows/columns are refreshed
+    rows = np.array(sorted(affected), dtype=np.intp)
+    block = similarity_rows(ratings, rated, rows, state.min_support)
+    return replace(
+        state,
+        company_index=company_index,
+        product_ids=product_ids,
+        ratings=ratings,
+        rated=rated,
+        entitled=rated.tocsr(),
+        crowded=np.flatnonzero(np.diff(rated.indptr) > state.k),
+        sim=state.sim.with_rows(rows, block),
+        global_mean=ratings.sum() / rated.nnz if rated.nnz else state.global_mean,
+    )
+
+
+# Function to predict a company's rating of every product in one pass
+def predict_company_ratings(state: CFState, company) -> np.ndarray:
+    """Returns the KNNBasic estimate of every product for ``company``, in ``state.product_ids`` order."""
+    n_products = state.ratings.shape[1]
+    est = np.full(n_products, state.global_mean)
+    row = state.company_index.get(company)
+    if row is None:
+        # Unknown company: KNNBasic falls back to the global mean for every product
+        return est
+
+    sim_row = np.asarray(state.sim[row], dtype=float)
+    positive_sim = np.maximum(sim_row, 0.0)
+
+    # Products rated by at most k companies use every rater as a neighbour: weighted sums are sparse products
+    sum_sim = state.rated.T @ positive_sim
+    sum_ratings = state.ratings.T @ positive_sim
+    actual_k = state.rated.T @ (sim_row > 0).astype(float)
+
+    # Products rated by more than k companies only aggregate their k most similar raters
+    if state.crowded.size:
+        block_rated = state.rated[:, state.crowded].toarray() > 0
+        block_ratings = state.ratings[:, state.crowded].toarray()
+        weights = np.where(block_rated, sim_row[:, None], -np.inf)
+        # Ties keep the lower company row, like the stable heapq.nlargest in KNNBasic.estimate
+        neighbours = top_n_indices(weights.T, state.k).T
+        neighbour_sims = np.take_along_axis(weights, neighbours, axis=0)
+        neighbour_ratings = np.take_along_axis(block_ratings, neighbours, axis=0)
+        positive = neighbour_sims > 0
+        kept_sims = np.where(positive, neighbour_sims, 0.0)
+        sum_sim[state.crowded] = kept_sims.sum(axis=0)
+        sum_ratings[state.crowded] = (kept_sims * neighbour_ratings).sum(axis=0)
+        actual_k[state.crowded] = positive.sum(axis=0)
+
+    # Products without enough positively similar raters keep the global mean, as in KNNBasic
+    predictable = (actual_k >= state.min_k) & (sum_sim > 0)
+    est[predictable] = sum_ratings[predictable] / sum_sim[predictable]
+    return np.clip(est, *state.rating_scale)
+
+
+# Function to give the score of products the model has never seen
+def default_score(state: CFState) -> float:
+    """Returns KNNBasic's prediction for an unknown product: the global mean rating."""
+    return state.global_mean
+
+
+# Function to pick the top N products from a company's scores
+def select_products(state, scores, company, top_n=5, exclude_entitled=True) -> list:
+    """Returns (product, score) of the top N of ``scores`` (modified in place), skipping held products."""
+    row = state.company_index.get(company)
+    if exclude_entitled and row is not None:
+        scores[state.entitled.indices[state.entitled.indptr[row]:state.entitled.indptr[row + 1]]] = -np.inf
+    return [(state.product_ids[i], float(scores[i])) for i in top_n_indices(scores, top_n) if scores[i] > -np.inf]
+
+
+# Function to rank the top N products for a company
+def rank_products(state: CFState, company, top_n=5, exclude_entitled=True) -> list:
+    """Returns (product, predicted rating) of the top N products, skipping products the company already holds."""
+    return select_products(state, predict_company_ratings(state, company), company, top_n, exclude_entitled)
+
+
+# Function to recommend the top N products for a company
+def recommend_products(state: CFState, company, top_n=5, exclude_entitled=True) -> list:
+    """Returns the top N products by predicted rating, skipping products the company already holds."""
+    return [product for product, _ in rank_products(state, company, top_n, exclude_entitled)]
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from src.metrics import COALESCED_BATCH_SIZE
+
+
+class _Request:
+    """One submitted item waiting for its batch."""
+    __slots__ = ('item', 'result', 'error', 'done', 'lead', 'handed_off', 'wake')
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = False
+        self.lead = False  # this caller collects and runs the next batch
+        self.handed_off = False  # leadership passed on by a full batch: run without waiting
+        self.wake = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces items submitted by concurrent threads into batches for one vectorized call.
+
+    The first caller of an idle batcher becomes the leader: it waits up to ``max_wait`` seconds
+    (less if ``max_batch_size`` items arrive), then calls ``process`` with the collected items
+    and hands every caller its own result. Items left over from a full batch are led by the
+    oldest of them without waiting again. ``process`` must return one result per item, in order;
+    if it raises, every caller of that batch gets the exception.
+    """
+
+    def __init__(self, process, max_batch_size=64, max_wait=0.002, name='batch'):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        self._pending = []
+        self._collecting = False
+
+    def submit(self, item):
+        """Adds ``item`` to the next batch and returns its result once the batch has run."""
+        request = _Request(item)
+        with self._lock:
+            self._pending.append(request)
+            if not self._collecting:
+                self._collecting = True
+                request.lead = True
+            elif len(self._pending) >= self.max_batch_size:
+                self._full.notify()
+
+        while not request.done:
+            if request.lead:
+                self._run_batch(wait=not request.handed_off)
+            else:
+                request.wake.wait()
+                request.wake.clear()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run_batch(self, wait):
+        # Called by the leader, which is always the oldest pending request
+        with self._lock:
+            deadline = time.monotonic() + self.max_wait
+            while wait and len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._full.wait(remaining)
+            batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+            if self._pending:
+                successor = self._pending[0]
+                successor.lead = successor.handed_off = True
+                successor.wake.set()
+            else:
+                self._collecting = False
+
+        COALESCED_BATCH_SIZE.observe(len(batch), batcher=self.name)
+        try:
+            results = self.process([request.item for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        for request in batch:
+            request.lead = False
+            request.done = True
+            request.wake.set()
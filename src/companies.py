@@ -0,0 +1,67 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import pandas as pd
+
+from src import config
+
+
+class CompanyList(NamedTuple):
+    """Company names loaded from one version of the workbook."""
+    names: list  # workbook order
+    sorted_keys: list  # case-folded names, sorted, for prefix search
+    sorted_names: list  # names in the order of sorted_keys
+    etag: str
+    last_modified: datetime
+
+
+class CompanyDirectory:
+    """Company names from companies.xlsx, held in memory and reloaded when the file changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None
+        self._companies = None
+        self._lock = threading.Lock()
+
+    def get(self) -> CompanyList:
+        """Returns the current company list, re-reading the workbook only if its mtime or size changed."""
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._companies = self._load(stat)
+                    self._stamp = stamp
+        return self._companies
+
+    def _load(self, stat) -> CompanyList:
+        # Assuming the Excel file has a column named "Name" with company names
+        names = [str(name) for name in pd.read_excel(self.path)['Name'].dropna().tolist()]
+        by_key = sorted((name.casefold(), name) for name in names)
+        etag = hashlib.sha256(json.dumps(names).encode('utf-8')).hexdigest()[:32]
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+        return CompanyList(names, [key for key, _ in by_key], [name for _, name in by_key], etag, last_modified)
+
+    def search(self, prefix: str = '', offset: int = 0, limit: int = None) -> tuple:
+        """Returns (names, total matches, company list) for a case-insensitive prefix and page."""
+        companies = self.get()
+        if prefix:
+            # Binary search the sorted keys: matches are contiguous
+            key = prefix.casefold()
+            start = bisect.bisect_left(companies.sorted_keys, key)
+            end = bisect.bisect_left(companies.sorted_keys, key + '\U0010ffff', lo=start)
+            matches = companies.sorted_names[start:end]
+        else:
+            matches = companies.names
+        page = matches[offset:offset + limit] if limit is not None else matches[offset:]
+        return page, len(matches), companies
+
+
+# Directory over the companies workbook
+company_directory = CompanyDirectory(config.data_path('companies.xlsx'))
@@ -0,0 +1,99 @@
+import os
+
+# Directory holding the source workbooks (products, accelerators, entitlements, companies)
+DATA_DIR = os.environ.get('ARE_DATA_DIR', 'data')
+
+# Directory where the compiled catalog snapshot is written
+SNAPSHOT_DIR = os.environ.get('ARE_SNAPSHOT_DIR', os.path.join(DATA_DIR, '.catalog'))
+
+# Directory where every server process writes its metrics, so /metrics covers all gunicorn workers
+# (empty: each process only reports its own; gunicorn.conf.py sets a temporary one), and how often
+# each process writes them, in seconds
+METRICS_DIR = os.environ.get('ARE_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('ARE_METRICS_FLUSH_INTERVAL', '1'))
+
+# Memory-map model arrays from the snapshot (read-only, pages shared between gunicorn workers)
+MMAP_MODELS = os.environ.get('ARE_MMAP_MODELS', '1') != '0'
+
+# Content retrieval for single queries: 'brute' (score every accelerator), 'inverted' (posting lists), or 'auto';
+# 'semantic' scores every query (single and batch) in the dense low-rank index instead of raw TF-IDF
+RETRIEVAL_ENGINE = os.environ.get('ARE_RETRIEVAL_ENGINE', 'auto')
+
+# With 'auto', catalogs with at least this many accelerators use the inverted index
+INVERTED_INDEX_MIN_ROWS = int(os.environ.get('ARE_INVERTED_INDEX_MIN_ROWS', '20000'))
+
+# Log a warning when the loaded catalog (tables, records, TF-IDF model) exceeds this many MB (0 disables it)
+CATALOG_MEMORY_WARN_MB = float(os.environ.get('ARE_CATALOG_MEMORY_WARN_MB', '0'))
+
+# Seconds between checks of the workbooks for changes; a change rebuilds the snapshot and models
+# in the background and swaps them in (0 disables the watcher)
+RELOAD_INTERVAL = float(os.environ.get('ARE_RELOAD_INTERVAL', '30'))
+
+# Token expected in the X-Admin-Token header of admin endpoints such as /admin/reload (empty disables them)
+ADMIN_TOKEN = os.environ.get('ARE_ADMIN_TOKEN', '')
+
+# Semantic index: dimensions of the low-rank space and int8 storage of the vectors (4x smaller than float32)
+SEMANTIC_COMPONENTS = int(os.environ.get('ARE_SEMANTIC_COMPONENTS', '256'))
+SEMANTIC_QUANTIZE = os.environ.get('ARE_SEMANTIC_QUANTIZE', '0') != '0'
+
+# Coalescing of concurrent new-customer queries into one scoring call: collection window in
+# milliseconds (0 disables it) and maximum batch size. Needs several threads per worker (ARE_THREADS)
+COALESCE_WINDOW_MS = float(os.environ.get('ARE_COALESCE_WINDOW_MS', '0'))
+COALESCE_MAX_BATCH = int(os.environ.get('ARE_COALESCE_MAX_BATCH', '64'))
+
+# Async server (asgi.py): LLM-bound requests processed at once per worker and requests allowed to wait
+# for a slot before new ones are refused with 503
+ASYNC_MAX_CONCURRENCY = int(os.environ.get('ARE_ASYNC_MAX_CONCURRENCY', '64'))
+ASYNC_QUEUE_SIZE = int(os.environ.get('ARE_ASYNC_QUEUE_SIZE', '256'))
+
+# LLM client: model, OpenAI-compatible server (empty for the OpenAI API; e.g. a local stub for testing),
+# timeout of one attempt (or stream chunk) and of connecting, in seconds, and retries after a failed attempt
+LLM_MODEL = os.environ.get('ARE_LLM_MODEL', 'gpt-4')
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', '')
+LLM_TIMEOUT = float(os.environ.get('ARE_LLM_TIMEOUT', '30'))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('ARE_LLM_CONNECT_TIMEOUT', '5'))
+LLM_MAX_RETRIES = int(os.environ.get('ARE_LLM_MAX_RETRIES', '2'))
+
+# LLM client connection pool: open connections, idle keep-alive connections and their idle lifetime in seconds
+LLM_MAX_CONNECTIONS = int(os.environ.get('ARE_LLM_MAX_CONNECTIONS', '100'))
+LLM_KEEPALIVE_CONNECTIONS = int(os.environ.get('ARE_LLM_KEEPALIVE_CONNECTIONS', '20'))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get('ARE_LLM_KEEPALIVE_EXPIRY', '60'))
+
+# While the LLM routes a query, start its recommendation scoring and product-info context lookup
+# on this many threads per worker and keep only the branch routing selects
+SPECULATIVE_ROUTING = os.environ.get('ARE_SPECULATIVE_ROUTING', '1') != '0'
+SPECULATION_THREADS = int(os.environ.get('ARE_SPECULATION_THREADS', '4'))
+
+# Local router confidence needed to skip the LLM routing call (above 1 always asks the LLM, 0 never does)
+ROUTER_CONFIDENCE_THRESHOLD = float(os.environ.get('ARE_ROUTER_CONFIDENCE_THRESHOLD', '0.75'))
+
+# LLM answer cache: in-memory entries, time to live in seconds, optional SQLite file for the on-disk tier
+LLM_CACHE_SIZE = int(os.environ.get('ARE_LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_TTL = float(os.environ.get('ARE_LLM_CACHE_TTL', '86400'))
+LLM_CACHE_PATH = os.environ.get('ARE_LLM_CACHE_PATH', '')
+
+# Product-info prompts: token budget for the accelerator context and description length per snippet
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('ARE_CONTEXT_TOKEN_BUDGET', '1500'))
+CONTEXT_DESCRIPTION_CHARS = int(os.environ.get('ARE_CONTEXT_DESCRIPTION_CHARS', '300'))
+
+# Collaborative filtering engine: 'knn' (Surprise user-based KNNBasic, dense company x company similarities)
+# or 'item' (sparse item-item model, memory proportional to the number of entitlements)
+CF_ENGINE = os.environ.get('ARE_CF_ENGINE', 'knn')
+
+# Item-item engine: neighbours kept per product and interaction weights of implemented / not implemented entitlements
+ITEM_CF_NEIGHBOURS = int(os.environ.get('ARE_ITEM_CF_NEIGHBOURS', '50'))
+ITEM_CF_IMPLEMENTED_WEIGHT = float(os.environ.get('ARE_ITEM_CF_IMPLEMENTED_WEIGHT', '1.0'))
+ITEM_CF_ENTITLED_WEIGHT = float(os.environ.get('ARE_ITEM_CF_ENTITLED_WEIGHT', '0.5'))
+
+# Default weights of the collaborative filtering and content scores in hybrid recommendations
+HYBRID_COLLABORATIVE_WEIGHT = float(os.environ.get('ARE_HYBRID_COLLABORATIVE_WEIGHT', '0.7'))
+HYBRID_CONTENT_WEIGHT = float(os.environ.get('ARE_HYBRID_CONTENT_WEIGHT', '0.3'))
+
+# Maximum number of queries accepted by one /api/recommend/batch request
+BATCH_MAX_QUERIES = int(os.environ.get('ARE_BATCH_MAX_QUERIES', '10000'))
+
+
+# Function to build the path of a workbook inside the data directory
+def data_path(file_name: str) -> str:
+    """Returns the path of a file inside the data directory."""
+    return os.path.join(DATA_DIR, file_name)
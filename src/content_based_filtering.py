@@ -1,68 +1,180 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Load the products and accelerators datasets
-products_file_path = 'data/products.xlsx'
-accelerators_file_path = 'data/accelerators.xlsx'
-
-products_df = pd.read_excel(products_file_path)
-accelerators_df = pd.read_excel(accelerators_file_path)
-
-# Strip leading and trailing spaces from column names
-products_df.columns = products_df.columns.str.strip()
-accelerators_df.columns = accelerators_df.columns.str.strip()
-
-# Merge the products and accelerators DataFrames based on 'Name' and 'Product'
-merged_df = pd.merge(products_df, accelerators_df, left_on='Name', right_on='Product', how='inner')
-
-# Handle missing values
-merged_df['Category'] = merged_df['Category'].fillna('')
-merged_df['Description'] = merged_df['Description'].fillna('')
-merged_df['Short description'] = merged_df['Short description'].fillna('')
-merged_df['Type'] = merged_df['Type'].fillna('')
-
-# Combine relevant fields to create a comprehensive feature (Category + Description + Short description + Type)
-merged_df['features'] = merged_df['Category'] + ' ' + merged_df['Description'] + ' ' + merged_df['Short description'] + ' ' + merged_df['Type']
-
-# Initialize TF-IDF vectorizer
-tfidf = TfidfVectorizer(stop_words='english')
-tfidf_matrix = tfidf.fit_transform(merged_df['features'])
+import numpy as np
+
+from src import config, model_bundle
+from src.coalescer import MicroBatcher
+from src.metrics import timed
+from src.ranking import top_n_indices
+from src.retrieval import InvertedIndex
+from src.semantic_index import load_semantic_index
+
+# Number of queries scored per sparse matrix product, bounding the dense score block in memory
+BATCH_CHUNK_SIZE = 1024
+
+
+class ContentModel:
+    """Content-based recommender over one catalog version.
+
+    Built for each model bundle: a reload builds a new one aside, and requests that started on
+    the previous bundle finish with its model.
+    """
+
+    def __init__(self, catalog):
+        # Load the products and accelerators datasets from the compiled catalog snapshot
+        self.catalog = catalog
+        self.products_df = catalog.products_df
+        self.accelerators_df = catalog.accelerators_df
+
+        # Products merged with accelerators (the recommender rows)
+        self.merged_df = catalog.merged_df
+
+        # Display fields of every merged_df row, so requests never index the DataFrame
+        self.records = catalog.records
+
+        # TF-IDF vectorizer and matrix fitted on the 'features' column when the snapshot was built
+        self.tfidf = catalog.tfidf
+        self.tfidf_matrix = catalog.tfidf_matrix
+
+        # Posting-list index answering single queries without scanning every accelerator (large catalogs only)
+        self.use_inverted_index = config.RETRIEVAL_ENGINE == 'inverted' or (
+            config.RETRIEVAL_ENGINE == 'auto' and self.tfidf_matrix.shape[0] >= config.INVERTED_INDEX_MIN_ROWS
+        )
+        self.inverted_index = InvertedIndex(self.tfidf_matrix) if self.use_inverted_index else None
+
+        # Dense low-rank (LSA) index of the TF-IDF matrix, memory-mapped from the snapshot
+        self.semantic_index = (
+            load_semantic_index(catalog, config.SEMANTIC_COMPONENTS, config.SEMANTIC_QUANTIZE)
+            if config.RETRIEVAL_ENGINE == 'semantic' else None
+        )
+
+        # Concurrent single queries scored together as one sparse matrix product (not with the inverted index,
+        # which only reads the postings of each query's own terms)
+        self.coalescer = (
+            MicroBatcher(self.top_accelerators_batch, config.COALESCE_MAX_BATCH, config.COALESCE_WINDOW_MS / 1000,
+                         'content')
+            if config.COALESCE_WINDOW_MS > 0 and self.inverted_index is None else None
+        )
+        # Full score rows of concurrent single queries (hybrid ranking), whatever the retrieval engine
+        self.score_coalescer = (
+            MicroBatcher(self.score_queries, config.COALESCE_MAX_BATCH, config.COALESCE_WINDOW_MS / 1000,
+                         'content_scores')
+            if config.COALESCE_WINDOW_MS > 0 else None
+        )
+
+    def score_queries(self, customer_inputs):
+        """Returns a dense (queries x accelerators) array of cosine similarities."""
+        # Vectorize all inputs in one call; TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+        queries_tfidf = self.tfidf.transform(customer_inputs)
+        if self.semantic_index is not None:
+            return self.semantic_index.score(queries_tfidf)
+        return (queries_tfidf @ self.tfidf_matrix.T).toarray()
+
+    def score_query(self, customer_input):
+        """Returns the cosine similarities of one input to every accelerator (coalesced with concurrent inputs)."""
+        if self.score_coalescer is not None:
+            return self.score_coalescer.submit(customer_input)
+        return self.score_queries([customer_input])[0]
+
+    def recommend_batch(self, customer_inputs, top_n=5):
+        """Returns, for each input, its top N accelerators as dictionaries (an empty list when nothing matches)."""
+        results = []
+        for start in range(0, len(customer_inputs), BATCH_CHUNK_SIZE):
+            scores = self.score_queries(customer_inputs[start:start + BATCH_CHUNK_SIZE])
+            top_indices = top_n_indices(scores, top_n)
+            for row_scores, row_indices in zip(scores, top_indices):
+                results.append([self.records[i].to_dict(row_scores[i]) for i in row_indices if row_scores[i] > 0])
+        return results
+
+    def top_accelerators_batch(self, requests):
+        """Returns (row indices, scores) of the top N accelerators of every (customer input, top N) pair."""
+        scores = self.score_queries([customer_input for customer_input, _ in requests])
+        # The top N of each row is a prefix of its top max-N, so one selection serves every request
+        top_indices = top_n_indices(scores, max(top_n for _, top_n in requests))
+        return [
+            (row_indices[:top_n], row_scores[row_indices[:top_n]])
+            for row_scores, row_indices, (_, top_n) in zip(scores, top_indices, requests)
+        ]
+
+    def top_accelerators(self, customer_input, top_n=5):
+        """Returns (row indices, scores) of the top N accelerators in descending order of similarity."""
+        if self.coalescer is not None:
+            return self.coalescer.submit((customer_input, top_n))
+        if self.semantic_index is not None:
+            # One matrix-vector product in the low-rank space, then partial selection
+            return self.semantic_index.top_k(self.tfidf.transform([customer_input]), top_n)
+        if self.inverted_index is None:
+            cosine_sim = self.score_queries([customer_input])[0]
+            top_indices = top_n_indices(cosine_sim, top_n)
+            return top_indices, cosine_sim[top_indices]
+
+        # Only the postings of the input's terms are read; accelerators sharing no term score 0
+        top_indices, scores = self.inverted_index.top_k(self.tfidf.transform([customer_input]), top_n)
+        missing = min(top_n, self.tfidf_matrix.shape[0]) - len(top_indices)
+        if missing > 0 and len(top_indices) > 0:
+            # Fill up with zero-score accelerators in catalog order, as a full sort would
+            padding = np.setdiff1d(np.arange(len(top_indices) + missing), top_indices)[:missing]
+            top_indices = np.concatenate([top_indices, padding])
+            scores = np.concatenate([scores, np.zeros(missing)])
+        return top_indices, scores
+
+    def recommend_for_new_customer(self, customer_input, top_n=5):
+        # Select the top N recommended accelerators by cosine similarity with all product features
+        top_indices, top_scores = self.top_accelerators(customer_input, top_n)
+
+        # Check if no close matches were found
+        if len(top_indices) == 0 or top_scores[0] == 0:
+            return "No close matches found for the input."
+
+        # Create a human-readable sentence output with HTML formatting from the precomputed list items
+        # recommendations_text = f"The top {top_n} recommended accelerators for '{customer_input}' are:<br /><ol>"
+        items = ''.join([self.records[i].html_item for i in top_indices])
+        return f"The top {top_n} recommended accelerators for you are:<br /><ol>{items}</ol>"
+
+    def rank_new_customer(self, customer_input, top_n=5):
+        """Returns the top N accelerators with a positive score as dictionaries (an empty list when nothing matches)."""
+        top_indices, top_scores = self.top_accelerators(customer_input, top_n)
+        return [self.records[i].to_dict(score) for i, score in zip(top_indices, top_scores) if score > 0]
+
+
+# The functions below serve the content model of the current bundle, or ``model`` when the caller
+# already holds one: a query pipeline takes one bundle per request, so a reload in the middle of
+# the request does not mix two catalog versions
+
+# Function to get the content model being served
+def current_model() -> ContentModel:
+    return model_bundle.current().content
+
+# Function to score customer inputs against all accelerators
+def score_queries(customer_inputs, model=None):
+    """Returns a dense (queries x accelerators) array of cosine similarities."""
+    return (model or current_model()).score_queries(customer_inputs)
+
+# Function to recommend accelerators for many customer inputs at once
+@timed("recommender", "recommend_batch")
+def recommend_batch(customer_inputs, top_n=5, model=None):
+    """Returns, for each input, its top N accelerators as dictionaries (an empty list when nothing matches)."""
+    return (model or current_model()).recommend_batch(customer_inputs, top_n)
+
+# Function to find the top N accelerators for one input
+def top_accelerators(customer_input, top_n=5, model=None):
+    """Returns (row indices, scores) of the top N accelerators in descending order of similarity."""
+    return (model or current_model()).top_accelerators(customer_input, top_n)
 
 # Function to recommend accelerators for new customer input
-def recommend_for_new_customer(customer_input, top_n=5):
-    # Vectorize the customer input
-    customer_input_tfidf = tfidf.transform([customer_input])
-
-    # Compute cosine similarity between the input and all product features
-    cosine_sim = cosine_similarity(customer_input_tfidf, tfidf_matrix)
-
-    # Sort by similarity
-    sim_scores = list(enumerate(cosine_sim[0]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
-    # Check if no close matches were found
-    if sim_scores[0][1] == 0:
-        return "No close matches found for the input."
-
-    # Get top N recommended accelerators
-  # Get top N recommended accelerators
-    top_indices = [i[0] for i in sim_scores[:top_n]]
-    recommended_accelerators = merged_df[['Name_y', 'Name_x', 'Category', 'Short description']].iloc[top_indices].copy()
-
-    # Create a human-readable sentence output with HTML formatting
-    # recommendations_text = f"The top {top_n} recommended accelerators for '{customer_input}' are:<br /><ol>"
-    recommendations_text = f"The top {top_n} recommended accelerators for you are:<br /><ol>"
-
-    # Loop through the recommendations and add them as list items in the ordered list
-    for _, row in recommended_accelerators.iterrows():
-        # recommendations_text += f"<li>{row['Name_y']} (Product: {row['Name_x']}, Category: {row['Category']}): {row['Short description']}</li>"
-        #recommendations_text += f"<li>Accelerator: {row['Name_y']} (Product: {row['Name_x']}, Category: {row['Category']}): Short description {row['Short description']}</li>"
-        recommendations_text += f"<li>{row['Name_y']}, Short description: {row['Short description']}</li>"
-
-
-    # Close the ordered list
-    recommendations_text += "</ol>"
-
-    # Return or print the final HTML-formatted string
-    return recommendations_text
+@timed("recommender", "recommend_for_new_customer")
+def recommend_for_new_customer(customer_input, top_n=5, model=None):
+    return (model or current_model()).recommend_for_new_customer(customer_input, top_n)
+
+# Function to rank accelerators for new customer input as structured results
+@timed("recommender", "rank_new_customer")
+def rank_new_customer(customer_input, top_n=5, model=None):
+    """Returns the top N accelerators with a positive score as dictionaries (an empty list when nothing matches)."""
+    return (model or current_model()).rank_new_customer(customer_input, top_n)
+
+# Module attributes of earlier releases (catalog, tfidf, merged_df, ...) read from the current model
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    model = current_model()
+    if hasattr(model, name):
+        return getattr(model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
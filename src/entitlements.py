@@ -0,0 +1,64 @@
+import json
+import os
+
+from src import config
+from src.catalog import JOURNAL_PREFIX, snapshot_lock
+
+# Entitlement changes are appended to a journal per entitlements workbook content, kept next to the
+# snapshot versions (not inside one) so it survives rebuilds of the other workbooks: every catalog
+# version built from that workbook replays it. An edited workbook starts an empty journal, so the
+# workbook wins over changes posted before it, and the old journal is pruned with its versions.
+
+
+# Function to build the path of the entitlement journal of an entitlements workbook
+def journal_path(entitlements_version: str) -> str:
+    return os.path.join(config.SNAPSHOT_DIR, f'{JOURNAL_PREFIX}-{entitlements_version}.jsonl')
+
+
+# Function to validate one entitlement change
+def normalize_delta(delta: dict) -> dict:
+    """Validates an entitlement change and returns it as {'company', 'product', 'rating' | 'removed'}.
+
+    Accepts 'implemented' (bool) or 'rating' (0..1) for new or updated entitlements, or 'removed': true.
+    """
+    if not isinstance(delta, dict):
+        raise ValueError('Each delta must be an object')
+    company, product = delta.get('company'), delta.get('product')
+    if not isinstance(company, str) or not company or not isinstance(product, str) or not product:
+        raise ValueError('Each delta needs a company and a product')
+    if delta.get('removed'):
+        return {'company': company, 'product': product, 'removed': True}
+    rating = delta.get('rating', delta.get('implemented'))
+    if isinstance(rating, bool):
+        rating = float(rating)
+    if not isinstance(rating, (int, float)) or not 0 <= rating <= 1:
+        raise ValueError(f"Delta for {company!r}/{product!r} needs 'implemented' or a 'rating' between 0 and 1")
+    return {'company': company, 'product': product, 'rating': float(rating)}
+
+
+# Function to record entitlement changes for every worker
+def append_deltas(entitlements_version: str, deltas: list) -> None:
+    """Appends normalized deltas to the journal of an entitlements workbook, shared by all workers."""
+    lines = ''.join(json.dumps(delta) + '\n' for delta in deltas)
+    with snapshot_lock():
+        with open(journal_path(entitlements_version), 'a') as f:
+            f.write(lines)
+
+
+# Function to read journal entries written since the last read
+def read_deltas(entitlements_version: str, offset: int = 0) -> tuple[list, int]:
+    """Returns the complete journal entries after byte ``offset`` and the offset to resume from."""
+    path = journal_path(entitlements_version)
+    try:
+        # Cheap check first: this runs on every collaborative filtering request
+        if os.path.getsize(path) <= offset:
+            return [], offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read()
+    except FileNotFoundError:
+        return [], offset
+    # Ignore a trailing line that is still being written
+    complete = chunk[:chunk.rfind(b'\n') + 1]
+    deltas = [json.loads(line) for line in complete.splitlines() if line.strip()]
+    return deltas, offset + len(complete)
@@ -1,113 +1,188 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from surprise import Dataset, Reader, KNNBasic
-from collections import defaultdict
-
-### Step 1: Prepare Collaborative Filtering Data ###
-# Load the entitlements data
-entitlements_file_path = 'data/entitlements.xlsx'
-entitlements_df = pd.read_excel(entitlements_file_path)
-
-# Create interaction data for collaborative filtering
-interaction_df = entitlements_df[['Company', 'Product', 'Implemented']]
-
-# Collaborative Filtering Preparation (Surprise KNNBasic)
-reader = Reader(rating_scale=(0, 1))
-data = Dataset.load_from_df(interaction_df[['Company', 'Product', 'Implemented']], reader)
-trainset = data.build_full_trainset()
-sim_options = {'name': 'cosine', 'user_based': True}
-algo = KNNBasic(sim_options=sim_options)
-algo.fit(trainset)
-
-### Step 2: Prepare Content-Based Filtering Data ###
-
-# Load both products and accelerators datasets
-products_file_path = 'data/products.xlsx'
-accelerators_file_path = 'data/accelerators.xlsx'
-
-products_df = pd.read_excel(products_file_path)
-accelerators_df = pd.read_excel(accelerators_file_path)
+import threading
 
-# Strip leading/trailing spaces from column names
-products_df.columns = products_df.columns.str.strip()
-accelerators_df.columns = accelerators_df.columns.str.strip()
-
-# Merge the products and accelerators DataFrames
-merged_df = pd.merge(products_df, accelerators_df, left_on='Name', right_on='Product', how='inner')
-
-# Handle missing values
-merged_df['Category'] = merged_df['Category'].fillna('')
-merged_df['Description'] = merged_df['Description'].fillna('')
-merged_df['Short description'] = merged_df['Short description'].fillna('')
-merged_df['Type'] = merged_df['Type'].fillna('')
-
-# Combine relevant fields from both products and accelerators to create a comprehensive feature
-merged_df['features'] = (
-    merged_df['Category'] + ' ' +
-    merged_df['Description'] + ' ' +
-    merged_df['Short description'] + ' ' +
-    merged_df['Type']
-)
-
-# TF-IDF vectorization for combined products and accelerators
-tfidf = TfidfVectorizer(stop_words='english')
-tfidf_matrix = tfidf.fit_transform(merged_df['features'])
+from surprise import Dataset, Reader, KNNBasic
 
-### Step 3: Define Recommendation Functions ###
+from src import config, model_bundle
+from src import cf_scoring, item_cf
+from src.cf_scoring import build_cf_state
+from src.entitlements import append_deltas, read_deltas
+from src.hybrid_scoring import HybridRanker
+from src.metrics import timed
+from src.model_store import fit_knn
+from src.ranking import top_n_indices
+
+
+class HybridModel:
+    """Collaborative filtering and hybrid ranking over one catalog version.
+
+    Built for each model bundle, like ContentModel. Entitlement changes published through the
+    journal of the catalog's entitlements workbook are replayed on top of its entitlements.
+    """
+
+    def __init__(self, catalog, content=None):
+        self.catalog = catalog
+
+        ### Step 1: Prepare Collaborative Filtering Data ###
+        # Load the entitlements data
+        self.entitlements_df = catalog.entitlements_df
+
+        # Create interaction data for collaborative filtering
+        interaction_df = self.entitlements_df[['Company', 'Product', 'Implemented']]
+
+        if config.CF_ENGINE == 'item':
+            # Collaborative Filtering Preparation (sparse item-item model: no company x company matrix)
+            self.cf_engine = item_cf
+            self.cf_state = item_cf.build_item_cf_state(
+                interaction_df, config.ITEM_CF_NEIGHBOURS, config.ITEM_CF_IMPLEMENTED_WEIGHT,
+                config.ITEM_CF_ENTITLED_WEIGHT,
+            )
+        else:
+            # Collaborative Filtering Preparation (Surprise KNNBasic)
+            reader = Reader(rating_scale=(0, 1))
+            data = Dataset.load_from_df(interaction_df[['Company', 'Product', 'Implemented']], reader)
+            trainset = data.build_full_trainset()
+            sim_options = {'name': 'cosine', 'user_based': True}
+            algo = KNNBasic(sim_options=sim_options)
+            # The similarity matrix is computed once per catalog version and memory-mapped from the snapshot
+            fit_knn(algo, trainset, catalog.version)
+
+            # Array form of the fitted model used to score all products of a company at once
+            self.cf_engine = cf_scoring
+            self.cf_state = build_cf_state(algo)
+
+        # Entitlement changes published after the snapshot was built are replayed from a journal shared by all workers
+        self._journal_offset = 0
+        self._cf_update_lock = threading.Lock()
+
+        ### Step 2: Prepare Content-Based Filtering Data ###
+        # Load both products and accelerators datasets
+        self.products_df = catalog.products_df
+        self.accelerators_df = catalog.accelerators_df
+
+        # Products merged with accelerators (the recommender rows)
+        self.merged_df = catalog.merged_df
+
+        # TF-IDF vectorization for combined products and accelerators (fitted when the snapshot was built)
+        self.tfidf = catalog.tfidf
+        self.tfidf_matrix = catalog.tfidf_matrix
+
+        # Fuses CF and content scores over every product (content scores from the bundle's ContentModel)
+        self.hybrid_ranker = HybridRanker(catalog, self.cf_engine, content)
+
+        # Replay the journal now, so a reloaded model is swapped in with every published change applied
+        self.sync_entitlement_updates(wait=True)
+
+    def sync_entitlement_updates(self, wait=False):
+        """Applies journal entries not yet seen by this model and returns the current CF state."""
+        # Unless asked to wait, keep serving the current state while another thread applies changes
+        if self._cf_update_lock.acquire(blocking=wait):
+            try:
+                deltas, self._journal_offset = read_deltas(self.catalog.entitlements_version, self._journal_offset)
+                if deltas:
+                    # Build the new state aside, then swap it in with a single assignment
+                    self.cf_state = self.cf_engine.apply_entitlement_deltas(self.cf_state, deltas)
+            finally:
+                self._cf_update_lock.release()
+        return self.cf_state
+
+    def apply_entitlement_updates(self, deltas):
+        """Records normalized deltas in the journal shared by all workers and applies them to this model."""
+        append_deltas(self.catalog.entitlements_version, deltas)
+        return self.sync_entitlement_updates(wait=True)
+
+    ### Step 3: Define Recommendation Functions ###
+
+    def collaborative_filtering_recommendations(self, company, top_n=5, exclude_entitled=True):
+        # Predict the company's rating of every product in one vectorized pass and keep the top N
+        return self.cf_engine.recommend_products(self.sync_entitlement_updates(), company, top_n, exclude_entitled)
+
+    def content_based_recommendations(self, customer_input, top_n=5):
+        cosine_sim = self.hybrid_ranker.content_scores(customer_input)
+        top_indices = top_n_indices(cosine_sim, top_n)
+        return [self.catalog.records[i].product for i in top_indices]  # Return the product names
+
+    def rank_hybrid(self, company, customer_input, collaborative_weight=None, content_weight=None, top_n=5,
+                    exclude_entitled=True):
+        """Returns the top N products with their fused score and per-source (normalized) scores."""
+        if collaborative_weight is None:
+            collaborative_weight = config.HYBRID_COLLABORATIVE_WEIGHT
+        if content_weight is None:
+            content_weight = config.HYBRID_CONTENT_WEIGHT
+        return self.hybrid_ranker.rank(
+            self.sync_entitlement_updates(), company, customer_input, collaborative_weight, content_weight, top_n,
+            exclude_entitled,
+        )
+
+    def hybrid_recommendations(self, company, customer_input, collaborative_weight=None, content_weight=None, top_n=5):
+        # Score every product with both approaches, fuse the normalized scores (weighted) and keep the top N
+        ranked = self.rank_hybrid(company, customer_input, collaborative_weight, content_weight, top_n)
+
+        # Extract the top N product names
+        top_products = [rec['product'] for rec in ranked]
+        if not top_products:
+            return f"There are no new products to recommend for your company based on your input '{customer_input}'."
+
+        # Format the output as a readable sentence
+        # recommendations_sentence = f"The recommended products for {company} based on your input '{customer_input}' are: "
+        recommendations_sentence = f"The recommended products for your company based on your input '{customer_input}' are: "
+        recommendations_sentence += ', '.join([f"{i + 1}. {product}" for i, product in enumerate(top_products[:-1])])
+        recommendations_sentence += f", and {len(top_products)}. {top_products[-1]}."
+
+        return recommendations_sentence
+
+
+# The functions below serve the hybrid model of the current bundle, or ``model`` when the caller
+# already holds one (see content_based_filtering)
+
+# Function to get the hybrid model being served
+def current_model() -> HybridModel:
+    return model_bundle.current().hybrid
+
+# Function to pick up entitlement changes published by any worker
+def sync_entitlement_updates(wait=False):
+    """Applies journal entries not yet seen by this process and returns the current CF state."""
+    return current_model().sync_entitlement_updates(wait)
+
+# Function to publish entitlement changes without refitting the model
+def apply_entitlement_updates(deltas):
+    """Records normalized deltas in the journal shared by all workers and applies them to this process."""
+    return current_model().apply_entitlement_updates(deltas)
 
 # Function to recommend using collaborative filtering
-def collaborative_filtering_recommendations(company, top_n=5):
-    company_recommendations = []
-    unique_products = interaction_df['Product'].unique()
-    
-    for product in unique_products:
-        rating = algo.predict(company, product)
-        company_recommendations.append((product, rating.est))
-    
-    # Sort recommendations by rating and return the top N
-    company_recommendations.sort(key=lambda x: x[1], reverse=True)
-    return [product for product, rating in company_recommendations[:top_n]]
+@timed("recommender", "collaborative_filtering_recommendations")
+def collaborative_filtering_recommendations(company, top_n=5, exclude_entitled=True, model=None):
+    return (model or current_model()).collaborative_filtering_recommendations(company, top_n, exclude_entitled)
 
 # Function to recommend using content-based filtering with combined accelerators and products
-def content_based_recommendations(customer_input, top_n=5):
-    customer_input_tfidf = tfidf.transform([customer_input])
-    cosine_sim = cosine_similarity(customer_input_tfidf, tfidf_matrix)
-    sim_scores = list(enumerate(cosine_sim[0]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    top_indices = [i[0] for i in sim_scores[:top_n]]
-    return merged_df['Name_x'].iloc[top_indices]  # Return the product name
+@timed("recommender", "content_based_recommendations")
+def content_based_recommendations(customer_input, top_n=5, model=None):
+    return (model or current_model()).content_based_recommendations(customer_input, top_n)
+
+# Function to rank products by fused CF and content scores
+def rank_hybrid(company, customer_input, collaborative_weight=None, content_weight=None, top_n=5, exclude_entitled=True,
+                model=None):
+    """Returns the top N products with their fused score and per-source (normalized) scores."""
+    return (model or current_model()).rank_hybrid(
+        company, customer_input, collaborative_weight, content_weight, top_n, exclude_entitled,
+    )
 
 # Hybrid recommendation system combining both approaches
-def hybrid_recommendations(company, customer_input, collaborative_weight=0.7, content_weight=0.3, top_n=5):
-    # Collaborative filtering recommendations
-    collaborative_recs = collaborative_filtering_recommendations(company, top_n)
-    
-    # Content-based filtering recommendations
-    content_recs = content_based_recommendations(customer_input, top_n)
-    
-    # Combine the results (weighted)
-    combined_recommendations = defaultdict(float)
-    
-    for product in collaborative_recs:
-        combined_recommendations[product] += collaborative_weight
-        
-    for product in content_recs:
-        combined_recommendations[product] += content_weight
-    
-    # Sort combined recommendations by weighted score
-    final_recommendations = sorted(combined_recommendations.items(), key=lambda x: x[1], reverse=True)
-    
-    # Extract the top N product names
-    top_products = [product for product, score in final_recommendations[:top_n]]
-
-    # Format the output as a readable sentence
-    # recommendations_sentence = f"The recommended products for {company} based on your input '{customer_input}' are: "
-    recommendations_sentence = f"The recommended products for your company based on your input '{customer_input}' are: "
-    recommendations_sentence += ', '.join([f"{i + 1}. {product}" for i, product in enumerate(top_products[:-1])])
-    recommendations_sentence += f", and {top_n}. {top_products[-1]}."
-
-    return recommendations_sentence
+@timed("recommender", "hybrid_recommendations")
+def hybrid_recommendations(company, customer_input, collaborative_weight=None, content_weight=None, top_n=5,
+                           model=None):
+    return (model or current_model()).hybrid_recommendations(
+        company, customer_input, collaborative_weight, content_weight, top_n,
+    )
+
+# Module attributes of earlier releases (catalog, cf_engine, hybrid_ranker, ...) read from the current model
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    model = current_model()
+    if hasattr(model, name):
+        return getattr(model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 ### Step 4: Test the Hybrid Recommendation System ###
 
 # Example usage: Recommend for a specific company and customer input
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from src import cf_scoring
+from src.content_based_filtering import ContentModel
+from src.ranking import top_n_indices
+
+
+# Function to rescale scores to [0, 1]
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """Returns ``scores`` rescaled to [0, 1]; constant scores carry no preference and become 0."""
+    if scores.size == 0:
+        return scores.astype(float)
+    low, high = scores.min(), scores.max()
+    if high <= low:
+        return np.zeros_like(scores)
+    return (scores - low) / (high - low)
+
+
+class HybridRanker:
+    """Fuses CF predicted ratings and content similarities over the full product space.
+
+    Content scores are per accelerator row of ``merged_df``, as scored by the ContentModel of the
+    same catalog (so its retrieval and coalescing settings apply); a product scores as its best
+    matching accelerator. Products are laid out as the CF products followed by the
+    products only the catalog knows, so both sources are aligned arrays.
+    """
+
+    def __init__(self, catalog, engine=cf_scoring, content=None):
+        # CF engine module (cf_scoring or item_cf) scoring the states passed to scores() and rank()
+        self.engine = engine
+        # content_based_filtering.ContentModel scoring the accelerator rows (the bundle's own one)
+        self.content = content if content is not None else ContentModel(catalog)
+
+        # Accelerator rows grouped by product, for a per-product max in one reduceat
+        codes, self.content_products = pd.factorize(catalog.merged_df['Name_x'], use_na_sentinel=False)
+        self.content_products = np.asarray(self.content_products, dtype=object)
+        self.row_order = np.argsort(codes, kind='stable')
+        self.group_starts = np.flatnonzero(np.r_[True, np.diff(codes[self.row_order]) != 0])
+        self._alignment = (None, None, None)
+
+    def _align(self, product_ids):
+        # Content product -> position in the fused space; recomputed only when the CF product list changes
+        cached_ids, positions, products = self._alignment
+        if cached_ids is product_ids:
+            return positions, products
+        index = {product: i for i, product in enumerate(product_ids)}
+        extra = [product for product in self.content_products if product not in index]
+        index.update((product, len(product_ids) + i) for i, product in enumerate(extra))
+        positions = np.array([index[product] for product in self.content_products], dtype=np.intp)
+        products = np.concatenate([np.asarray(product_ids, dtype=object), np.array(extra, dtype=object)])
+        self._alignment = (product_ids, positions, products)
+        return positions, products
+
+    def content_scores(self, customer_input: str) -> np.ndarray:
+        """Returns the cosine similarity of ``customer_input`` to every accelerator row."""
+        return self.content.score_query(customer_input)
+
+    def scores(self, state, company, customer_input: str, collaborative_weight, content_weight,
+               exclude_entitled=True) -> tuple:
+        """Returns (products, fused scores, normalized CF scores, normalized content scores) as aligned arrays.
+
+        Products the company already holds get a fused score of -inf when ``exclude_entitled``.
+        """
+        positions, products = self._align(state.product_ids)
+        n_cf = len(state.product_ids)
+
+        # Products CF has never seen get the engine's default score (KNNBasic: the global mean)
+        collaborative = np.full(len(products), self.engine.default_score(state))
+        collaborative[:n_cf] = self.engine.predict_company_ratings(state, company)
+
+        content = np.zeros(len(products))
+        if self.group_starts.size:
+            row_scores = self.content_scores(customer_input)
+            content[positions] = np.maximum.reduceat(row_scores[self.row_order], self.group_starts)
+
+        collaborative = min_max_normalize(collaborative)
+        content = min_max_normalize(content)
+        fused = collaborative_weight * collaborative + content_weight * content
+
+        row = state.company_index.get(company)
+        if exclude_entitled and row is not None:
+            fused[state.entitled.indices[state.entitled.indptr[row]:state.entitled.indptr[row + 1]]] = -np.inf
+        return products, fused, collaborative, content
+
+    def rank(self, state, company, customer_input: str, collaborative_weight=0.7, content_weight=0.3,
+             top_n=5, exclude_entitled=True) -> list:
+        """Returns the top N products as dicts with the fused score and its per-source breakdown."""
+        products, fused, collaborative, content = self.scores(
+            state, company, customer_input, collaborative_weight, content_weight, exclude_entitled,
+        )
+        return [
+            {
+                'product': products[i],
+                'score': float(fused[i]),
+                'collaborative': float(collaborative[i]),
+                'content': float(content[i]),
+            }
+            for i in top_n_indices(fused, top_n) if fused[i] > -np.inf
+        ]
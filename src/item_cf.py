@@ -0,0 +1,203 @@
+from dataclasses import dataclass, replace
+
+import numpy as np
+from scipy import sparse
+
+from src.cf_scoring import merge_deltas, rating_matrices, select_products
+from src.ranking import top_n_indices
+
+# Products per block when computing item similarities (bounds the co-occurrence block in memory)
+ITEM_SIM_BLOCK_ROWS = 1024
+
+
+@dataclass(frozen=True)
+class ItemCFState:
+    """Sparse item-item model over entitlements (rows = companies, columns = products).
+
+    Holds the same rating matrices as CFState, so entitlement deltas and table diffs work
+    unchanged; nothing in it grows with the square of the number of companies.
+    """
+    company_index: dict  # raw company name -> row
+    product_ids: np.ndarray  # column -> raw product name
+    ratings: sparse.csc_matrix  # entitlement ratings (1.0 implemented, 0.0 not implemented)
+    rated: sparse.csc_matrix  # 1.0 where the company holds the product
+    entitled: sparse.csr_matrix  # same indicator, row-sliceable for exclusion
+    interactions: sparse.csr_matrix  # weighted company x product interactions
+    item_sim: sparse.csr_matrix  # product x product cosine, pruned to the k nearest neighbours per row
+    popularity: np.ndarray  # weighted holders per product, scaled to [0, 1] (unknown companies)
+    k: int
+    implemented_weight: float
+    entitled_weight: float
+
+
+# Function to weight entitlements by implementation status
+def interaction_matrix(ratings, rated, implemented_weight, entitled_weight) -> sparse.csr_matrix:
+    """Returns the interaction weights: ``entitled_weight`` for a rating of 0 up to ``implemented_weight`` for 1."""
+    return (entitled_weight * rated + (implemented_weight - entitled_weight) * ratings).tocsr()
+
+
+# Function to keep the k largest entries of every row of a sparse matrix
+def prune_rows(matrix: sparse.csr_matrix, k: int) -> sparse.csr_matrix:
+    """Returns ``matrix`` with only the ``k`` largest positive entries per row (ties keep the lower column)."""
+    matrix.sort_indices()
+    data, indices, indptr = [], [], [0]
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        row_data, row_indices = matrix.data[start:end], matrix.indices[start:end]
+        keep = top_n_indices(row_data, k)
+        keep = keep[row_data[keep] > 0]
+        data.append(row_data[keep])
+        indices.append(row_indices[keep])
+        indptr.append(indptr[-1] + len(keep))
+    return sparse.csr_matrix(
+        (np.concatenate(data) if data else np.empty(0), np.concatenate(indices) if indices else np.empty(0, np.int32),
+         np.array(indptr)),
+        shape=matrix.shape,
+    )
+
+
+# Function to compute the inverse column norms of the interactions
+def _inverse_norms(by_product: sparse.csr_matrix) -> np.ndarray:
+    norms = np.sqrt(np.asarray(by_product.multiply(by_product).sum(axis=1)).ravel())
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+
+# Function to compute the item similarities of some products against all products
+def item_similarity_rows(interactions: sparse.csr_matrix, rows, k: int, by_product=None, inverse=None):
+    """Returns the (len(rows) x products) cosine similarities of the ``rows`` products, pruned to k per row."""
+    if by_product is None:
+        by_product = interactions.T.tocsr()
+        inverse = _inverse_norms(by_product)
+    rows = np.asarray(rows, dtype=np.intp)
+
+    # Co-occurrence of the requested products with every product: non-zeros only where companies overlap
+    block = (by_product[rows] @ interactions).tocoo()
+    block.data *= inverse[rows][block.row] * inverse[block.col]
+    # A product is not its own neighbour
+    off_diagonal = block.col != rows[block.row]
+    block = sparse.csr_matrix(
+        (block.data[off_diagonal], (block.row[off_diagonal], block.col[off_diagonal])), shape=block.shape,
+    )
+    return prune_rows(block, k)
+
+
+# Function to compute the item similarities of all products
+def item_similarity(interactions: sparse.csr_matrix, k: int) -> sparse.csr_matrix:
+    """Returns the product x product cosine similarity matrix, pruned to the k nearest neighbours per row."""
+    n_products = interactions.shape[1]
+    by_product = interactions.T.tocsr()
+    inverse = _inverse_norms(by_product)
+    blocks = [
+        item_similarity_rows(
+            interactions, np.arange(start, min(n_products, start + ITEM_SIM_BLOCK_ROWS)), k, by_product, inverse,
+        )
+        for start in range(0, n_products, ITEM_SIM_BLOCK_ROWS)
+    ]
+    return sparse.vstack(blocks, format='csr') if blocks else sparse.csr_matrix((0, 0))
+
+
+# Function to scale product popularity
+def product_popularity(interactions: sparse.csr_matrix) -> np.ndarray:
+    """Returns the summed interaction weight of every product divided by the largest one."""
+    totals = np.asarray(interactions.sum(axis=0)).ravel()
+    return totals / totals.max() if totals.size and totals.max() > 0 else totals
+
+
+# Function to build the item-item model from the entitlements table
+def build_item_cf_state(entitlements_df, k=50, implemented_weight=1.0, entitled_weight=0.5) -> ItemCFState:
+    """Builds an ItemCFState from a Company/Product/Implemented table (ids in order of first appearance)."""
+    company_index, product_index, triples = {}, {}, []
+    for company, product, implemented in entitlements_df[['Company', 'Product', 'Implemented']].itertuples(index=False):
+        row = company_index.setdefault(company, len(company_index))
+        col = product_index.setdefault(product, len(product_index))
+        triples.append((row, col, float(implemented)))
+
+    ratings, rated = rating_matrices(triples, (len(company_index), len(product_index)))
+    interactions = interaction_matrix(ratings, rated, implemented_weight, entitled_weight)
+    return ItemCFState(
+        company_index=company_index,
+        product_ids=np.array(list(product_index), dtype=object),
+        ratings=ratings,
+        rated=rated,
+        entitled=rated.tocsr(),
+        interactions=interactions,
+        item_sim=item_similarity(interactions, k),
+        popularity=product_popularity(interactions),
+        k=k,
+        implemented_weight=implemented_weight,
+        entitled_weight=entitled_weight,
+    )
+
+
+# Function to apply entitlement changes to a model state
+def apply_entitlement_deltas(state: ItemCFState, deltas) -> ItemCFState:
+    """Returns a new ItemCFState with ``deltas`` applied, leaving ``state`` untouched.
+
+    Only the similarity rows of products whose column changed, and of products held together
+    with them before or after the change, are recomputed.
+    """
+    company_index, product_ids, ratings, rated, affected = merge_deltas(state, deltas)
+    interactions = interaction_matrix(ratings, rated, state.implemented_weight, state.entitled_weight)
+    shape = interactions.shape
+
+    old = state.interactions.copy()
+    old.resize(shape)
+    rows = np.array(sorted(affected), dtype=np.intp)
+    changed = np.unique((interactions[rows] - old[rows]).tocoo().col)
+    # Companies holding a changed product, then every product those companies hold (before or after)
+    holders = np.unique(np.concatenate([matrix.tocsc()[:, changed].tocoo().row for matrix in (old, interactions)]))
+    held = np.concatenate([matrix[holders].tocoo().col for matrix in (old, interactions)])
+    refresh = np.union1d(changed, held).astype(np.intp)
+
+    item_sim = state.item_sim.copy()
+    item_sim.resize((shape[1], shape[1]))
+    if refresh.size:
+        keep = np.ones(shape[1])
+        keep[refresh] = 0.0
+        block = item_similarity_rows(interactions, refresh, state.k).tocoo()
+        refreshed = sparse.csr_matrix((block.data, (refresh[block.row], block.col)), shape=(shape[1], shape[1]))
+        item_sim = (sparse.diags(keep) @ item_sim + refreshed).tocsr()
+        item_sim.eliminate_zeros()
+
+    return replace(
+        state,
+        company_index=company_index,
+        product_ids=product_ids,
+        ratings=ratings,
+        rated=rated,
+        entitled=rated.tocsr(),
+        interactions=interactions,
+        item_sim=item_sim,
+        popularity=product_popularity(interactions),
+    )
+
+
+# Function to score every product for a company
+def predict_company_ratings(state: ItemCFState, company) -> np.ndarray:
+    """Returns the item-item score of every product for ``company``, in ``state.product_ids`` order.
+
+    A product scores the interaction-weighted sum of its similarity to the company's products;
+    unknown companies get product popularity.
+    """
+    row = state.company_index.get(company)
+    if row is None:
+        return state.popularity.copy()
+    return (state.interactions[row] @ state.item_sim).toarray().ravel()
+
+
+# Function to give the score of products the model has never seen
+def default_score(state: ItemCFState) -> float:
+    """Returns the score of a product nobody holds: no neighbour votes for it."""
+    return 0.0
+
+
+# Function to rank the top N products for a company
+def rank_products(state: ItemCFState, company, top_n=5, exclude_entitled=True) -> list:
+    """Returns (product, score) of the top N products, skipping products the company already holds."""
+    return select_products(state, predict_company_ratings(state, company), company, top_n, exclude_entitled)
+
+
+# Function to recommend the top N products for a company
+def recommend_products(state: ItemCFState, company, top_n=5, exclude_entitled=True) -> list:
+    """Returns the top N products by item-item score, skipping products the company already holds."""
+    return [product for product, _ in rank_products(state, company, top_n, exclude_entitled)]
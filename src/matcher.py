@@ -0,0 +1,126 @@
+import re
+from typing import NamedTuple
+
+# Word tokens (letters and digits) of normalized text
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Longest name fragment indexed for partial-name lookups
+MAX_FRAGMENT_TOKENS = 8
+
+
+# Function to normalize text into comparable tokens
+def tokenize(text) -> list:
+    """Returns the case-folded word tokens of ``text`` (punctuation and spacing are ignored)."""
+    return TOKEN_PATTERN.findall(str(text).casefold())
+
+
+class Match(NamedTuple):
+    """A name found in a text, as token positions [start, end) and the payloads registered for it."""
+    start: int
+    end: int
+    name: str
+    payloads: tuple
+
+
+class NameMatcher:
+    """Aho-Corasick automaton over name token sequences.
+
+    Built once from (name, payload) pairs; finds every name mentioned in a text in a single
+    pass over the text's tokens, whatever the number of names. Names only match on whole
+    tokens, so "Product 1" is not found in "Product 10".
+    """
+
+    def __init__(self, names):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._names = []  # entry -> display name
+        self._payloads = []  # entry -> payloads
+        self._lengths = []  # entry -> number of tokens
+        self._fragments = {}  # token sub-sequence -> entries containing it
+
+        entries = {}
+        for name, payload in names:
+            tokens = tuple(tokenize(name))
+            if not tokens:
+                continue
+            entry = entries.get(tokens)
+            if entry is None:
+                entry = entries[tokens] = len(self._names)
+                self._names.append(str(name).strip())
+                self._payloads.append([])
+                self._lengths.append(len(tokens))
+                self._add_path(tokens, entry)
+                self._add_fragments(tokens, entry)
+            self._payloads[entry].append(payload)
+
+        self._payloads = [tuple(payloads) for payloads in self._payloads]
+        self._link_failures()
+
+    def _add_path(self, tokens, entry):
+        node = 0
+        for token in tokens:
+            child = self._goto[node].get(token)
+            if child is None:
+                child = self._goto[node][token] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append(entry)
+
+    def _add_fragments(self, tokens, entry):
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(len(tokens), start + MAX_FRAGMENT_TOKENS) + 1):
+                self._fragments.setdefault(tokens[start:end], []).append(entry)
+
+    def _link_failures(self):
+        # Breadth-first: a node's failure link is the longest proper suffix that is also a trie path
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for token, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text) -> list:
+        """Returns every name mentioned in ``text``, in order of where the mention ends."""
+        matches = []
+        node = 0
+        for position, token in enumerate(tokenize(text)):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for entry in self._out[node]:
+                matches.append(Match(position + 1 - self._lengths[entry], position + 1, self._names[entry], self._payloads[entry]))
+        return matches
+
+    def mentions(self, text) -> list:
+        """Returns the longest non-overlapping mentions in ``text``, left to right."""
+        chosen = []
+        for match in sorted(self.find(text), key=lambda m: (-(m.end - m.start), m.start)):
+            if all(match.end <= other.start or match.start >= other.end for other in chosen):
+                chosen.append(match)
+        return sorted(chosen, key=lambda m: m.start)
+
+    def containing(self, text) -> list:
+        """Returns the payloads of names that contain ``text`` as a whole-token fragment."""
+        entries = self._fragments.get(tuple(tokenize(text)), [])
+        return [payload for entry in entries for payload in self._payloads[entry]]
+
+    def match_payloads(self, text) -> list:
+        """Returns the payloads of the name ``text`` spells, else of names containing it, else of names it mentions.
+
+        A partial name ("Lake Pro") resolves to the names it is part of ("Data Lake Pro"), not to a
+        shorter name inside it ("Lake").
+        """
+        tokens = tuple(tokenize(text))
+        entries = self._fragments.get(tokens, [])
+        exact = [entry for entry in entries if self._lengths[entry] == len(tokens)]
+        if exact or entries:
+            return [payload for entry in exact or entries for payload in self._payloads[entry]]
+        return [payload for match in self.mentions(text) for payload in match.payloads]
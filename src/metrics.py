@@ -0,0 +1,368 @@
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from src import config
+
+# Histogram bucket upper bounds in seconds: sub-millisecond scoring up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Function to escape a label value for the exposition format
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# Function to format a label set
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+# Function to format a sample value
+def _format_value(value) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names; one series per label combination."""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _own_series(self) -> dict:
+        """Returns the series of this process. Callers hold self._lock."""
+        # Series inherited through fork() (e.g. from a preloading gunicorn master) belong to the parent
+        if self._pid != os.getpid():
+            self._series = {}
+            self._pid = os.getpid()
+        return self._series
+
+    def _key(self, labels) -> tuple:
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yields (sample name, label pairs, value) for every series."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._own_series()
+            series[key] = series.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            series = list(self._own_series().items())
+        for key, value in series:
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._own_series().get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                series = self._own_series()[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the ``with`` block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._own_series().items()]
+        for key, counts, total, count in series:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', pairs + [('le', _format_value(bound))], cumulative
+            yield f'{self.name}_sum', pairs, total
+            yield f'{self.name}_count', pairs, count
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format.
+
+    Collectors are callables returning (name, kind, documentation, labels dict, value) tuples,
+    for values kept elsewhere (e.g. cache statistics) that are read at scrape time.
+
+    With a ``directory``, every process of the server writes its values to its own file there
+    (``flush``, also run every few seconds by ``start_flusher``) and ``render`` adds up the files
+    of all processes, so any worker answers a scrape for the whole server. Counters and histograms
+    are summed, including those of exited workers (see ``archive_process``); gauges keep one series
+    per live process under a ``pid`` label.
+    """
+
+    def __init__(self, directory=None):
+        self._metrics = {}
+        self._collectors = []
+        self.directory = directory
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector) -> None:
+        self._collectors.append(collector)
+
+    def families(self) -> list:
+        """Returns the metrics of this process as (name, kind, documentation, [(sample name, label pairs, value)])."""
+        families = [
+            (metric.name, metric.kind, metric.documentation, list(metric.samples()))
+            for metric in self._metrics.values()
+        ]
+        collected = {}
+        for collector in self._collectors:
+            for name, kind, documentation, labels, value in collector():
+                family = collected.setdefault(name, (name, kind, documentation, []))
+                family[3].append((name, sorted(labels.items()), value))
+        return families + list(collected.values())
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        families = self.families()
+        if self.directory:
+            # Write this process's values first: every process's contribution then only grows between scrapes
+            self.flush(families)
+            families = merge_families(read_process_files(self.directory))
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, pairs, value in samples:
+                lines.append(f'{sample_name}{_format_labels(pairs)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def flush(self, families=None) -> None:
+        """Writes the values of this process to its file in the metrics directory."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'{PROCESS_FILE_PREFIX}{os.getpid()}.json')
+        with self._flush_lock:
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(families or self.families(), f)
+            os.replace(tmp_path, path)
+
+    def start_flusher(self, interval: float | None = None) -> threading.Thread | None:
+        """Starts flushing this process's values every ``interval`` seconds (ARE_METRICS_FLUSH_INTERVAL by default).
+
+        Threads do not survive a fork, so servers start it in each worker. Returns None without a directory.
+        """
+        interval = config.METRICS_FLUSH_INTERVAL if interval is None else interval
+        if not self.directory or interval <= 0:
+            return None
+        with self._flush_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_forever, args=(interval,),
+                                                 name='metrics-flusher', daemon=True)
+                self._flusher.start()
+        return self._flusher
+
+    def _flush_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def archive_process(self, pid: int) -> None:
+        """Keeps the counters and histograms of an exited process in the totals, dropping its gauges."""
+        path = os.path.join(self.directory, f'{PROCESS_FILE_PREFIX}{pid}.json')
+        try:
+            os.replace(path, os.path.join(self.directory, f'{ARCHIVE_FILE_PREFIX}{pid}-{time.time_ns()}.json'))
+        except FileNotFoundError:
+            pass
+
+    def clear_directory(self) -> None:
+        """Removes the files of a previous server run from the metrics directory."""
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.listdir(self.directory):
+            if entry.startswith((PROCESS_FILE_PREFIX, ARCHIVE_FILE_PREFIX)):
+                os.remove(os.path.join(self.directory, entry))
+
+
+# File names of the per-process metrics files (see Registry)
+PROCESS_FILE_PREFIX = 'process-'
+ARCHIVE_FILE_PREFIX = 'archived-'
+
+
+# Function to read the metrics files of every process
+def read_process_files(directory: str) -> list:
+    """Returns (pid or None for exited processes, families) for every metrics file in ``directory``."""
+    processes = []
+    for entry in sorted(os.listdir(directory)):
+        if not entry.endswith('.json') or not entry.startswith((PROCESS_FILE_PREFIX, ARCHIVE_FILE_PREFIX)):
+            continue
+        try:
+            with open(os.path.join(directory, entry)) as f:
+                families = json.load(f)
+        except (OSError, ValueError):
+            continue  # Archived or replaced meanwhile
+        pid = entry[len(PROCESS_FILE_PREFIX):-len('.json')] if entry.startswith(PROCESS_FILE_PREFIX) else None
+        processes.append((pid, families))
+    return processes
+
+
+# Function to add up the metrics of several processes
+def merge_families(processes) -> list:
+    """Returns the families of all ``processes``: counters and histograms summed, gauges labelled by pid."""
+    merged = {}
+    for pid, families in processes:
+        for name, kind, documentation, samples in families:
+            if kind == 'gauge' and pid is None:
+                continue
+            family = merged.setdefault(name, (name, kind, documentation, {}))
+            for sample_name, pairs, value in samples:
+                pairs = tuple(tuple(pair) for pair in pairs)
+                if kind == 'gauge':
+                    pairs += (('pid', pid),)
+                key = (sample_name, pairs)
+                family[3][key] = family[3].get(key, 0) + value
+    return [
+        (name, kind, documentation, [(sample_name, list(pairs), value) for (sample_name, pairs), value in samples.items()])
+        for name, kind, documentation, samples in merged.values()
+    ]
+
+
+# Metrics of the recommendation service
+registry = Registry(config.METRICS_DIR or None)
+
+STAGE_SECONDS = registry.histogram(
+    'are_stage_duration_seconds', 'Time spent in each stage of the query pipelines and recommenders.',
+    ['pipeline', 'stage'],
+)
+REQUEST_SECONDS = registry.histogram(
+    'are_http_request_duration_seconds', 'HTTP request latency until the response is returned.',
+    ['method', 'endpoint', 'status'],
+)
+COALESCED_BATCH_SIZE = registry.histogram(
+    'are_coalesced_batch_size', 'Number of requests scored together by a micro-batcher.', ['batcher'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+ROUTE_DECISIONS = registry.counter(
+    'are_route_decisions_total', 'Routed queries by destination and deciding router.', ['destination', 'source'],
+)
+REJECTED_REQUESTS = registry.counter(
+    'are_rejected_requests_total', 'Requests refused with 503 because the async request queue was full.', ['endpoint'],
+)
+MODEL_RELOADS = registry.counter(
+    'are_model_reloads_total', 'Model bundle reloads that swapped in a new bundle or failed.', ['result'],
+)
+LLM_CALLS = registry.counter('are_llm_calls_total', 'LLM calls by purpose.', ['purpose'])
+LLM_ERRORS = registry.counter('are_llm_errors_total', 'LLM calls that raised, by purpose.', ['purpose'])
+LLM_TOKENS = registry.counter(
+    'are_llm_tokens_total', 'LLM tokens reported by the provider, by purpose and direction.', ['purpose', 'kind'],
+)
+
+
+# Decorator to time a pipeline stage
+def timed(pipeline: str, stage: str):
+    """Records each call of the decorated function in STAGE_SECONDS.
+
+    Generator functions are timed until the generator is exhausted or closed, so streamed
+    stages include the time spent producing every chunk; coroutine functions until they return.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_generator_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(pipeline=pipeline, stage=stage):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return async_generator_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def coroutine_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(pipeline=pipeline, stage=stage):
+                    return await func(*args, **kwargs)
+            return coroutine_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(pipeline=pipeline, stage=stage):
+                    return (yield from func(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(pipeline=pipeline, stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Context manager counting an LLM call and its failure
+@contextmanager
+def llm_call(purpose: str):
+    """Counts an LLM call for ``purpose`` and, if the block raises, an LLM error."""
+    LLM_CALLS.inc(purpose=purpose)
+    try:
+        yield
+    except Exception:
+        LLM_ERRORS.inc(purpose=purpose)
+        raise
+
+
+# Function to count the tokens reported on an LLM message or chunk
+def record_llm_usage(purpose: str, message) -> None:
+    """Adds the input/output token counts of ``message`` (LangChain usage metadata), if any."""
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        LLM_TOKENS.inc(usage.get('input_tokens', 0), purpose=purpose, kind='input')
+        LLM_TOKENS.inc(usage.get('output_tokens', 0), purpose=purpose, kind='output')
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from src import config
+from src.catalog import Catalog, get_catalog, latest_catalog, set_catalog
+from src.metrics import MODEL_RELOADS, registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Catalog and every model built from it, served together as one version.
+
+    A request takes the current bundle once and uses it to the end. A reload builds a whole
+    new bundle aside and swaps it in with a single assignment, so in-flight requests finish
+    on the version they started with and the old bundle is freed once they are done.
+    """
+    version: str
+    catalog: Catalog
+    content: object  # content_based_filtering.ContentModel
+    hybrid: object  # hybrid_recommendation.HybridModel
+    context_builder: object  # services.context_builder.ContextBuilder
+    loaded_at: float
+
+
+# Function to build every model of a catalog
+def build_bundle(catalog: Catalog) -> ModelBundle:
+    """Builds the content, hybrid and context models of ``catalog`` (reusing its snapshot artifacts)."""
+    # Imported here: these modules serve the current bundle and import this one
+    from src.content_based_filtering import ContentModel
+    from src.hybrid_recommendation import HybridModel
+    from src.services.context_builder import ContextBuilder
+
+    # The hybrid model scores content with the bundle's content model
+    content = ContentModel(catalog)
+    return ModelBundle(
+        version=catalog.version,
+        catalog=catalog,
+        content=content,
+        hybrid=HybridModel(catalog, content),
+        context_builder=ContextBuilder(catalog, config.CONTEXT_DESCRIPTION_CHARS),
+        loaded_at=time.time(),
+    )
+
+
+_bundle = None
+_bundle_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_watcher = None
+
+
+# Function to get the bundle being served
+def current() -> ModelBundle:
+    """Returns the bundle being served, building it from the shared catalog on first use."""
+    global _bundle
+    bundle = _bundle
+    if bundle is None:
+        with _bundle_lock:
+            if _bundle is None:
+                _bundle = build_bundle(get_catalog())
+            bundle = _bundle
+    return bundle
+
+
+# Function to reload the catalog and models
+def reload(force: bool = False) -> bool:
+    """Swaps in a bundle built from the latest snapshot, compiling it first if the workbooks changed.
+
+    Returns False when the served version is already current, unless ``force`` rebuilds the models
+    of that version anyway (e.g. after changing model settings). A failed build leaves the
+    served bundle in place and raises.
+    """
+    global _bundle
+    with _reload_lock:
+        served = current()
+        catalog = latest_catalog(served.version)
+        if catalog is None and not force:
+            return False
+
+        started = time.perf_counter()
+        try:
+            bundle = build_bundle(catalog or served.catalog)
+        except Exception:
+            MODEL_RELOADS.inc(result='error')
+            raise
+        _bundle = bundle
+        set_catalog(bundle.catalog)
+        MODEL_RELOADS.inc(result='swapped')
+        logger.info('Serving models of catalog %s (was %s), built in %.2fs',
+                    bundle.version, served.version, time.perf_counter() - started)
+        return True
+
+
+# Function to reload without blocking the caller
+def reload_in_background(force: bool = False) -> bool:
+    """Starts ``reload`` in a thread; returns False if a reload is already running."""
+    if _reload_lock.locked():
+        return False
+    threading.Thread(target=_reload_logged, args=(force,), name='model-reload', daemon=True).start()
+    return True
+
+
+# Function to reload, logging a failure instead of raising (the served bundle stays in place)
+def _reload_logged(force=False):
+    try:
+        reload(force)
+    except Exception:
+        logger.exception('Model reload failed; still serving catalog %s', current().version)
+
+
+# Function to reload whenever the workbooks change
+def watch(interval: float) -> None:
+    """Checks the workbooks every ``interval`` seconds and reloads when they changed (runs forever)."""
+    while True:
+        time.sleep(interval)
+        _reload_logged()
+
+
+# Function to start the workbook watcher of this process
+def start_watcher(interval: float | None = None) -> threading.Thread | None:
+    """Starts ``watch`` in a daemon thread (ARE_RELOAD_INTERVAL by default) unless one is running.
+
+    Threads do not survive a fork, so servers start it in each worker. Returns None when disabled.
+    """
+    global _watcher
+    interval = config.RELOAD_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    with _bundle_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=watch, args=(interval,), name='model-watcher', daemon=True)
+            _watcher.start()
+    return _watcher
+
+
+# Function to expose the served version as a metric
+def bundle_metrics():
+    """Returns the catalog version and load time of the served bundle as metric samples."""
+    bundle = _bundle
+    if bundle is None:
+        return []
+    return [
+        ('are_model_bundle_loaded_timestamp_seconds', 'gauge', 'When the served model bundle was built, by version.',
+         {'version': bundle.version}, bundle.loaded_at),
+    ]
+
+
+registry.add_collector(bundle_metrics)
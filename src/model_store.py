@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+
+import numpy as np
+from surprise.prediction_algorithms.knns import SymmetricAlgo
+
+from src.catalog import load_array, snapshot_lock, snapshot_path
+from src.cf_scoring import fit_similarity
+
+logger = logging.getLogger(__name__)
+
+# Collaborative filtering artifacts stored next to the catalog snapshot
+CF_SIM_FILE = 'cf_sim.npy'
+CF_IDS_FILE = 'cf_ids.json'
+
+
+# Function to list the raw ids of a Surprise trainset in inner-id order
+def trainset_ids(trainset) -> dict:
+    """Returns the company and product id maps of a trainset (position = inner id)."""
+    return {
+        'companies': [trainset.to_raw_uid(inner) for inner in range(trainset.n_users)],
+        'products': [trainset.to_raw_iid(inner) for inner in range(trainset.n_items)],
+    }
+
+
+# Function to save the fitted KNN similarity matrix and id maps into the snapshot
+def save_cf_artifacts(version: str, algo) -> None:
+    """Writes the similarity matrix and id maps of a fitted KNN model for snapshot ``version``."""
+    sim_path = snapshot_path(version, CF_SIM_FILE)
+    tmp_path = f'{sim_path}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, np.ascontiguousarray(algo.sim))
+    os.replace(tmp_path, sim_path)
+
+    # The id maps are written last: their presence marks the artifacts complete
+    ids_path = snapshot_path(version, CF_IDS_FILE)
+    tmp_path = f'{ids_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(trainset_ids(algo.trainset), f)
+    os.replace(tmp_path, ids_path)
+
+
+# Function to load the KNN similarity matrix saved for a trainset
+def load_cf_similarity(version: str, trainset) -> np.ndarray | None:
+    """Returns the (memory-mapped) similarity matrix of ``version``, or None if missing or built for other ids."""
+    try:
+        with open(snapshot_path(version, CF_IDS_FILE)) as f:
+            ids = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if ids != trainset_ids(trainset):
+        return None
+    return load_array(version, CF_SIM_FILE)
+
+
+# Function to fit a KNN model, reusing the similarity matrix from the snapshot when possible
+def fit_knn(algo, trainset, version: str):
+    """Fits ``algo`` on ``trainset``, sharing the snapshot's similarity matrix instead of recomputing it."""
+    sim = load_cf_similarity(version, trainset)
+    if sim is None:
+        with snapshot_lock():
+            # Another process may have saved the artifacts while we waited for the lock
+            sim = load_cf_similarity(version, trainset)
+            if sim is None:
+                logger.info('Fitting collaborative filtering model for snapshot %s', version)
+                fit_similarity(algo, trainset)
+                save_cf_artifacts(version, algo)
+                sim = load_cf_similarity(version, trainset)
+
+    # Same state KNNBasic.fit sets up, with the similarity matrix taken from the snapshot
+    SymmetricAlgo.fit(algo, trainset)
+    algo.sim = sim
+    return algo
@@ -0,0 +1,28 @@
+import numpy as np
+
+
+# Function to select the top N entries without fully sorting the scores
+def top_n_indices(scores, top_n):
+    """Returns the indices of the ``top_n`` highest scores in descending order (per row for 2-D input).
+
+    Uses partial selection instead of a full sort; ties are broken by the lower index,
+    which gives the same order as a stable sort of all scores.
+    """
+    scores = np.asarray(scores)
+    rows = np.atleast_2d(scores)
+    n_rows, n_cols = rows.shape
+    top_n = max(0, min(top_n, n_cols))
+    if top_n == 0:
+        top = np.empty((n_rows, 0), dtype=np.intp)
+    else:
+        # N-th largest score of every row
+        kth = -np.partition(-rows, top_n - 1, axis=1)[:, top_n - 1]
+        above = rows > kth[:, None]
+        ties = rows == kth[:, None]
+        # Fill the remaining slots with the lowest-index ties so exactly N entries are selected per row
+        missing = top_n - above.sum(axis=1)
+        selected = above | (ties & (np.cumsum(ties, axis=1) <= missing[:, None]))
+        candidates = np.nonzero(selected)[1].reshape(n_rows, top_n)
+        order = np.argsort(-np.take_along_axis(rows, candidates, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(candidates, order, axis=1)
+    return top[0] if scores.ndim == 1 else top
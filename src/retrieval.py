@@ -0,0 +1,83 @@
+import numpy as np
+from scipy import sparse
+
+from src.ranking import top_n_indices
+
+
+class InvertedIndex:
+    """Term posting lists over a TF-IDF matrix answering top-k cosine queries.
+
+    Each term's postings are sorted by descending weight, so the weight at the next unread
+    position bounds the contribution of every document not seen yet. Queries read postings of
+    their own terms in blocks, fully score each new document, and stop as soon as the k-th best
+    score beats that bound (Fagin's threshold algorithm).
+    """
+
+    def __init__(self, tfidf_matrix, block_size=64):
+        self.block_size = block_size
+        self.n_docs = tfidf_matrix.shape[0]
+        # Row access for exact scores of candidate documents
+        self.doc_matrix = sparse.csr_matrix(tfidf_matrix)
+
+        postings = sparse.csc_matrix(tfidf_matrix)
+        postings.sum_duplicates()
+        terms = np.repeat(np.arange(postings.shape[1]), np.diff(postings.indptr))
+        order = np.lexsort((-postings.data, terms))
+        self.indptr = postings.indptr
+        self.docs = postings.indices[order]
+        self.weights = postings.data[order]
+
+        # Highest weight of every term (0 for terms without postings)
+        self.max_weight = np.zeros(postings.shape[1])
+        non_empty = np.flatnonzero(np.diff(self.indptr))
+        self.max_weight[non_empty] = self.weights[self.indptr[non_empty]]
+
+    def top_k(self, query, k):
+        """Returns (doc ids, scores) of the k best documents with a positive score, best first.
+
+        ``query`` is a single TF-IDF row as produced by the fitted vectorizer. Ties are broken
+        by the lower document id, like a stable sort over all documents.
+        """
+        query = sparse.csr_matrix(query)
+        terms, query_weights = query.indices, query.data
+        useful = self.max_weight[terms] > 0
+        terms, query_weights = terms[useful], query_weights[useful]
+
+        best_docs = np.empty(0, dtype=self.docs.dtype)
+        best_scores = np.empty(0)
+        if k <= 0 or terms.size == 0:
+            return best_docs, best_scores
+
+        starts, ends = self.indptr[terms], self.indptr[terms + 1]
+        seen = np.empty(0, dtype=self.docs.dtype)
+        query_column = query.T.tocsc()
+        depth = 0
+        while True:
+            lo = starts + depth
+            hi = np.minimum(lo + self.block_size, ends)
+            live = lo < ends
+            if not live.any():
+                break
+
+            # Fully score documents met for the first time in this block of postings
+            block = np.unique(np.concatenate([self.docs[a:b] for a, b in zip(lo[live], hi[live])]))
+            candidates = np.setdiff1d(block, seen, assume_unique=True)
+            if candidates.size:
+                seen = np.union1d(seen, candidates)
+                scores = (self.doc_matrix[candidates] @ query_column).toarray().ravel()
+                best_docs = np.concatenate([best_docs, candidates])
+                best_scores = np.concatenate([best_scores, scores])
+                by_doc = np.argsort(best_docs, kind='stable')
+                keep = by_doc[top_n_indices(best_scores[by_doc], k)]
+                best_docs, best_scores = best_docs[keep], best_scores[keep]
+
+            # Upper bound on the score of any document not seen yet
+            depth += self.block_size
+            next_pos = starts + depth
+            unread = next_pos < ends
+            bound = float(query_weights[unread] @ self.weights[next_pos[unread]])
+            if best_scores.size == k and best_scores[-1] > bound:
+                break
+
+        positive = best_scores > 0
+        return best_docs[positive], best_scores[positive]
@@ -0,0 +1,121 @@
+import logging
+import os
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+
+from src.catalog import load_array, snapshot_lock, snapshot_path
+from src.ranking import top_n_indices
+
+logger = logging.getLogger(__name__)
+
+# Accelerator rows scored per block when vectors are int8 (bounds the dequantized copy)
+SCORE_BLOCK_ROWS = 8192
+
+
+# Function to quantize unit vectors to int8
+def quantize_rows(vectors: np.ndarray) -> tuple:
+    """Returns (int8 vectors, float32 per-row scales) with ``vectors ~= int8 * scale``."""
+    scale = np.abs(vectors).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scale[:, None]), -127, 127).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+class SemanticIndex:
+    """Accelerators projected into a dense low-rank (LSA) space of the TF-IDF matrix.
+
+    Document vectors are unit length, stored as one contiguous float32 or int8 array, so
+    cosine scores of a query are one matrix-vector product followed by a partial top-k.
+    Terms that co-occur across accelerators share dimensions, so queries also match
+    accelerators using related words.
+    """
+
+    def __init__(self, components: np.ndarray, vectors: np.ndarray, scale: np.ndarray = None):
+        self.components = components  # (dims x terms) projection of TF-IDF rows
+        self.vectors = vectors  # (accelerators x dims) unit vectors, float32 or int8
+        self.scale = scale  # per-row dequantization factor of int8 vectors
+        self.n_docs = vectors.shape[0]
+
+    @classmethod
+    def fit(cls, tfidf_matrix, n_components=256, quantize=False, random_state=0):
+        """Fits a TruncatedSVD of ``tfidf_matrix`` and returns the index of its rows."""
+        n_components = max(1, min(n_components, min(tfidf_matrix.shape) - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        vectors = svd.fit_transform(tfidf_matrix)
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors /= np.where(norms > 0, norms, 1.0)[:, None]
+        components = np.ascontiguousarray(svd.components_, dtype=np.float32)
+        if quantize:
+            quantized, scale = quantize_rows(vectors)
+            return cls(components, quantized, scale)
+        return cls(components, np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def embed(self, queries_tfidf) -> np.ndarray:
+        """Returns the unit-length low-rank vectors (queries x dims) of TF-IDF query rows."""
+        embedded = np.asarray(queries_tfidf @ self.components.T, dtype=np.float32)
+        norms = np.linalg.norm(embedded, axis=1, keepdims=True)
+        return embedded / np.where(norms > 0, norms, 1.0)
+
+    def score(self, queries_tfidf) -> np.ndarray:
+        """Returns the (queries x accelerators) cosine scores in the low-rank space."""
+        embedded = self.embed(queries_tfidf)
+        if self.scale is None:
+            return embedded @ self.vectors.T
+
+        scores = np.empty((embedded.shape[0], self.n_docs), dtype=np.float32)
+        for start in range(0, self.n_docs, SCORE_BLOCK_ROWS):
+            end = min(self.n_docs, start + SCORE_BLOCK_ROWS)
+            block = self.vectors[start:end].astype(np.float32)
+            scores[:, start:end] = (embedded @ block.T) * self.scale[start:end]
+        return scores
+
+    def top_k(self, query_tfidf, k) -> tuple:
+        """Returns (row indices, scores) of the k best accelerators for one TF-IDF query row, best first."""
+        scores = self.score(query_tfidf)[0]
+        top = top_n_indices(scores, k)
+        return top, scores[top]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index arrays."""
+        return self.components.nbytes + self.vectors.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+
+# Function to name the snapshot files of an index configuration
+def _file_names(n_components: int, quantize: bool) -> dict:
+    prefix = f"semantic_{n_components}{'_q8' if quantize else ''}"
+    return {name: f'{prefix}_{name}.npy' for name in ('components', 'vectors', 'scale')}
+
+
+# Function to load the semantic index of a snapshot, fitting it on first use
+def load_semantic_index(catalog, n_components=256, quantize=False) -> SemanticIndex:
+    """Returns the SemanticIndex of ``catalog``, memory-mapped from its snapshot (fitted and saved if missing)."""
+    files = _file_names(n_components, quantize)
+    names = ('components', 'vectors', 'scale') if quantize else ('components', 'vectors')
+
+    def load():
+        try:
+            return SemanticIndex(**{name: load_array(catalog.version, files[name]) for name in names})
+        except FileNotFoundError:
+            return None
+
+    index = load()
+    if index is None:
+        with snapshot_lock():
+            # Another process may have saved the index while we waited for the lock
+            index = load()
+            if index is None:
+                logger.info('Fitting %d-dimensional semantic index for snapshot %s', n_components, catalog.version)
+                fitted = SemanticIndex.fit(catalog.tfidf_matrix, n_components, quantize)
+                # The vectors are written last: their presence marks the index complete
+                arrays = {'components': fitted.components, 'scale': fitted.scale, 'vectors': fitted.vectors}
+                for name, array in arrays.items():
+                    if array is None:
+                        continue
+                    path = snapshot_path(catalog.version, files[name])
+                    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+                    np.save(tmp_path, array)
+                    os.replace(tmp_path, path)
+                index = load()
+    return index
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+import openai
+
+from src import config
+from src.metrics import registry
+
+
+class Overloaded(Exception):
+    """Raised when a request arrives while the wait queue is full."""
+
+
+class ConcurrencyLimiter:
+    """Bounds the requests processed at once and the requests waiting for a slot.
+
+    Up to ``max_concurrency`` requests hold a slot; up to ``max_queue`` more wait for one in
+    arrival order. Beyond that a request is refused at once, so an overloaded worker answers
+    503 quickly instead of letting latency grow without bound.
+    """
+
+    def __init__(self, max_concurrency=64, max_queue=256):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    @classmethod
+    def from_config(cls):
+        """Creates the limiter configured by the ARE_ASYNC_* settings."""
+        return cls(config.ASYNC_MAX_CONCURRENCY, config.ASYNC_QUEUE_SIZE)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds a processing slot for the ``async with`` block; raises Overloaded if the queue is full."""
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise Overloaded(f"{self.waiting} requests already waiting")
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+# Exceptions meaning the LLM did not answer in time: our own deadline, or the client's timeout after its retries
+LLM_TIMEOUT_ERRORS = (TimeoutError, openai.APITimeoutError, httpx.TimeoutException)
+
+
+# Function to await one LLM call within the configured timeout
+async def with_timeout(awaitable):
+    """Returns the result of ``awaitable``; raises TimeoutError once every attempt could have timed out.
+
+    The client already bounds each attempt by LLM_TIMEOUT; this deadline also covers its retries.
+    """
+    return await asyncio.wait_for(awaitable, config.LLM_TIMEOUT * (config.LLM_MAX_RETRIES + 1))
+
+
+# Function to iterate a stream while bounding the wait for each chunk
+async def iter_with_timeout(stream: AsyncIterator) -> AsyncIterator:
+    """Yields the items of ``stream``; raises TimeoutError if one takes more than LLM_TIMEOUT seconds."""
+    iterator = stream.__aiter__()
+    while True:
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), config.LLM_TIMEOUT)
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+# Limiter shared by the LLM-bound endpoints of the async server (one per worker process)
+request_limiter = ConcurrencyLimiter.from_config()
+
+
+# Function to expose the limiter occupancy as metrics
+def limiter_metrics():
+    """Returns the active and waiting request counts as metric samples, read at scrape time."""
+    return [
+        ("are_async_requests_active", "gauge", "LLM-bound requests being processed.", {}, request_limiter.active),
+        ("are_async_requests_waiting", "gauge", "LLM-bound requests waiting for a slot.", {}, request_limiter.waiting),
+    ]
+
+
+registry.add_collector(limiter_metrics)
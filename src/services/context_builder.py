@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from src import config, model_bundle
+
+# Rough size of a token in characters, used to keep the prompt within budget without a tokenizer
+CHARS_PER_TOKEN = 4
+
+NO_DATA = "No relevant data found."
+OMITTED_NOTE = "({} more matching accelerators not shown)"
+SEPARATOR = "\n\n"
+
+
+# Function to estimate the number of tokens in a text
+def estimate_tokens(text: str) -> int:
+    """Approximates the LLM token count of ``text``."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Function to shorten a text to a word boundary
+def trim_text(text: str, max_chars: int) -> str:
+    """Returns ``text`` cut to at most ``max_chars`` characters at a word boundary, with an ellipsis."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+class ContextBuilder:
+    """Builds the accelerator context of product-info prompts within a token budget.
+
+    One snippet per accelerator (name, product, category, type, short and trimmed description)
+    is formatted when the catalog loads, so a request only ranks matching rows and joins strings.
+    """
+
+    def __init__(self, catalog, description_chars=300):
+        self.matcher = catalog.accelerator_matcher
+        info_df = catalog.info_df
+
+        def column(name):
+            values = info_df[name] if name in info_df else pd.Series([""] * len(info_df))
+            return [str(value).strip() if pd.notna(value) else "" for value in values]
+
+        self.snippets = []
+        for name, product, category, kind, short, description in zip(
+            column("Name_x"), column("Product"), column("Category"), column("Type"),
+            column("Short description"), column("Description"),
+        ):
+            lines = [f"Accelerator: {name}", f"Product: {product}", f"Category: {category}"]
+            if kind:
+                lines.append(f"Type: {kind}")
+            lines.append(f"Short description: {short}")
+            if description:
+                lines.append(f"Description: {trim_text(description, description_chars)}")
+            self.snippets.append("\n".join(lines))
+        self.token_counts = np.array([estimate_tokens(snippet) for snippet in self.snippets])
+
+        # TF-IDF vectors of the snippets, to rank partial-name matches by relevance to the query
+        self.tfidf = catalog.tfidf
+        self.snippet_vectors = self.tfidf.transform(self.snippets)
+
+    def rank(self, query: str) -> list:
+        """Returns the matching snippet rows, most relevant first."""
+        mentioned = [row for match in self.matcher.mentions(query) for row in match.payloads]
+        if mentioned:
+            # Accelerators named in the query, in the order they are mentioned
+            return list(dict.fromkeys(mentioned))
+
+        rows = np.array(sorted(set(self.matcher.containing(query))), dtype=np.intp)
+        if rows.size <= 1:
+            return rows.tolist()
+        scores = (self.snippet_vectors[rows] @ self.tfidf.transform([query]).T).toarray().ravel()
+        return rows[np.argsort(-scores, kind="stable")].tolist()
+
+    def build(self, query: str, token_budget: int = None) -> str:
+        """Returns the ranked snippets matching ``query`` that fit in ``token_budget`` tokens."""
+        token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        ranked = self.rank(query)
+        if not ranked:
+            return NO_DATA
+
+        # Joined texts never estimate above the sum of their parts, so counting separators keeps the total in budget
+        separator_tokens = estimate_tokens(SEPARATOR)
+        note_tokens = 0
+        if self.token_counts[ranked].sum() + separator_tokens * (len(ranked) - 1) > token_budget:
+            # Not every match fits: keep room for the note saying how many were left out
+            note_tokens = separator_tokens + estimate_tokens(OMITTED_NOTE.format(len(ranked)))
+
+        parts, used = [], 0
+        for row in ranked:
+            cost = self.token_counts[row] + (separator_tokens if parts else 0)
+            if used + cost <= token_budget - note_tokens:
+                parts.append(self.snippets[row])
+                used += cost
+
+        if not parts:
+            # Even the best match is larger than the budget: send as much of it as fits
+            return self.snippets[ranked[0]][:max(token_budget - 1, 0) * CHARS_PER_TOKEN]
+        if len(parts) < len(ranked):
+            parts.append(OMITTED_NOTE.format(len(ranked) - len(parts)))
+        return SEPARATOR.join(parts)
+
+# Function to build the product-info context with the catalog of a model bundle
+def build_context(query: str, bundle=None) -> str:
+    """Returns the context of ``query`` from the context builder of ``bundle`` (the bundle being served by default)."""
+    return (bundle or model_bundle.current()).context_builder.build(query)
@@ -1,21 +1,18 @@
 from langchain_openai import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema.runnable import RunnableSequence
-import pandas as pd
+from src.catalog import get_catalog
 
-# Load the accelerators and products data
-accelerators_df = pd.read_excel('data/accelerators.xlsx')
-products_df = pd.read_excel('data/products.xlsx')
-
-# Merge accelerators and products on "Product" from accelerators_df and "Name" from products_df
-merged_df = pd.merge(accelerators_df, products_df, how='left', left_on='Product', right_on='Name')
+# Load the accelerators and products data merged on "Product" from accelerators_df and "Name" from products_df
+catalog = get_catalog()
+merged_df = catalog.info_df
 
 # LangChain setup for conversation
 llm = OpenAI(openai_api_key='')
 
 # Function to retrieve relevant accelerator/product information
 def fetch_accelerator_data(accelerator_name):
-    accelerator_info = merged_df[merged_df['Name_x'].str.contains(accelerator_name, case=False)]
+    accelerator_info = merged_df.iloc[catalog.accelerator_matcher.match_payloads(accelerator_name)]
     
     if not accelerator_info.empty:
         accelerator_desc = accelerator_info.iloc[0]['Short description']
@@ -43,7 +40,7 @@ def get_prompt_template(user_input, accelerator_context=""):
 # Function to process user input using LangChain
 def process_user_input(user_input):
     # Check if user is asking about a specific accelerator
-    relevant_accelerators = [name for name in merged_df['Name_x'] if name.lower() in user_input.lower()]
+    relevant_accelerators = [match.name for match in catalog.accelerator_matcher.mentions(user_input)]
     
     # If there's a specific accelerator in the query, fetch its data
     if relevant_accelerators:
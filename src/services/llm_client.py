@@ -0,0 +1,107 @@
+import threading
+from typing import Literal, NamedTuple
+
+import httpx
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from typing_extensions import TypedDict
+
+from src import config
+
+# One LLM client and its chains per process, shared by every query processor: prompts and structured
+# output are built once, and HTTP connections to the API stay open between requests. The client is
+# created on the first LLM call, so the service starts (and its local endpoints work) without OPENAI_API_KEY.
+
+
+# Define schema for output
+class RouteQuery(TypedDict):
+    """Route query to appropriate destination."""
+    destination: Literal["recommendation", "product_info"]
+
+
+# Routing prompt: the query is the only variable
+ROUTE_SYSTEM = """
+    You are a smart assistant that can route user queries. Based on the input, decide if the user needs:
+    - "recommendation" if the query is about product suggestions.
+    - "product_info" if the query is about product details.
+    Respond only with one of these categories as the destination.
+    """
+ROUTE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", ROUTE_SYSTEM),
+        ("human", "{query}"),
+    ]
+)
+
+# Product-info prompt: the context and query are template variables, so braces in them are sent as-is
+ANSWER_PROMPT = PromptTemplate.from_template("""
+    You are an assistant. Based on the user's query, provide any information about Accelerator and product data that you have.
+
+    Accelerator and product data: {context}
+
+    User query: {input}
+    Response:
+    """)
+
+
+# Function to build the connection pool limits of the HTTP clients
+def pool_limits() -> httpx.Limits:
+    """Returns the connection limits configured by ARE_LLM_MAX_CONNECTIONS / ARE_LLM_KEEPALIVE_CONNECTIONS."""
+    return httpx.Limits(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+# Function to create the shared chat model
+def build_llm() -> ChatOpenAI:
+    """Creates the chat model with pooled keep-alive connections, a timeout per attempt and bounded retries.
+
+    Retries of failed or timed-out attempts back off exponentially (handled by the OpenAI client).
+    OPENAI_BASE_URL points the client at another OpenAI-compatible server, e.g. a local stub.
+    """
+    timeout = httpx.Timeout(config.LLM_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT)
+    return ChatOpenAI(
+        model=config.LLM_MODEL,
+        base_url=config.OPENAI_BASE_URL or None,
+        timeout=timeout,
+        max_retries=config.LLM_MAX_RETRIES,
+        http_client=httpx.Client(limits=pool_limits(), timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=pool_limits(), timeout=timeout),
+        stream_usage=True,
+    )
+
+
+class LLMChains(NamedTuple):
+    """The shared chat model and the chains built on it."""
+    llm: ChatOpenAI
+    route: Runnable
+    answer: Runnable
+
+
+# Function to build the chat model and its chains
+def build_chains() -> LLMChains:
+    llm = build_llm()
+    return LLMChains(
+        llm=llm,
+        # include_raw keeps the message so its token usage can be recorded
+        route=ROUTE_PROMPT | llm.with_structured_output(RouteQuery, include_raw=True),
+        answer=ANSWER_PROMPT | llm,
+    )
+
+
+_chains = None
+_chains_lock = threading.Lock()
+
+
+# Function to get the shared chains, creating the client on first use
+def get_chains() -> LLMChains:
+    """Returns the process-wide LLM chains; raises the client's error (e.g. a missing API key) until it can be built."""
+    global _chains
+    if _chains is None:
+        with _chains_lock:
+            if _chains is None:
+                _chains = build_chains()
+    return _chains
@@ -0,0 +1,270 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from src import model_bundle
+from src.metrics import STAGE_SECONDS, llm_call, record_llm_usage
+from src.services.async_limits import iter_with_timeout, with_timeout
+from src.services.context_builder import build_context
+from src.services.llm_client import RouteQuery, get_chains
+from src.services.query_router import RouteDecision, aroute_with_fallback, route_with_fallback, structured_response
+from src.services.response_cache import response_cache
+from src.services.speculation import Speculation
+
+# Bump when llm_client.ANSWER_PROMPT changes so cached answers from the old prompt are not reused
+PROMPT_VERSION = "product-info-v2"
+
+# Cache namespace of answers kept as the whole message string instead of its content (see message_answers)
+MESSAGE_PROMPT_VERSION = "product-info-message-v2"
+
+
+class QueryPipeline:
+    """Routes a chat query, then answers it with local recommendations or an LLM product-info answer.
+
+    The query processors only differ in their metric label and recommender, so each one is a
+    pipeline. ``recommend(query, *args, top_n=..., structured=..., bundle=...)`` returns the
+    recommendation response, where ``args`` are the extra request fields of the processor (e.g.
+    the company). A request takes the model bundle being served once and routes, recommends and
+    builds its context with that bundle, even if a reload swaps in another one meanwhile. Local
+    work starts while the LLM routes the query (see Speculation), product-info answers are kept in
+    the shared response cache, and every stage is timed under the pipeline ``name``.
+
+    With ``message_answers``, generated (not streamed) answers are the whole message string rather
+    than its content, as the /query endpoint has always returned them.
+    """
+
+    def __init__(self, name: str, recommend: Callable, message_answers: bool = False):
+        self.name = name
+        self.recommend = recommend
+        self.message_answers = message_answers
+
+    def stage(self, stage: str):
+        """Times the ``with`` block as ``stage`` of this pipeline."""
+        return STAGE_SECONDS.time(pipeline=self.name, stage=stage)
+
+    def search_context(self, query: str, bundle=None) -> str:
+        """Returns the ranked accelerator snippets relevant to the query, within the context token budget."""
+        with self.stage("context"):
+            return build_context(query, bundle)
+
+    def cache_key(self, query: str, context: str, streamed: bool = False) -> str:
+        # Streamed answers are message contents, shared between every pipeline
+        version = MESSAGE_PROMPT_VERSION if self.message_answers and not streamed else PROMPT_VERSION
+        return response_cache.make_key(query, context, get_chains().llm.model_name, version)
+
+    def answer_text(self, message) -> str:
+        if self.message_answers or not hasattr(message, 'content'):
+            return str(message)
+        return message.content
+
+    def fetch_answer(self, query: str, context: str = None) -> str:
+        """Generates the product-info answer over ``context`` (searched if not given), reusing a cached one."""
+        if context is None:
+            context = self.search_context(query)
+
+        # Reuse a recent answer to the same question over the same data
+        cache_key = self.cache_key(query, context)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Invoke the shared chain with the accelerator context to get a response
+        with self.stage("llm"), llm_call("answer"):
+            message = get_chains().answer.invoke({"input": query, "context": context})
+        record_llm_usage("answer", message)
+        answer = self.answer_text(message)
+        response_cache.set(cache_key, answer)
+        return answer
+
+    def stream_answer(self, query: str, context: str = None) -> Iterator[str]:
+        """Like ``fetch_answer``, yielding the answer in chunks as the LLM generates them."""
+        if context is None:
+            context = self.search_context(query)
+
+        cache_key = self.cache_key(query, context, streamed=True)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        # Forward each token chunk as soon as it arrives, then cache the whole answer
+        parts = []
+        started = time.perf_counter()
+        with self.stage("llm_stream"), llm_call("answer"):
+            for chunk in get_chains().answer.stream({"input": query, "context": context}):
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, pipeline=self.name, stage="llm_first_token")
+                record_llm_usage("answer", chunk)
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                parts.append(text)
+                yield text
+        response_cache.set(cache_key, ''.join(parts))
+
+    def recommendation(self, bundle, query: str, args: tuple, top_n: int = 5, structured: bool = False):
+        """Returns the top N recommendations as the HTML sentence, or as dictionaries when ``structured``."""
+        with self.stage("recommend"):
+            return self.recommend(query, *args, top_n=top_n, structured=structured, bundle=bundle)
+
+    def llm_route(self, query: str) -> RouteQuery:
+        """Uses the LLM to determine where the query should be routed (when the local router is not confident)."""
+        with self.stage("llm_route"), llm_call("route"):
+            result = get_chains().route.invoke({"query": query})
+            record_llm_usage("route", result["raw"])
+            if result["parsing_error"] is not None:
+                raise result["parsing_error"]
+        return result["parsed"]
+
+    def route(self, bundle, query: str, on_llm_route=None) -> RouteDecision:
+        """Routes the query locally when confident, otherwise with the LLM (calling ``on_llm_route`` first)."""
+        with self.stage("route"):
+            return route_with_fallback(query, self.llm_route, on_llm_route, bundle.catalog)
+
+    def speculate(self, bundle, query: str, args: tuple, top_n: int = 5, structured: bool = False) -> Speculation:
+        """Returns the recommendation and product-info context branches of the query, not started yet."""
+        return Speculation({
+            "recommendation": lambda: self.recommendation(bundle, query, args, top_n, structured),
+            "product_info": lambda: self.search_context(query, bundle),
+        })
+
+    def handle(self, decision: RouteDecision, query: str, speculation: Speculation):
+        """Returns the response of the routed destination, keeping its speculative branch."""
+        if decision["destination"] == "recommendation":
+            return speculation.take("recommendation")
+        elif decision["destination"] == "product_info":
+            return self.fetch_answer(query, speculation.take("product_info"))
+        speculation.cancel()
+        raise ValueError(f"Unexpected destination: {decision['destination']}")
+
+    def process(self, query: str, *args, top_n: int = 5, structured: bool = False):
+        """Processes the query end-to-end, scoring locally while the LLM routes it.
+
+        Returns the text response, or with ``structured`` the destination and its structured result.
+        """
+        with self.stage("total"):
+            bundle = model_bundle.current()
+            speculation = self.speculate(bundle, query, args, top_n, structured)
+            try:
+                decision = self.route(bundle, query, speculation.start)
+                result = self.handle(decision, query, speculation)
+            except BaseException:
+                # Failed routing (e.g. an LLM outage): do not leave the branches queued on the shared pool
+                speculation.cancel()
+                raise
+            return structured_response(decision, result) if structured else result
+
+    def stream(self, query: str, *args, top_n: int = 5) -> Iterator[str]:
+        """Processes the query end-to-end, yielding the (text) response as it is produced."""
+        with self.stage("stream_total"):
+            bundle = model_bundle.current()
+            speculation = self.speculate(bundle, query, args, top_n)
+            try:
+                decision = self.route(bundle, query, speculation.start)
+                if decision["destination"] == "recommendation":
+                    # Recommendations are scored locally: emit them as soon as scoring finishes
+                    yield speculation.take("recommendation")
+                elif decision["destination"] == "product_info":
+                    yield from self.stream_answer(query, speculation.take("product_info"))
+                else:
+                    raise ValueError(f"Unexpected destination: {decision['destination']}")
+            except BaseException:
+                # Also when the client goes away (GeneratorExit) before a branch was taken
+                speculation.cancel()
+                raise
+
+    # Async variants for the async server (asgi.py): LLM calls are awaited with a timeout
+    # and local work runs in a worker thread, so the event loop keeps serving other requests
+
+    async def afetch_answer(self, query: str, context: str = None) -> str:
+        """Like ``fetch_answer``, awaiting the LLM."""
+        if context is None:
+            context = await asyncio.to_thread(self.search_context, query)
+
+        cache_key = self.cache_key(query, context)
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        with self.stage("llm"), llm_call("answer"):
+            message = await with_timeout(get_chains().answer.ainvoke({"input": query, "context": context}))
+        record_llm_usage("answer", message)
+        answer = self.answer_text(message)
+        await response_cache.aset(cache_key, answer)
+        return answer
+
+    async def astream_answer(self, query: str, context: str = None) -> AsyncIterator[str]:
+        """Like ``stream_answer``, awaiting the LLM."""
+        if context is None:
+            context = await asyncio.to_thread(self.search_context, query)
+
+        cache_key = self.cache_key(query, context, streamed=True)
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        started = time.perf_counter()
+        with self.stage("llm_stream"), llm_call("answer"):
+            async for chunk in iter_with_timeout(get_chains().answer.astream({"input": query, "context": context})):
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, pipeline=self.name, stage="llm_first_token")
+                record_llm_usage("answer", chunk)
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                parts.append(text)
+                yield text
+        await response_cache.aset(cache_key, ''.join(parts))
+
+    async def allm_route(self, query: str) -> RouteQuery:
+        """Like ``llm_route``, awaiting the LLM."""
+        with self.stage("llm_route"), llm_call("route"):
+            result = await with_timeout(get_chains().route.ainvoke({"query": query}))
+            record_llm_usage("route", result["raw"])
+            if result["parsing_error"] is not None:
+                raise result["parsing_error"]
+        return result["parsed"]
+
+    async def aroute(self, bundle, query: str, on_llm_route=None) -> RouteDecision:
+        """Like ``route``, awaiting the LLM."""
+        with self.stage("route"):
+            return await aroute_with_fallback(query, self.allm_route, on_llm_route, bundle.catalog)
+
+    async def ahandle(self, decision: RouteDecision, query: str, speculation: Speculation):
+        """Like ``handle``, awaiting the branch and the LLM."""
+        if decision["destination"] == "recommendation":
+            return await speculation.atake("recommendation")
+        elif decision["destination"] == "product_info":
+            return await self.afetch_answer(query, await speculation.atake("product_info"))
+        speculation.cancel()
+        raise ValueError(f"Unexpected destination: {decision['destination']}")
+
+    async def aprocess(self, query: str, *args, top_n: int = 5, structured: bool = False):
+        """Like ``process``, without blocking the event loop."""
+        with self.stage("total"):
+            bundle = model_bundle.current()
+            speculation = self.speculate(bundle, query, args, top_n, structured)
+            try:
+                decision = await self.aroute(bundle, query, speculation.start)
+                result = await self.ahandle(decision, query, speculation)
+            except BaseException:
+                # Also when the request is cancelled or times out
+                speculation.cancel()
+                raise
+            return structured_response(decision, result) if structured else result
+
+    async def astream(self, query: str, *args, top_n: int = 5) -> AsyncIterator[str]:
+        """Like ``stream``, without blocking the event loop."""
+        with self.stage("stream_total"):
+            bundle = model_bundle.current()
+            speculation = self.speculate(bundle, query, args, top_n)
+            try:
+                decision = await self.aroute(bundle, query, speculation.start)
+                if decision["destination"] == "recommendation":
+                    yield await speculation.atake("recommendation")
+                elif decision["destination"] == "product_info":
+                    async for chunk in self.astream_answer(query, await speculation.atake("product_info")):
+                        yield chunk
+                else:
+                    raise ValueError(f"Unexpected destination: {decision['destination']}")
+            except BaseException:
+                speculation.cancel()
+                raise
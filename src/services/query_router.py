@@ -0,0 +1,109 @@
+import logging
+import re
+from typing import Awaitable, Callable, Literal
+
+from typing_extensions import TypedDict
+
+from src import config, model_bundle
+from src.metrics import ROUTE_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+
+# Routing decision with where it came from
+class RouteDecision(TypedDict):
+    """Destination chosen for a query, the deciding router and its confidence."""
+    destination: Literal["recommendation", "product_info"]
+    source: Literal["local", "llm"]
+    confidence: float
+
+
+# Phrases asking for details about something specific
+INFO_CUES = re.compile(
+    r"\b(what is|what's|what are|what does|tell me (more )?about|describe|explain|details?|information|info"
+    r"|how does|how do(es)? .+ work|features? of|overview|pricing|who (owns|built))\b",
+    re.IGNORECASE,
+)
+
+# Phrases asking for suggestions
+RECOMMENDATION_CUES = re.compile(
+    r"\b(recommend\w*|suggest\w*|which accelerators?|what accelerators?|best accelerators?|looking for"
+    r"|(i|we) (need|want)|help (me|us)|improve|automate|should (i|we)|options? for|alternatives?)\b",
+    re.IGNORECASE,
+)
+
+# Evidence weights and the prior that keeps weak evidence below the confidence threshold
+CUE_WEIGHT = 0.8
+NAME_WEIGHT = 0.5
+RELEVANCE_WEIGHT = 0.3
+RELEVANCE_MIN_SIMILARITY = 0.2
+EVIDENCE_PRIOR = 0.2
+
+# Function to route a query without calling the LLM
+def local_route(query: str, catalog=None) -> RouteDecision:
+    """Scores recommendation vs product-info evidence in the query and returns the local decision.
+
+    ``catalog`` defaults to the catalog of the bundle being served.
+    """
+    catalog = catalog or model_bundle.current().catalog
+    info_score = CUE_WEIGHT if INFO_CUES.search(query) else 0.0
+    recommendation_score = CUE_WEIGHT if RECOMMENDATION_CUES.search(query) else 0.0
+
+    if catalog.accelerator_matcher.find(query) or catalog.product_matcher.find(query):
+        # Naming an accelerator or product points at a question about it
+        info_score += NAME_WEIGHT
+    else:
+        # A need described in catalog vocabulary points at a recommendation
+        similarity = (catalog.tfidf.transform([query]) @ catalog.tfidf_matrix.T).max()
+        if similarity >= RELEVANCE_MIN_SIMILARITY:
+            recommendation_score += RELEVANCE_WEIGHT
+
+    destination = "product_info" if info_score > recommendation_score else "recommendation"
+    margin = abs(info_score - recommendation_score)
+    confidence = margin / (info_score + recommendation_score + EVIDENCE_PRIOR)
+    return {"destination": destination, "source": "local", "confidence": round(confidence, 3)}
+
+
+# Function to route locally when confident and fall back to the LLM otherwise
+def route_with_fallback(query: str, llm_route: Callable[[str], dict],
+                        on_llm_route: Callable[[], None] = None, catalog=None) -> RouteDecision:
+    """Returns the local decision if its confidence reaches ROUTER_CONFIDENCE_THRESHOLD, else the LLM's.
+
+    ``on_llm_route`` is called just before the LLM is asked, e.g. to start work that can overlap it.
+    """
+    decision = local_route(query, catalog)
+    if decision["confidence"] < config.ROUTER_CONFIDENCE_THRESHOLD:
+        if on_llm_route is not None:
+            on_llm_route()
+        result = llm_route(query)
+        decision = {"destination": result["destination"], "source": "llm", "confidence": decision["confidence"]}
+    return record_decision(decision)
+
+
+# Async variant for the async server: the LLM fallback is awaited instead of blocking
+async def aroute_with_fallback(query: str, llm_route: Callable[[str], Awaitable[dict]],
+                              on_llm_route: Callable[[], None] = None, catalog=None) -> RouteDecision:
+    """Returns the local decision if its confidence reaches ROUTER_CONFIDENCE_THRESHOLD, else the LLM's."""
+    decision = local_route(query, catalog)
+    if decision["confidence"] < config.ROUTER_CONFIDENCE_THRESHOLD:
+        if on_llm_route is not None:
+            on_llm_route()
+        result = await llm_route(query)
+        decision = {"destination": result["destination"], "source": "llm", "confidence": decision["confidence"]}
+    return record_decision(decision)
+
+
+# Function to shape the result of a routed query for JSON responses
+def structured_response(decision: RouteDecision, result) -> dict:
+    """Returns the destination with its structured recommendations or its product-info answer."""
+    key = "recommendations" if decision["destination"] == "recommendation" else "answer"
+    return {"destination": decision["destination"], key: result}
+
+
+# Function to count and log a routing decision
+def record_decision(decision: RouteDecision) -> RouteDecision:
+    """Records ``decision`` in the route metrics and the log, and returns it."""
+    ROUTE_DECISIONS.inc(destination=decision["destination"], source=decision["source"])
+    logger.info("Routed query to %s via %s router (local confidence %.2f)",
+                decision["destination"], decision["source"], decision["confidence"])
+    return decision
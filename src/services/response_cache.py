@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src import config
+from src.metrics import registry
+
+
+# Function to normalize a query so trivially different phrasings share a cache entry
+def normalize_query(query: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM answers with an optional SQLite tier that survives restarts.
+
+    Keys cover the normalized query, the retrieved context and the model/prompt version,
+    so a changed catalog entry or prompt never serves a stale answer.
+    """
+
+    def __init__(self, max_entries=1024, ttl=86400, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+        # SQLite tier, connected on first use in each process (see _connection)
+        self.path = path or None
+        self._db = None
+        self._db_pid = None
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def _connection(self):
+        """Returns the SQLite connection of this process, opening it on first use. Callers hold self._lock.
+
+        A connection must not be used across fork(): the gunicorn master imports this module when it
+        preloads the app, so every worker opens its own connection instead of inheriting one.
+        """
+        if self._db is None or self._db_pid != os.getpid():
+            # A connection inherited from the parent is dropped without closing it: it belongs to the parent
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db_pid = os.getpid()
+        return self._db
+
+    @classmethod
+    def from_config(cls):
+        """Creates the cache configured by the ARE_LLM_CACHE_* settings."""
+        return cls(config.LLM_CACHE_SIZE, config.LLM_CACHE_TTL, config.LLM_CACHE_PATH or None)
+
+    @staticmethod
+    def make_key(query: str, context: str, model: str, prompt_version: str) -> str:
+        """Returns the cache key of an answer."""
+        digest = hashlib.sha256()
+        for part in (normalize_query(query), context, model, prompt_version):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached answer for ``key`` or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self.path is not None:
+                row = self._connection().execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    async def aget(self, key: str):
+        """Like ``get``, reading the SQLite tier in a worker thread so the event loop is not blocked."""
+        if self.path is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Like ``set``, writing the SQLite tier in a worker thread so the event loop is not blocked."""
+        if self.path is None:
+            return self.set(key, value)
+        await asyncio.to_thread(self.set, key, value)
+
+    def set(self, key: str, value: str) -> None:
+        """Stores an answer in memory and, when configured, on disk."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self.path is not None:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at)
+                )
+                # Drop expired rows now and then so the file does not grow without bound
+                if (self.hits + self.misses) % 256 == 0:
+                    db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the in-memory size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def _remember(self, key, value, expires_at):
+        # Callers hold self._lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Cache shared by the product-info paths of all query processors
+response_cache = ResponseCache.from_config()
+
+
+# Function to expose the cache statistics as metrics
+def cache_metrics():
+    """Returns the response cache statistics as metric samples, read at scrape time."""
+    stats = response_cache.stats()
+    return [
+        ("are_llm_cache_hits_total", "counter", "LLM answer cache hits.", {"tier": "memory"}, stats["hits"] - stats["disk_hits"]),
+        ("are_llm_cache_hits_total", "counter", "LLM answer cache hits.", {"tier": "disk"}, stats["disk_hits"]),
+        ("are_llm_cache_misses_total", "counter", "LLM answer cache misses.", {}, stats["misses"]),
+        ("are_llm_cache_evictions_total", "counter", "LLM answers evicted from memory.", {}, stats["evictions"]),
+        ("are_llm_cache_entries", "gauge", "LLM answers held in memory.", {}, stats["entries"]),
+    ]
+
+
+registry.add_collector(cache_metrics)
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from src import config
+
+# Threads running speculative branches, shared by the query processors of a worker process
+# (created on first use, so preloaded gunicorn masters fork without them)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the shared speculation pool, creating it on first use
+def get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.SPECULATION_THREADS, thread_name_prefix='speculative')
+    return _pool
+
+
+class Speculation:
+    """Local branches of a query started while routing waits for the LLM.
+
+    ``start`` submits every branch to the shared pool; ``take`` returns the result of the branch
+    routing selected and cancels the others. A branch that is already running cannot be
+    interrupted: it finishes in the background and its result is dropped. A branch that was
+    never started (the local router decided, or speculation is disabled) runs inline.
+    """
+
+    def __init__(self, branches: Dict[str, Callable[[], Any]]):
+        self.branches = branches
+        self.futures = {}
+
+    def start(self) -> None:
+        """Starts every branch on the shared pool."""
+        if config.SPECULATIVE_ROUTING and not self.futures:
+            pool = get_pool()
+            self.futures = {name: pool.submit(branch) for name, branch in self.branches.items()}
+
+    def _select(self, name):
+        for other, future in self.futures.items():
+            if other != name:
+                future.cancel()
+        return self.futures.get(name)
+
+    def take(self, name: str):
+        """Returns the result of branch ``name``, waiting for it if it was started, running it otherwise."""
+        future = self._select(name)
+        return future.result() if future is not None else self.branches[name]()
+
+    def cancel(self) -> None:
+        """Cancels every branch that has not started."""
+        self._select(None)
+
+    async def atake(self, name: str):
+        """Like ``take``, awaiting the branch (or running it in a thread) instead of blocking."""
+        future = self._select(name)
+        if future is not None:
+            return await asyncio.wrap_future(future)
+        return await asyncio.to_thread(self.branches[name])
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Point the service at a scratch data directory before any src module reads its configuration
+DATA_DIR = tempfile.mkdtemp(prefix='are-tests-')
+os.environ['ARE_DATA_DIR'] = DATA_DIR
+os.environ.pop('ARE_SNAPSHOT_DIR', None)
+os.environ['ARE_RELOAD_INTERVAL'] = '0'
+
+
+# Synthetic workbooks (benchmarks/synthetic_data.py at scale 1), written once per test session
+@pytest.fixture(scope='session')
+def data_dir():
+    from benchmarks.synthetic_data import write_dataset
+    write_dataset(DATA_DIR, scale=1, seed=0)
+    return DATA_DIR
+
+
+# Test client of the Flask app (importing it builds the models of the synthetic workbooks)
+@pytest.fixture
+def client(data_dir):
+    from app import app
+    return app.test_client()
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pytest
+
+from src.services.async_limits import ConcurrencyLimiter
+
+
+@pytest.fixture
+def asgi(data_dir):
+    import asgi
+    return asgi
+
+
+# Function to send one POST request to an ASGI app; returns (status, headers, JSON body)
+async def post(app, path, body):
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode('utf-8'), 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': [], 'query_string': b''}
+    await app(scope, receive, send)
+    headers = dict(sent[0]['headers'])
+    return sent[0]['status'], headers, json.loads(b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def test_saturated_worker_answers_503(asgi, monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1)
+    monkeypatch.setattr(asgi, 'request_limiter', limiter)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_answer(query):
+            await release.wait()
+            return f'answer to {query}'
+
+        monkeypatch.setattr(asgi, 'aprocess_query', slow_answer)
+        # One request holds the only slot and one waits for it, so the queue is full
+        first = asyncio.ensure_future(post(asgi.app, '/query', {'query': 'first'}))
+        second = asyncio.ensure_future(post(asgi.app, '/query', {'query': 'second'}))
+        while limiter.waiting < 1:
+            await asyncio.sleep(0)
+        assert (limiter.active, limiter.waiting) == (1, 1)
+
+        rejected = await post(asgi.app, '/query', {'query': 'third'})
+        release.set()
+        return rejected, await first, await second
+
+    (status, headers, body), first, second = asyncio.run(scenario())
+    assert status == 503
+    assert headers[b'retry-after'] == b'1'
+    assert body == {'error': 'Server is busy, retry later'}
+    # The requests that were admitted are still answered
+    assert first[0] == second[0] == 200
+    assert (first[2], second[2]) == ({'response': 'answer to first'}, {'response': 'answer to second'})
+    assert (limiter.active, limiter.waiting) == (0, 0)
@@ -0,0 +1,40 @@
+import pytest
+
+from src import config
+
+QUERIES = ['ticket routing', 'payroll automation', 'security incident response', 'no such words here']
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'queries': 'ticket routing'}, 'queries must be a non-empty list of strings'),
+    ({'queries': []}, 'queries must be a non-empty list of strings'),
+    ({'queries': ['ok', 3]}, 'queries must be a non-empty list of strings'),
+    ({'queries': ['ok'], 'top_n': 0}, 'top_n must be a positive integer'),
+    ({'queries': ['ok'], 'top_n': True}, 'top_n must be a positive integer'),
+    ({'queries': ['ok'], 'top_n': '3'}, 'top_n must be a positive integer'),
+])
+def test_invalid_batches_are_rejected(client, body, error):
+    response = client.post('/api/recommend/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_batch_size_is_limited(client, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_MAX_QUERIES', 2)
+    response = client.post('/api/recommend/batch', json={'queries': QUERIES})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('top_n', [1, 3, 10])
+def test_batch_matches_single_queries(client, top_n):
+    from src.content_based_filtering import rank_new_customer
+
+    response = client.post('/api/recommend/batch', json={'queries': QUERIES, 'top_n': top_n})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == len(QUERIES)
+    for query, result in zip(QUERIES, results):
+        expected = rank_new_customer(query, top_n)
+        assert [rec['accelerator'] for rec in result] == [rec['accelerator'] for rec in expected], query
+        assert [rec['score'] for rec in result] == pytest.approx([rec['score'] for rec in expected])
+    assert results[-1] == []
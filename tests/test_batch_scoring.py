@@ -0,0 +1,72 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src import config
+
+TOP_N = 3
+
+
+@pytest.fixture
+def companies(data_dir):
+    from src.companies import company_directory
+    return company_directory.get().names
+
+
+# Function to group output rows by company and source, in rank order
+def by_company(rows) -> dict:
+    grouped = {}
+    for row in sorted(rows, key=lambda row: int(row['rank'])):
+        grouped.setdefault((row['company'], row['source']), []).append(row)
+    return grouped
+
+
+# Function to check output rows against the recommendations the service returns
+def assert_matches_service(rows, companies, query=None):
+    from src import model_bundle
+    from src.batch_scoring import company_profiles
+    from src.hybrid_recommendation import collaborative_filtering_recommendations, rank_hybrid
+
+    catalog = model_bundle.current().catalog
+    profiles = company_profiles(catalog.products_df, catalog.entitlements_df)
+    grouped = by_company(rows)
+    assert {company for company, _ in grouped} == set(companies)
+    for company in companies:
+        collaborative = grouped.get((company, 'collaborative'), [])
+        assert [row['product'] for row in collaborative] == collaborative_filtering_recommendations(company, TOP_N)
+
+        expected = rank_hybrid(company, profiles.get(company, '') if query is None else query, top_n=TOP_N)
+        hybrid = grouped.get((company, 'hybrid'), [])
+        assert [row['product'] for row in hybrid] == [rec['product'] for rec in expected], company
+        assert [float(row['score']) for row in hybrid] == pytest.approx([rec['score'] for rec in expected])
+
+
+def test_inline_csv_matches_recommend_products(companies, tmp_path):
+    from src.batch_scoring import run
+
+    output = str(tmp_path / 'scores.csv')
+    count = run(output, 'csv', TOP_N, 1, 7, config.HYBRID_COLLABORATIVE_WEIGHT, config.HYBRID_CONTENT_WEIGHT)
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == count
+    assert_matches_service(rows, companies)
+    assert os.listdir(tmp_path) == ['scores.csv']
+
+
+def test_cli_with_workers_matches_recommend_products(companies, tmp_path):
+    output = str(tmp_path / 'scores.jsonl')
+    query = 'ticket routing automation'
+    result = subprocess.run(
+        [sys.executable, '-m', 'src.batch_scoring', output, '--top-n', str(TOP_N), '--workers', '2',
+         '--shard-size', '5', '--query', query],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert result.stdout.startswith(f'Wrote {len(rows)} recommendations to {output}')
+    assert_matches_service(rows, companies, query)
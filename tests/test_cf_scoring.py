@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+from surprise import Dataset, KNNBasic, Reader
+
+from src import cf_scoring
+
+
+# Function to build a random entitlement table (ratings are positive so Surprise's cosine is always defined)
+def random_entitlements(seed=0, companies=30, products=12, density=0.4):
+    rng = np.random.default_rng(seed)
+    rows = [
+        {'Company': f'Company {c}', 'Product': f'Product {p}', 'Implemented': round(rng.uniform(0.1, 1.0), 3)}
+        for c in range(companies) for p in range(products) if rng.random() < density
+    ]
+    return pd.DataFrame(rows)
+
+
+# Function to fit Surprise's user-based KNNBasic the way HybridModel does
+def fit_surprise(entitlements, k=5):
+    data = Dataset.load_from_df(entitlements[['Company', 'Product', 'Implemented']], Reader(rating_scale=(0, 1)))
+    algo = KNNBasic(k=k, sim_options={'name': 'cosine', 'user_based': True}, verbose=False)
+    algo.fit(data.build_full_trainset())
+    return algo
+
+
+# Function to apply deltas to an entitlement table the way a full reload would see them
+def apply_to_table(entitlements, deltas):
+    table = entitlements.set_index(['Company', 'Product'])['Implemented'].to_dict()
+    for delta in deltas:
+        if delta.get('removed'):
+            table.pop((delta['company'], delta['product']), None)
+        else:
+            table[(delta['company'], delta['product'])] = delta['rating']
+    return pd.DataFrame([{'Company': c, 'Product': p, 'Implemented': r} for (c, p), r in table.items()])
+
+
+# Function to index a state's predictions by company and product name
+def named_predictions(state):
+    return {
+        company: dict(zip(state.product_ids, cf_scoring.predict_company_ratings(state, company)))
+        for company in state.company_index
+    }
+
+
+def test_entitlement_deltas_match_a_refit():
+    entitlements = random_entitlements()
+    held = entitlements.iloc[0]
+    deltas = [
+        {'company': 'Company 3', 'product': 'Product 5', 'rating': 0.9},
+        {'company': held['Company'], 'product': held['Product'], 'removed': True},
+        {'company': 'Company 7', 'product': 'Product 1', 'rating': 0.2},
+        {'company': 'Company 7', 'product': 'Product 1', 'rating': 0.6},
+        {'company': 'NewCo', 'product': 'Product 2', 'rating': 0.8},
+        {'company': 'NewCo', 'product': 'New Product', 'rating': 0.7},
+        {'company': 'Company 4', 'product': 'New Product', 'rating': 0.5},
+    ]
+    state = cf_scoring.build_cf_state(fit_surprise(entitlements))
+    # Applied in two batches: the second one patches over the first one's patches
+    updated = cf_scoring.apply_entitlement_deltas(state, deltas[:3])
+    updated = cf_scoring.apply_entitlement_deltas(updated, deltas[3:])
+    refit = cf_scoring.build_cf_state(fit_surprise(apply_to_table(entitlements, deltas)))
+
+    assert updated.global_mean == pytest.approx(refit.global_mean)
+    order = [updated.company_index[company] for company in refit.company_index]
+    np.testing.assert_allclose(updated.sim.toarray()[np.ix_(order, order)], refit.sim.toarray())
+    expected = named_predictions(refit)
+    for company, scores in named_predictions(updated).items():
+        for product, score in scores.items():
+            assert score == pytest.approx(expected[company][product], abs=1e-9), (company, product)
+
+    # The state the deltas were applied to is left untouched
+    np.testing.assert_array_equal(state.sim.toarray(), fit_surprise(entitlements).sim)
+    assert 'NewCo' not in state.company_index
+
+
+@pytest.mark.parametrize('k', [5, 40])
+def test_predictions_match_knnbasic(k):
+    # k=5 makes most products crowded (more raters than neighbours); k=40 uses every rater
+    algo = fit_surprise(random_entitlements(seed=1), k=k)
+    state = cf_scoring.build_cf_state(algo)
+    for company in list(state.company_index) + ['Unknown Co']:
+        scores = cf_scoring.predict_company_ratings(state, company)
+        expected = [algo.predict(company, product).est for product in state.product_ids]
+        np.testing.assert_allclose(scores, expected, atol=1e-9, err_msg=company)
+
+
+# Function to build a Surprise trainset from (company, product, rating) rows
+def trainset_of(rows):
+    frame = pd.DataFrame(rows, columns=['Company', 'Product', 'Implemented'])
+    return Dataset.load_from_df(frame, Reader(rating_scale=(0, 1))).build_full_trainset()
+
+
+# Function to fit Surprise's own user-based cosine similarities
+def surprise_similarity(trainset, min_support=1):
+    sim_options = {'name': 'cosine', 'user_based': True, 'min_support': min_support}
+    return KNNBasic(sim_options=sim_options, verbose=False).fit(trainset).sim
+
+
+@pytest.mark.parametrize('min_support', [1, 3])
+def test_similarity_matches_knnbasic_fit(min_support):
+    rng = np.random.default_rng(1)
+    # Positive ratings: Surprise's cosine is defined for every pair
+    rows = [
+        (f'Company {c}', f'Product {p}', round(rng.uniform(0.1, 1.0), 3))
+        for c in range(40) for p in range(15) if rng.random() < 0.3
+    ]
+    trainset = trainset_of(rows)
+    np.testing.assert_allclose(cf_scoring.compute_similarity(trainset, min_support), surprise_similarity(trainset, min_support))
+
+
+def test_pairs_surprise_cannot_score_get_zero():
+    # a and b only share product x, which both rated 0
+    trainset = trainset_of([('a', 'x', 0.0), ('b', 'x', 0.0), ('a', 'y', 1.0), ('c', 'y', 0.5), ('c', 'z', 1.0)])
+    with pytest.raises(ZeroDivisionError):
+        surprise_similarity(trainset)
+
+    sim = cf_scoring.compute_similarity(trainset)
+    a, b, c = (trainset.to_inner_uid(company) for company in 'abc')
+    assert sim[a, b] == sim[b, a] == 0.0
+    assert sim[a, c] == sim[c, a] == pytest.approx(1.0)
+    np.testing.assert_array_equal(np.diag(sim), 1.0)
@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.coalescer import MicroBatcher
+
+QUERIES = ['ticket routing', 'payroll automation', 'security incident response', 'Product 3 telemetry', 'zzz'] * 4
+
+
+# Function to submit items from concurrent threads, released together so they share batches
+def submit_concurrently(batcher, items):
+    start = threading.Barrier(len(items))
+
+    def submit(item):
+        start.wait()
+        return batcher.submit(item)
+
+    with ThreadPoolExecutor(len(items)) as pool:
+        return list(pool.map(submit, items))
+
+
+def test_every_caller_gets_its_own_result():
+    batches = []
+
+    def process(items):
+        batches.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait=0.05)
+    assert submit_concurrently(batcher, list(range(20))) == [item * 2 for item in range(20)]
+    assert sum(batches) == 20 and max(batches) > 1 and max(batches) <= 4
+
+
+def test_a_failed_batch_raises_in_every_caller():
+    def process(items):
+        raise ValueError('scoring failed')
+
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait=0.01)
+    with pytest.raises(ValueError, match='scoring failed'):
+        submit_concurrently(batcher, list(range(4)))
+
+
+def test_coalesced_content_queries_match_single_queries(data_dir):
+    from src import model_bundle
+    model = model_bundle.current().content
+    top_ns = [1 + i % 7 for i in range(len(QUERIES))]
+
+    # Single (uncoalesced) queries, then the same queries scored in shared batches
+    expected = [model.top_accelerators(query, top_n) for query, top_n in zip(QUERIES, top_ns)]
+    batcher = MicroBatcher(model.top_accelerators_batch, max_batch_size=8, max_wait=0.05)
+    for (indices, scores), (expected_indices, expected_scores) in zip(
+            submit_concurrently(batcher, list(zip(QUERIES, top_ns))), expected):
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(scores, expected_scores)
+
+    # Full score rows, as the hybrid ranker reads them
+    batcher = MicroBatcher(model.score_queries, max_batch_size=8, max_wait=0.05)
+    for scores, query in zip(submit_concurrently(batcher, QUERIES), QUERIES):
+        np.testing.assert_allclose(scores, model.score_query(query))
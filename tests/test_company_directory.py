@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.mark.parametrize('prefix', ['company 1', '"a', 'Zoë "quoted"'])
+def test_revalidation_returns_304(client, prefix):
+    response = client.get('/company', query_string={'prefix': prefix, 'limit': 5})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/company', query_string={'prefix': prefix, 'limit': 5}, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+    # Another page of the same search is another representation
+    other = client.get('/company', query_string={'prefix': prefix, 'limit': 5, 'offset': 5},
+                       headers={'If-None-Match': etag})
+    assert other.status_code == 200 and other.headers['ETag'] != etag
+
+
+def test_prefix_search(client):
+    body = client.get('/company', query_string={'prefix': 'COMPANY 1', 'limit': 3}).get_json()
+    assert body['companies'] and all(name.casefold().startswith('company 1') for name in body['companies'])
+    assert len(body['companies']) <= 3 and body['total'] >= len(body['companies'])
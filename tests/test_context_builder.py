@@ -0,0 +1,38 @@
+import pytest
+
+from src.services.context_builder import NO_DATA, estimate_tokens, trim_text
+
+QUERIES = ['accelerator', 'Accelerator 3', 'Tell me about Accelerator 3 and Accelerator 4']
+
+
+@pytest.fixture
+def builder(data_dir):
+    from src import model_bundle
+    return model_bundle.current().context_builder
+
+
+@pytest.mark.parametrize('budget', [1, 5, 20, 50, 100, 150, 300, 1000, 10000])
+@pytest.mark.parametrize('query', QUERIES)
+def test_context_stays_within_budget(builder, query, budget):
+    assert estimate_tokens(builder.build(query, budget)) <= budget
+
+
+def test_context_keeps_the_best_matches_and_counts_the_rest(builder):
+    ranked = builder.rank('accelerator')
+    context = builder.build('accelerator', 300)
+    shown = [builder.snippets[row] for row in ranked if builder.snippets[row] in context]
+    assert shown == [builder.snippets[row] for row in ranked[:len(shown)]]
+    assert context.endswith(f'({len(ranked) - len(shown)} more matching accelerators not shown)')
+
+
+def test_context_lists_every_match_when_they_fit(builder):
+    context = builder.build('Tell me about Accelerator 3 and Accelerator 4', 10000)
+    assert context.startswith('Accelerator: Accelerator 3\n')
+    assert 'Accelerator: Accelerator 4\n' in context
+    assert 'not shown' not in context
+    assert builder.build('quantum teleportation', 10000) == NO_DATA
+
+
+def test_trim_text_cuts_at_a_word_boundary():
+    assert trim_text('one  two\nthree', 20) == 'one two three'
+    assert trim_text('one two three', 9) == 'one two...'
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import item_cf
+
+
+# Function to build a random entitlement table (0/1 implemented flags, or graded ratings)
+def random_entitlements(seed=0, companies=40, products=15, density=0.3, graded=False):
+    rng = np.random.default_rng(seed)
+    rows = [
+        {'Company': f'Company {c}', 'Product': f'Product {p}',
+         'Implemented': round(rng.uniform(0.0, 1.0), 3) if graded else float(rng.random() < 0.5)}
+        for c in range(companies) for p in range(products) if rng.random() < density
+    ]
+    return pd.DataFrame(rows)
+
+
+# Function to apply deltas to an entitlement table the way a rebuild would see them
+def apply_to_table(entitlements, deltas):
+    table = entitlements.set_index(['Company', 'Product'])['Implemented'].to_dict()
+    for delta in deltas:
+        if delta.get('removed'):
+            table.pop((delta['company'], delta['product']), None)
+        else:
+            table[(delta['company'], delta['product'])] = delta['rating']
+    return pd.DataFrame([{'Company': c, 'Product': p, 'Implemented': r} for (c, p), r in table.items()])
+
+
+# Function to index a state's scores by product name
+def named_scores(state, company):
+    return dict(zip(state.product_ids, item_cf.predict_company_ratings(state, company)))
+
+
+# k=100 keeps every neighbour; k=3 prunes, with graded ratings so no two neighbours tie
+@pytest.mark.parametrize('k, graded', [(100, False), (3, True)])
+def test_entitlement_deltas_match_a_rebuild(k, graded):
+    entitlements = random_entitlements(graded=graded)
+    held = entitlements.iloc[0]
+    deltas = [
+        {'company': 'Company 3', 'product': 'Product 5', 'rating': 1.0},
+        {'company': held['Company'], 'product': held['Product'], 'removed': True},
+        {'company': 'Company 7', 'product': 'Product 1', 'rating': 0.0},
+        {'company': 'Company 7', 'product': 'Product 1', 'rating': 0.4},
+        {'company': 'NewCo', 'product': 'Product 2', 'rating': 1.0},
+        {'company': 'NewCo', 'product': 'New Product', 'rating': 0.7},
+        {'company': 'Company 4', 'product': 'New Product', 'rating': 0.0},
+    ]
+    state = item_cf.build_item_cf_state(entitlements, k)
+    # Applied in two batches, the way journal entries arrive
+    updated = item_cf.apply_entitlement_deltas(state, deltas[:3])
+    updated = item_cf.apply_entitlement_deltas(updated, deltas[3:])
+    rebuilt = item_cf.build_item_cf_state(apply_to_table(entitlements, deltas), k)
+
+    order = [list(updated.product_ids).index(product) for product in rebuilt.product_ids]
+    np.testing.assert_allclose(updated.item_sim.toarray()[np.ix_(order, order)], rebuilt.item_sim.toarray())
+    for company in list(rebuilt.company_index) + ['Unknown Co']:
+        scores, expected = named_scores(updated, company), named_scores(rebuilt, company)
+        assert scores.keys() == expected.keys()
+        for product, score in scores.items():
+            assert score == pytest.approx(expected[product], abs=1e-9), (company, product)
+
+    # The state the deltas were applied to is left untouched
+    assert 'NewCo' not in state.company_index
+    original = item_cf.build_item_cf_state(entitlements, k)
+    np.testing.assert_array_equal(state.item_sim.toarray(), original.item_sim.toarray())
@@ -0,0 +1,60 @@
+import re
+
+import pandas as pd
+import pytest
+
+from src.matcher import NameMatcher
+
+# Names that contain other names, as accelerator and product names often do
+NAMES = ['Data Lake', 'Data Lake Pro', 'Big Data Lake', 'Lake', 'Product 1', 'Product 10', 'C++ Toolkit (beta)']
+
+
+@pytest.fixture
+def matcher():
+    return NameMatcher((name, row) for row, name in enumerate(NAMES))
+
+
+# Function to run the lookup the matcher replaced: a case-insensitive str.contains over the names
+def contains_lookup(text):
+    return list(pd.Series(NAMES)[pd.Series(NAMES).str.contains(text, case=False)].index)
+
+
+@pytest.mark.parametrize('text', ['data', 'DATA LAKE PRO', 'big data', 'lake pro', 'toolkit'])
+def test_fragments_find_what_contains_found(matcher, text):
+    assert matcher.match_payloads(text) == contains_lookup(text)
+
+
+@pytest.mark.parametrize('row, name', list(enumerate(NAMES)))
+def test_a_full_name_finds_that_name_only(matcher, row, name):
+    # str.contains also found every longer name containing it, and callers took the first row
+    assert row in contains_lookup(re.escape(name))
+    assert matcher.match_payloads(name) == [row]
+
+
+def test_text_naming_nothing_falls_back_to_its_mentions(matcher):
+    assert contains_lookup('Tell me about Data Lake Pro') == []
+    assert matcher.match_payloads('Tell me about Data Lake Pro') == [1]
+
+
+def test_names_only_match_whole_tokens(matcher):
+    assert contains_lookup('Product 1') == [4, 5]
+    assert matcher.match_payloads('Product 1') == [4]
+    assert matcher.match_payloads('product') == [4, 5]
+    assert contains_lookup('rod') == [4, 5]
+    assert matcher.match_payloads('rod') == []
+
+
+def test_queries_are_not_regular_expressions(matcher):
+    with pytest.raises(re.error):
+        contains_lookup('Toolkit (beta')
+    assert matcher.match_payloads('Toolkit (beta') == [6]
+    assert matcher.match_payloads('c++ toolkit (BETA)') == [6]
+
+
+def test_mentions_prefer_the_longest_name(matcher):
+    query = 'Is Big Data Lake better than Data Lake Pro for Product 10?'
+    # The old per-name scan of the query found every name inside a longer one too
+    assert [name for name in NAMES if name.lower() in query.lower()] == NAMES[:6]
+    assert [match.name for match in matcher.mentions(query)] == ['Big Data Lake', 'Data Lake Pro', 'Product 10']
+    # Every mention is still found, but not Product 1 inside Product 10
+    assert {match.name for match in matcher.find(query)} == set(NAMES[:4] + ['Product 10'])
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from src.metrics import Registry
+
+
+# Function to read the values of the sample lines starting with ``line_start``
+def sample(text, line_start):
+    return [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(line_start)]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_scrape_adds_up_every_process(tmp_path):
+    registry = Registry(str(tmp_path))
+    requests = registry.counter('requests_total', 'Requests.', ['endpoint'])
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    registry.add_collector(lambda: [('active', 'gauge', 'Active requests.', {}, 1)])
+    requests.inc(2, endpoint='/a')
+    latency.observe(0.05)
+
+    pid = os.fork()
+    if pid == 0:
+        # Another worker: its own values (not the ones inherited from the parent), written to its own file
+        try:
+            requests.inc(3, endpoint='/a')
+            latency.observe(0.5)
+            registry.flush()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    text = registry.render()
+    assert sample(text, 'requests_total{endpoint="/a"}') == [5.0]
+    assert sample(text, 'latency_seconds_bucket{le="0.1"}') == [1.0]
+    assert sample(text, 'latency_seconds_bucket{le="1.0"}') == [2.0]
+    assert sample(text, 'latency_seconds_count') == [2.0]
+    assert sorted(sample(text, 'active{pid=')) == [1.0, 1.0]
+
+    # An exited worker's counters stay in the totals; its gauges go
+    registry.archive_process(pid)
+    text = registry.render()
+    assert sample(text, 'requests_total{endpoint="/a"}') == [5.0]
+    assert sample(text, f'active{{pid="{os.getpid()}"}}') == [1.0]
+    assert sample(text, 'active{') == [1.0]
+
+
+def test_without_directory_only_this_process_is_reported():
+    registry = Registry()
+    registry.counter('requests_total', 'Requests.').inc()
+    assert '# TYPE requests_total counter\nrequests_total 1.0\n' in registry.render()
@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+from src import config
+
+
+# Function to add an accelerator to the workbook, so the next reload builds a new snapshot version
+def add_accelerator(name):
+    path = config.data_path('accelerators.xlsx')
+    accelerators = pd.read_excel(path)
+    row = {'Name': name, 'Product': 'Product 0', 'Short description': f'{name} telemetry', 'Type': 'Playbook'}
+    pd.concat([accelerators, pd.DataFrame([row])]).to_excel(path, index=False)
+
+
+def test_reload_replays_published_entitlements(data_dir):
+    from src import hybrid_recommendation, model_bundle
+
+    served = model_bundle.current()
+    hybrid_recommendation.apply_entitlement_updates([{'company': 'NewCo', 'product': 'Product 2', 'rating': 1.0}])
+
+    add_accelerator('Reload Check One')
+    assert model_bundle.reload()
+    reloaded = model_bundle.current()
+    assert reloaded.version != served.version
+    assert 'NewCo' in reloaded.hybrid.cf_state.company_index
+    assert 'Product 2' not in hybrid_recommendation.collaborative_filtering_recommendations('NewCo', top_n=50)
+
+
+def test_older_bundle_can_still_publish_after_pruning(data_dir):
+    from src import model_bundle
+
+    held = model_bundle.current()
+    # Two more versions: the held version's directory is pruned
+    for name in ('Reload Check Two', 'Reload Check Three'):
+        add_accelerator(name)
+        assert model_bundle.reload()
+
+    held.hybrid.apply_entitlement_updates([{'company': 'OtherCo', 'product': 'Product 1', 'rating': 0.0}])
+    assert 'OtherCo' in model_bundle.current().hybrid.sync_entitlement_updates(wait=True).company_index
+
+
+def test_query_uses_one_bundle_per_request(data_dir, monkeypatch):
+    from src import model_bundle
+    from src.services.llm_query_processor_existing import process_query_existing
+
+    bundle = model_bundle.current()
+    calls = []
+
+    def current():
+        calls.append(bundle)
+        return bundle
+
+    # Routing, recommending and the context must all use the bundle taken when the request started
+    monkeypatch.setattr(model_bundle, 'current', current)
+    result = process_query_existing('Company 1', 'recommend incident automation workflow', structured=True)
+    assert result['destination'] == 'recommendation'
+    assert len(calls) == 1
+
+
+# Function to set one entitlement in the workbook, so the next reload builds a new snapshot version
+def set_entitlement(company, product, implemented):
+    path = config.data_path('entitlements.xlsx')
+    entitlements = pd.read_excel(path)
+    entitlements = entitlements[(entitlements['Company'] != company) | (entitlements['Product'] != product)]
+    row = {'Company': company, 'Product': product, 'Implemented': implemented}
+    pd.concat([entitlements, pd.DataFrame([row])]).to_excel(path, index=False)
+
+
+# Function to read a company's rating of a product from a CF state (None when not held)
+def rating_of(state, company, product):
+    row = state.company_index[company]
+    col = list(state.product_ids).index(product)
+    return state.ratings[row, col] if state.rated[row, col] else None
+
+
+def test_workbook_edit_after_api_delta_wins(data_dir):
+    from src import hybrid_recommendation, model_bundle
+
+    hybrid_recommendation.apply_entitlement_updates([{'company': 'EditCo', 'product': 'Product 3', 'rating': 1.0}])
+    journal = f'entitlement_deltas-{model_bundle.current().catalog.entitlements_version}.jsonl'
+    assert journal in os.listdir(config.SNAPSHOT_DIR)
+    assert rating_of(model_bundle.current().hybrid.cf_state, 'EditCo', 'Product 3') == 1.0
+
+    set_entitlement('EditCo', 'Product 3', 0)
+    assert model_bundle.reload()
+    assert rating_of(model_bundle.current().hybrid.sync_entitlement_updates(), 'EditCo', 'Product 3') == 0.0
+
+    # The journal of the replaced workbook is gone once no kept version was built from it
+    add_accelerator('Reload Check Four')
+    assert model_bundle.reload()
+    assert journal not in os.listdir(config.SNAPSHOT_DIR)
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import config, model_bundle
+from src.services import speculation as speculation_module
+from src.services.query_pipeline import QueryPipeline
+
+
+class LLMDown(Exception):
+    pass
+
+
+@pytest.fixture
+def blocked_pool(monkeypatch):
+    """A one-thread speculation pool kept busy, so submitted branches stay queued."""
+    monkeypatch.setattr(config, 'SPECULATIVE_ROUTING', True)
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+    monkeypatch.setattr(speculation_module, 'get_pool', lambda: pool)
+    yield
+    release.set()
+    pool.shutdown()
+
+
+@pytest.fixture
+def failing_pipeline(monkeypatch, blocked_pool):
+    """A pipeline whose LLM routing fails after starting speculation; returns (pipeline, speculations)."""
+    monkeypatch.setattr(model_bundle, 'current', lambda: None)
+    pipeline = QueryPipeline('test', lambda query, top_n=5, structured=False, bundle=None: 'recommended')
+    speculations = []
+
+    def speculate(*args):
+        speculations.append(QueryPipeline.speculate(pipeline, *args))
+        return speculations[-1]
+
+    def route(bundle, query, on_llm_route=None):
+        on_llm_route()
+        raise LLMDown()
+
+    async def aroute(bundle, query, on_llm_route=None):
+        route(bundle, query, on_llm_route)
+
+    monkeypatch.setattr(pipeline, 'speculate', speculate)
+    monkeypatch.setattr(pipeline, 'route', route)
+    monkeypatch.setattr(pipeline, 'aroute', aroute)
+    monkeypatch.setattr(pipeline, 'search_context', lambda query, bundle=None: 'context')
+    return pipeline, speculations
+
+
+# Function to check that every branch of the only speculation was cancelled
+def assert_cancelled(speculations):
+    assert len(speculations) == 1 and speculations[0].futures
+    assert all(future.cancelled() for future in speculations[0].futures.values())
+
+
+def test_failed_routing_cancels_speculation(failing_pipeline):
+    pipeline, speculations = failing_pipeline
+    with pytest.raises(LLMDown):
+        pipeline.process('tell me about Product 1')
+    assert_cancelled(speculations)
+
+
+def test_failed_routing_cancels_streamed_speculation(failing_pipeline):
+    pipeline, speculations = failing_pipeline
+    with pytest.raises(LLMDown):
+        list(pipeline.stream('tell me about Product 1'))
+    assert_cancelled(speculations)
+
+
+def test_failed_async_routing_cancels_speculation(failing_pipeline):
+    pipeline, speculations = failing_pipeline
+    with pytest.raises(LLMDown):
+        asyncio.run(pipeline.aprocess('tell me about Product 1'))
+    assert_cancelled(speculations)
+
+    async def consume():
+        return [chunk async for chunk in pipeline.astream('tell me about Product 1')]
+
+    speculations.clear()
+    with pytest.raises(LLMDown):
+        asyncio.run(consume())
+    assert_cancelled(speculations)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from src import config
+
+
+@pytest.fixture
+def catalog(data_dir):
+    from src import model_bundle
+    return model_bundle.current().catalog
+
+
+# Function to build an LLM router stub that records the queries it was asked about
+def llm_stub(destination, asked):
+    def route(query):
+        asked.append(query)
+        return {'destination': destination}
+    return route
+
+
+@pytest.mark.parametrize('query, destination', [
+    ('What is Accelerator 3?', 'product_info'),
+    ('Tell me about Product 2', 'product_info'),
+    ('Recommend accelerators to automate ticket routing', 'recommendation'),
+    ('We need help with payroll automation', 'recommendation'),
+])
+def test_confident_queries_stay_local(catalog, query, destination):
+    from src.services.query_router import route_with_fallback
+
+    asked, started = [], []
+    decision = route_with_fallback(query, llm_stub('product_info', asked), lambda: started.append(True), catalog)
+    assert decision['destination'] == destination
+    assert decision['source'] == 'local'
+    assert decision['confidence'] >= config.ROUTER_CONFIDENCE_THRESHOLD
+    assert asked == [] and started == []
+
+
+@pytest.mark.parametrize('query', ['hello', 'What accelerators suit Product 4?'])
+def test_ambiguous_queries_fall_back_to_the_llm(catalog, query):
+    from src.services.query_router import local_route, route_with_fallback
+
+    local = local_route(query, catalog)
+    assert local['confidence'] < config.ROUTER_CONFIDENCE_THRESHOLD
+
+    asked, started = [], []
+    decision = route_with_fallback(query, llm_stub('product_info', asked), lambda: started.append(True), catalog)
+    assert decision == {'destination': 'product_info', 'source': 'llm', 'confidence': local['confidence']}
+    assert asked == [query] and started == [True]
+
+
+def test_threshold_decides_between_local_and_llm(catalog, monkeypatch):
+    from src.services.query_router import local_route, route_with_fallback
+
+    query = 'Accelerator 3'
+    confidence = local_route(query, catalog)['confidence']
+    monkeypatch.setattr(config, 'ROUTER_CONFIDENCE_THRESHOLD', confidence)
+    assert route_with_fallback(query, llm_stub('recommendation', []), catalog=catalog)['source'] == 'local'
+    monkeypatch.setattr(config, 'ROUTER_CONFIDENCE_THRESHOLD', confidence + 0.01)
+    assert route_with_fallback(query, llm_stub('recommendation', []), catalog=catalog)['source'] == 'llm'
+
+
+def test_async_fallback_makes_the_same_decisions(catalog):
+    from src.services.query_router import aroute_with_fallback
+
+    asked = []
+
+    async def llm_route(query):
+        asked.append(query)
+        return {'destination': 'recommendation'}
+
+    confident = asyncio.run(aroute_with_fallback('What is Accelerator 3?', llm_route, catalog=catalog))
+    ambiguous = asyncio.run(aroute_with_fallback('hello', llm_route, catalog=catalog))
+    assert (confident['destination'], confident['source']) == ('product_info', 'local')
+    assert (ambiguous['destination'], ambiguous['source']) == ('recommendation', 'llm')
+    assert asked == ['hello']
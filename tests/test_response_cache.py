@@ -0,0 +1,98 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import response_cache
+from src.services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock standing in for time.time in the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(response_cache, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResponseCache()
+    assert cache.get('key') is None
+    cache.set('key', 'answer')
+    assert cache.get('key') == 'answer'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'disk_hits': 0, 'evictions': 0, 'entries': 1}
+
+
+def test_rephrased_queries_share_a_key():
+    key = ResponseCache.make_key('What is  Accelerator 3?', 'context', 'model', 'v1')
+    assert ResponseCache.make_key('what is accelerator 3', 'context', 'model', 'v1') == key
+    assert ResponseCache.make_key('what is accelerator 3', 'other context', 'model', 'v1') != key
+    assert ResponseCache.make_key('what is accelerator 3', 'context', 'model', 'v2') != key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 'answer a')
+    cache.set('b', 'answer b')
+    cache.get('a')
+    cache.set('c', 'answer c')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'answer a' and cache.get('c') == 'answer c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_the_ttl(clock, tmp_path):
+    cache = ResponseCache(ttl=60, path=str(tmp_path / 'cache.db'))
+    cache.set('key', 'answer')
+    clock[0] += 59
+    assert cache.get('key') == 'answer'
+    clock[0] += 1
+    # Expired in both tiers
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+    cache.set('key', 'fresh answer')
+    assert cache.get('key') == 'fresh answer'
+
+
+def test_disk_tier_survives_a_restart(clock, tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(ttl=60, path=path).set('key', 'answer')
+
+    restarted = ResponseCache(ttl=60, path=path)
+    assert restarted.get('key') == 'answer'
+    assert restarted.get('key') == 'answer'
+    # The first read came from disk and warmed the memory tier for the second
+    assert restarted.stats() == {'hits': 2, 'misses': 0, 'disk_hits': 1, 'evictions': 0, 'entries': 1}
+
+    clock[0] += 60
+    assert ResponseCache(ttl=60, path=path).get('key') is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_forked_process_opens_its_own_connection(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'))
+    # Nothing is opened until the cache is used, as in a gunicorn master preloading the app
+    assert cache._db is None
+    cache.set('key', 'parent answer')
+    parent_db = cache._db
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: clear the inherited memory tier so the answer comes from disk
+        try:
+            os.close(read)
+            cache._entries.clear()
+            ok = cache.get('key') == 'parent answer' and cache._db is not parent_db
+            cache.set('child key', 'child answer')
+            os.write(write, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+
+    os.close(write)
+    assert os.read(read, 1) == b'1'
+    os.close(read)
+    os.waitpid(pid, 0)
+    assert cache._db is parent_db
+    cache._entries.clear()
+    assert cache.get('child key') == 'child answer'
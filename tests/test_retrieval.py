@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.ranking import top_n_indices
+from src.retrieval import InvertedIndex
+
+
+# Function to build random documents over a small vocabulary (repeated documents produce tied scores)
+def random_documents(seed=0, count=300, vocabulary=60, length=8):
+    rng = np.random.default_rng(seed)
+    words = [f'term{i}' for i in range(vocabulary)]
+    documents = [' '.join(rng.choice(words, size=rng.integers(1, length + 1))) for _ in range(count)]
+    return documents + documents[:20]
+
+
+@pytest.mark.parametrize('block_size', [1, 4, 64])
+def test_top_k_matches_brute_force(block_size):
+    documents = random_documents()
+    tfidf = TfidfVectorizer()
+    matrix = tfidf.fit_transform(documents)
+    index = InvertedIndex(matrix, block_size=block_size)
+
+    queries = random_documents(seed=1, count=40, length=4)[:40] + ['term0', 'unknown words only', '']
+    for query in queries:
+        query_tfidf = tfidf.transform([query])
+        scores = (query_tfidf @ matrix.T).toarray().ravel()
+        for k in (1, 5, 25):
+            expected = [i for i in top_n_indices(scores, k) if scores[i] > 0]
+            docs, doc_scores = index.top_k(query_tfidf, k)
+            assert docs.tolist() == expected, (query, k)
+            np.testing.assert_allclose(doc_scores, scores[expected])